@@ -1,70 +1,484 @@
 # agent.py
 
-import streamlit as st
+import argparse
+import heapq
+import itertools
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional
 
 # 导入重构后的模块
-from database import get_watchlist, get_unread_alerts, save_alert
-from intelligence import search_news_links, browse_article_text, get_ai_structured_summary
+import dedup
+from database import (
+    ProcessedUrlIndex, get_recent_alert_counts, get_watchlist, save_alerts, setup_monitoring_tables,
+    claim_next_job, finish_job, register_job_worker, requeue_stale_jobs, unregister_job_worker, update_job_progress
+)
+from reporting import Reporter, get_reporter
+from intelligence import (
+    search_news_links, search_news_for_watchlist, browse_article_text, get_ai_structured_summaries_batch, configure_host_limits,
+    headline_text
+)
 
-def run_monitoring_agent():
+# 同时处理的公司数量（网络I/O在公司之间重叠）
+DEFAULT_MAX_WORKERS = 8
+# 警报先在内存中缓冲，每满一批在一个事务内写入
+ALERT_FLUSH_SIZE = 50
+
+def _fetch_company_article(company_name: str, processed_urls: ProcessedUrlIndex, news_items: Optional[List[Dict]] = None) -> dict:
+    """
+    在工作线程中为一家公司执行 搜索 -> 读取（共享订阅模式下 news_items 已预先检索好）。
+    这里不触碰Streamlit UI、也不写数据库，结果交回主线程按监控列表顺序处理。
+    """
+    # 1. 搜索新闻
+    # 每次只检查最新的1篇；与之前运行中已处理报道近似重复的转载会被直接跳过
+    if news_items is None:
+        news_items = search_news_links(company_name, num_articles=1, exclude_seen_duplicates=True)
+    if not news_items:
+        return {"label": f"未找到 {company_name} 的新文章。", "state": "complete", "expanded": False}
+
+    latest_news = news_items[0]
+    news_url = latest_news.get("url")
+    news_title = latest_news.get("title", "无标题")
+    headline = headline_text(latest_news)
+
+    if not news_url or news_url in processed_urls:
+        return {"label": f"跳过已处理或无效的文章: {news_title}", "state": "complete", "expanded": False}
+
+    # 2. 读取文章内容
+    full_text = browse_article_text(news_url)
+    if not full_text:
+        return {"label": f"无法读取文章内容: {news_title}", "state": "error", "expanded": False}
+
+    # 标题不同但正文相同的转载，用正文指纹识别
+    if dedup.find_seen_duplicate(company_name, full_text, news_url, kind="text"):
+        return {"label": f"跳过重复报道: {news_title}", "state": "complete", "expanded": False,
+                "processed_url": news_url, "headline": headline}
+
+    return {"article": {"url": news_url, "title": news_title, "headline": headline, "text": full_text}}
+
+class _AlertBuffer:
+    """
+    缓冲待写入的警报、已处理URL和标题/正文指纹，批量落库以减少事务提交次数。
+    指纹只在这里记录：只有监控流程真正处理过的文章才会让之后的转载被跳过。
+    """
+
+    def __init__(self, processed_urls: ProcessedUrlIndex, flush_size: int = ALERT_FLUSH_SIZE):
+        self.processed_urls = processed_urls
+        self.flush_size = flush_size
+        self.alerts: List[Dict] = []
+        self.urls: List[tuple] = []
+        self.headlines: List[Dict] = []
+        self.texts: List[Dict] = []
+        self.inserted = 0
+
+    def add_alert(self, company_name: str, alert_text: str, article: Dict):
+        self.alerts.append({"company_name": company_name, "alert_text": alert_text,
+                            "source_url": article["url"], "news_title": article["title"]})
+        self.urls.append((article["url"], company_name))
+        self.headlines.append({"company_name": company_name, "url": article["url"], "text": article["headline"]})
+        self.texts.append({"company_name": company_name, "url": article["url"], "text": article["text"]})
+        self._flush_if_full()
+
+    def add_processed_url(self, url: str, company_name: str, headline: Optional[str] = None):
+        self.urls.append((url, company_name))
+        if headline:
+            self.headlines.append({"company_name": company_name, "url": url, "text": headline})
+        self._flush_if_full()
+
+    def _flush_if_full(self):
+        # 每条警报和每个跳过的重复报道都对应一个URL
+        if len(self.urls) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        if self.alerts:
+            self.inserted += save_alerts(self.alerts)["inserted"]
+        if self.texts:
+            dedup.remember(self.texts, kind="text")
+        if self.headlines:
+            dedup.remember(self.headlines, kind="headline")
+        if self.urls:
+            self.processed_urls.add_many(self.urls)
+        self.alerts, self.urls, self.headlines, self.texts = [], [], [], []
+
+def run_monitoring_agent(max_workers: int = DEFAULT_MAX_WORKERS, host_limits: Optional[Dict[str, int]] = None,
+                         shared_feed: bool = False, use_bloom_filter: bool = False,
+                         companies: Optional[List[str]] = None, processed_urls: Optional[ProcessedUrlIndex] = None,
+                         reporter: Optional[Reporter] = None) -> Dict[str, Dict]:
     """
     后台监控Agent的主函数。
     它会遍历数据库中的watchlist，为每家公司搜索最新信息，并创建警报。
+    各公司的搜索和读取在线程池中并发进行(max_workers 为全局并发数，host_limits 为每个主机的连接上限)，
+    读到的文章再批量交给AI分析以减少请求次数；
+    shared_feed=True 时用少量 OR 查询为整个监控列表统一拉取新闻，再按公司名/别名分配；
+    进度汇报与警报写入仍按监控列表顺序在主线程完成，结果与顺序运行一致。
+    已处理的URL记录在 processed_urls 表中（警报标记已读后也不会重复抓取），
+    use_bloom_filter=True 时在其前面加一层内存布隆过滤器（长期运行时可传入复用的 processed_urls）。
+    companies 指定时只检查这些公司（调度模式），否则检查整个监控列表。
+    返回每家公司的结果 {'alert': 是否生成新警报, 'sentiment': 新警报的情绪}，供调度器调整检查频率。
+    进度通过 reporter 汇报：默认在 Streamlit 中显示，在 cron/命令行中输出结构化事件。
     """
-    watchlist = get_watchlist()
+    reporter = reporter or get_reporter()
+    watchlist = companies if companies is not None else get_watchlist()
     if not watchlist:
-        st.toast("监控列表为空，无需运行。", icon="ℹ️")
-        return
-
-    st.toast(f"后台监控Agent启动，正在监视 {len(watchlist)} 家公司...", icon="🤖")
-
-    # 获取已存在的警报URL，避免重复处理
-    existing_alerts = get_unread_alerts()
-    existing_urls = {alert['source_url'] for alert in existing_alerts}
-
-    for company_name in watchlist:
-        # 使用 status 让UI反馈更友好
-        with st.status(f"正在为 {company_name} 搜索新闻...", state="running") as status:
-            
-            # 1. 搜索新闻
-            news_items = search_news_links(company_name, num_articles=1) # 每次只检查最新的1篇
-            if not news_items:
-                status.update(label=f"未找到 {company_name} 的新文章。", state="complete", expanded=False)
-                continue
+        reporter.toast("监控列表为空，无需运行。", icon="ℹ️")
+        return {}
+
+    if host_limits:
+        configure_host_limits(host_limits)
+
+    reporter.toast(f"后台监控Agent启动，正在监视 {len(watchlist)} 家公司...", icon="🤖")
+
+    # 已处理URL索引，避免重复下载和重复调用AI
+    if processed_urls is None:
+        processed_urls = ProcessedUrlIndex(use_bloom_filter=use_bloom_filter)
+
+    # 1-2. 并发搜索并读取文章
+    fetched = {}
+    with reporter.status(f"正在为 {len(watchlist)} 家公司搜索新闻...", state="running") as status:
+        feed = search_news_for_watchlist(watchlist, num_articles=1, exclude_seen_duplicates=True) if shared_feed else {}
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            futures = {pool.submit(_fetch_company_article, company_name, processed_urls, feed.get(company_name)): company_name
+                       for company_name in watchlist}
+            for done, future in enumerate(as_completed(futures), start=1):
+                company_name = futures[future]
+                try:
+                    fetched[company_name] = future.result()
+                except Exception as e:
+                    fetched[company_name] = {"label": f"处理 {company_name} 时出错: {e}", "state": "error", "expanded": False}
+                status.update(label=f"已检索 {done}/{len(watchlist)} 家公司...")
+                reporter.emit("progress", stage="fetch", done=done, total=len(watchlist))
+
+        # 3. 批量AI分析
+        to_analyze = [name for name in watchlist if "article" in fetched[name]]
+        if to_analyze:
+            status.update(label=f"正在调用AI批量分析 {len(to_analyze)} 篇文章...")
+            insights = get_ai_structured_summaries_batch([(fetched[name]["article"]["text"], name) for name in to_analyze])
+            for company_name, ai_insight in zip(to_analyze, insights):
+                fetched[company_name]["insight"] = ai_insight
+        reporter.emit("progress", stage="analyze", done=len(to_analyze), total=len(to_analyze))
+        status.update(label="检索与分析完成。", state="complete", expanded=False)
+
+    # 4. 按监控列表顺序汇报并保存警报（批量写入）
+    buffer = _AlertBuffer(processed_urls)
+    outcomes = {company_name: {"alert": False, "sentiment": None} for company_name in watchlist}
+    try:
+        for reported, company_name in enumerate(watchlist, start=1):
+            result = fetched[company_name]
+            reporter.emit("progress", stage="report", done=reported, total=len(watchlist))
+            with reporter.status(f"{company_name}", state="running") as status:
+                if "article" not in result:
+                    if result.get("processed_url"):
+                        buffer.add_processed_url(result["processed_url"], company_name, result.get("headline"))
+                    status.update(label=result["label"], state=result["state"], expanded=result["expanded"])
+                    continue
+
+                article, ai_insight = result["article"], result.get("insight")
+                if ai_insight:
+                    alert_text = f"**{ai_insight.event_type}**: {ai_insight.summary} (情绪: {ai_insight.sentiment})"
+                    buffer.add_alert(company_name, alert_text, article)
+                    outcomes[company_name] = {"alert": True, "sentiment": ai_insight.sentiment}
+                    reporter.emit("alert", company=company_name, url=article["url"], event_type=ai_insight.event_type,
+                                  sentiment=ai_insight.sentiment)
+                    reporter.toast(f"为 {company_name} 创建了新警报!", icon="🔔")
+                    status.update(label=f"为 {company_name} 创建新警报成功!", state="complete")
+                else:
+                    status.update(label=f"AI未能分析文章: {article['title']}", state="error")
+    finally:
+        # 中途出错时也写入已完成的部分
+        buffer.flush()
+
+    reporter.success(f"后台监控Agent运行完毕，新增 {buffer.inserted} 条警报。")
+    return outcomes
 
-            latest_news = news_items[0]
-            news_url = latest_news.get("url")
-            news_title = latest_news.get("title", "无标题")
+# --- 调度模式 ---
+# 每家公司的检查间隔随其近期新闻频率自适应：有新警报则缩短，连续无新闻则指数退避；
+# 出现负面警报时短时间内再次检查跟进；全局每小时检查的公司次数受预算限制；
+# 某一轮检查出错时，这一轮的公司按连续失败次数退避后重试，调度器继续运行。
+MIN_POLL_INTERVAL_SECONDS = 15 * 60
+DEFAULT_POLL_INTERVAL_SECONDS = 60 * 60
+MAX_POLL_INTERVAL_SECONDS = 24 * 3600
+ACTIVE_SPEEDUP_FACTOR = 0.5
+QUIET_BACKOFF_FACTOR = 2.0
+URGENT_REPOLL_SECONDS = 10 * 60
+# 每小时最多检查的公司次数。按检查计数，不是出站请求数：每次检查至少一次搜索，可能还有读取与AI调用
+HOURLY_POLL_BUDGET = 120
+ERROR_RETRY_SECONDS = 5 * 60       # 检查出错后的首次重试延迟，连续出错时翻倍（不超过最长检查间隔）
+RECENT_ACTIVITY_DAYS = 7
+WATCHLIST_REFRESH_SECONDS = 60     # 空闲时最长睡眠时间，以便及时发现监控列表的变化
 
-            if not news_url or news_url in existing_urls:
-                status.update(label=f"跳过已处理或无效的文章: {news_title}", state="complete", expanded=False)
+class PollScheduler:
+    """
+    监控列表的优先队列调度器：按下次检查时间排序的小顶堆（惰性删除过期条目），
+    并用最近一小时的检查时间戳实现全局检查次数预算。
+    """
+
+    def __init__(self, companies: List[str], hourly_poll_budget: int = HOURLY_POLL_BUDGET,
+                 recent_alert_counts: Optional[Dict[str, int]] = None, now: Optional[float] = None):
+        self.hourly_poll_budget = hourly_poll_budget
+        self._heap: List[tuple] = []
+        self._next_at: Dict[str, float] = {}
+        self.intervals: Dict[str, float] = {}
+        self._failures: Dict[str, int] = {}
+        self._polls: deque = deque()
+        self._seq = itertools.count()
+        self._recent_alert_counts = recent_alert_counts or {}
+        self.sync_watchlist(companies, now)
+
+    def _initial_interval(self, company_name: str) -> float:
+        # 近期警报越多，初始间隔越短
+        recent = self._recent_alert_counts.get(company_name, 0)
+        return self._clamp(DEFAULT_POLL_INTERVAL_SECONDS / (1 + recent))
+
+    @staticmethod
+    def _clamp(interval: float) -> float:
+        return min(max(interval, MIN_POLL_INTERVAL_SECONDS), MAX_POLL_INTERVAL_SECONDS)
+
+    def _schedule(self, company_name: str, at: float):
+        self._next_at[company_name] = at
+        heapq.heappush(self._heap, (at, next(self._seq), company_name))
+
+    def sync_watchlist(self, companies: List[str], now: Optional[float] = None):
+        """新加入的公司立即检查；已移出监控列表的公司不再调度"""
+        now = time.time() if now is None else now
+        for company_name in companies:
+            if company_name not in self._next_at:
+                self.intervals[company_name] = self._initial_interval(company_name)
+                self._schedule(company_name, now)
+        for company_name in set(self._next_at) - set(companies):
+            del self._next_at[company_name]
+            self.intervals.pop(company_name, None)
+            self._failures.pop(company_name, None)
+
+    def _budget_left(self, now: float) -> int:
+        while self._polls and self._polls[0] <= now - 3600:
+            self._polls.popleft()
+        return self.hourly_poll_budget - len(self._polls)
+
+    def pop_due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[str]:
+        """取出已到期的公司（最早到期的优先），数量不超过剩余预算和 limit"""
+        now = time.time() if now is None else now
+        quota = self._budget_left(now)
+        if limit is not None:
+            quota = min(quota, limit)
+        due = []
+        while self._heap and len(due) < quota and self._heap[0][0] <= now:
+            at, _, company_name = heapq.heappop(self._heap)
+            if self._next_at.get(company_name) != at:
+                continue   # 已被重新调度或已移出监控列表
+            del self._next_at[company_name]
+            due.append(company_name)
+            self._polls.append(now)
+        return due
+
+    def record(self, company_name: str, outcome: Dict, now: Optional[float] = None):
+        """根据本次检查结果调整间隔并安排下一次检查"""
+        now = time.time() if now is None else now
+        if company_name not in self.intervals:
+            return
+        self._failures.pop(company_name, None)
+        interval = self.intervals[company_name]
+        if outcome.get("alert"):
+            interval = self._clamp(interval * ACTIVE_SPEEDUP_FACTOR)
+        else:
+            interval = self._clamp(interval * QUIET_BACKOFF_FACTOR)
+        self.intervals[company_name] = interval
+        delay = URGENT_REPOLL_SECONDS if outcome.get("sentiment") == "负面" else interval
+        self._schedule(company_name, now + delay)
+
+    def record_failure(self, company_name: str, now: Optional[float] = None):
+        """检查出错：不改变自适应间隔，按连续失败次数指数退避后重试"""
+        now = time.time() if now is None else now
+        if company_name not in self.intervals:
+            return
+        failures = self._failures.get(company_name, 0) + 1
+        self._failures[company_name] = failures
+        self._schedule(company_name, now + min(ERROR_RETRY_SECONDS * 2 ** (failures - 1), MAX_POLL_INTERVAL_SECONDS))
+
+    def seconds_until_next(self, now: Optional[float] = None) -> float:
+        """距离下一家公司到期（且预算允许）还需等待的秒数"""
+        now = time.time() if now is None else now
+        while self._heap and self._next_at.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return float("inf")
+        wait = self._heap[0][0] - now
+        if self._budget_left(now) <= 0:
+            if not self._polls:
+                return float("inf")   # 预算为0：永远不会有检查名额
+            wait = max(wait, self._polls[0] + 3600 - now)
+        return max(wait, 0.0)
+
+def run_scheduler(max_workers: int = DEFAULT_MAX_WORKERS, hourly_poll_budget: int = HOURLY_POLL_BUDGET,
+                  max_batch: Optional[int] = None, shared_feed: bool = False, use_bloom_filter: bool = False,
+                  max_cycles: Optional[int] = None, sleep=time.sleep, reporter: Optional[Reporter] = None):
+    """
+    常驻调度模式：循环取出到期的公司交给 run_monitoring_agent 检查，再按结果重新排期。
+    每轮会重新读取监控列表；max_cycles 限制检查轮数（None 表示一直运行，出错的轮次也计入）。
+    """
+    scheduler = PollScheduler(get_watchlist(), hourly_poll_budget, get_recent_alert_counts(RECENT_ACTIVITY_DAYS))
+    processed_urls = ProcessedUrlIndex(use_bloom_filter=use_bloom_filter)
+    cycles = 0
+    while max_cycles is None or cycles < max_cycles:
+        due = []
+        try:
+            scheduler.sync_watchlist(get_watchlist())
+            due = scheduler.pop_due(limit=max_batch)
+            if not due:
+                sleep(min(scheduler.seconds_until_next(), WATCHLIST_REFRESH_SECONDS))
                 continue
+            # 任务队列工作进程等其他进程也会写入 processed_urls，每轮重建布隆过滤器以免把已处理的URL误判为新URL
+            processed_urls.refresh()
+            outcomes = run_monitoring_agent(max_workers=max_workers, shared_feed=shared_feed,
+                                            companies=due, processed_urls=processed_urls, reporter=reporter)
+        except Exception:
+            logging.exception("调度轮次出错，%d 家公司将退避后重试", len(due))
+            failed_at = time.time()
+            for company_name in due:
+                scheduler.record_failure(company_name, failed_at)
+            cycles += 1
+            if not due:
+                sleep(WATCHLIST_REFRESH_SECONDS)   # 读取监控列表失败（如数据库被锁），稍后再试
+            continue
+        finished_at = time.time()
+        for company_name in due:
+            scheduler.record(company_name, outcomes.get(company_name, {}), finished_at)
+        cycles += 1
+    return scheduler
+
+# --- 任务队列工作进程 ---
+# Streamlit 会话只向 jobs 表提交任务并轮询进度；工作进程池认领任务、运行监控流水线，
+# 并通过 JobReporter 把进度和已生成的警报写回数据库。
+MONITORING_JOB = "monitoring"
+DEFAULT_JOB_WORKER_PROCESSES = 2
+JOB_POLL_SECONDS = 2.0
+WORKER_HEARTBEAT_SECONDS = 15
+
+class JobReporter(Reporter):
+    """把流水线事件转换为任务进度、说明和部分结果"""
+
+    # 各阶段在总进度中所占的区间
+    STAGE_PROGRESS = {"fetch": (0.0, 0.6), "analyze": (0.6, 0.8), "report": (0.8, 1.0)}
+
+    def __init__(self, job_id: int, worker_id: str):
+        super().__init__(sink=self._record)
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.alerts: List[Dict] = []
+
+    def _record(self, event: Dict):
+        kind = event["event"]
+        if kind == "progress":
+            low, high = self.STAGE_PROGRESS[event["stage"]]
+            progress = low + (high - low) * event["done"] / max(event["total"], 1)
+            update_job_progress(self.job_id, self.worker_id, progress=round(progress, 4))
+        elif kind == "alert":
+            self.alerts.append({k: event[k] for k in ("company", "url", "event_type", "sentiment")})
+            update_job_progress(self.job_id, self.worker_id, partial_result={"alerts": self.alerts})
+        elif event.get("label") or event.get("message"):
+            update_job_progress(self.job_id, self.worker_id, message=event.get("label") or event.get("message"))
 
-            # 2. 读取文章内容
-            status.update(label=f"发现新文章: '{news_title[:30]}...'。正在读取...", state="running")
-            full_text = browse_article_text(news_url)
-            if not full_text:
-                status.update(label=f"无法读取文章内容: {news_title}", state="error", expanded=False)
+def _run_monitoring_job(job: Dict):
+    params = job["params"]
+    reporter = JobReporter(job["id"], job["worker_id"])
+    try:
+        outcomes = run_monitoring_agent(max_workers=params.get("max_workers", DEFAULT_MAX_WORKERS),
+                                        shared_feed=params.get("shared_feed", False),
+                                        companies=params.get("companies"), reporter=reporter)
+    except Exception as e:
+        logging.exception("监控任务 %s 失败", job["id"])
+        finished = finish_job(job["id"], job["worker_id"], result={"alerts": reporter.alerts}, error=f"{type(e).__name__}: {e}")
+    else:
+        finished = finish_job(job["id"], job["worker_id"], result={"alerts": reporter.alerts, "companies_checked": len(outcomes)})
+    if not finished:
+        logging.warning("监控任务 %s 已被重新排队或由其他工作进程接管，丢弃本进程的结果", job["id"])
+
+def run_job_worker(worker_id: Optional[str] = None, poll_seconds: float = JOB_POLL_SECONDS,
+                   max_jobs: Optional[int] = None, stop_when_idle: bool = False):
+    """
+    单个工作进程：循环认领并执行排队中的监控任务。后台线程定期刷新进程心跳和所认领任务的心跳，
+    UI 据此判断是否已有可用的工作进程池；心跳超时的任务会被重新排队。
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    setup_monitoring_tables()
+    register_job_worker(worker_id)
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(WORKER_HEARTBEAT_SECONDS):
+            register_job_worker(worker_id)
+
+    threading.Thread(target=heartbeat, name="job-worker-heartbeat", daemon=True).start()
+    handled = 0
+    try:
+        while max_jobs is None or handled < max_jobs:
+            requeue_stale_jobs()
+            job = claim_next_job(worker_id, [MONITORING_JOB])
+            if job is None:
+                if stop_when_idle:
+                    break
+                time.sleep(poll_seconds)
                 continue
+            _run_monitoring_job(job)
+            handled += 1
+    finally:
+        stop.set()
+        unregister_job_worker(worker_id)
+    return handled
+
+def run_job_worker_pool(processes: int = DEFAULT_JOB_WORKER_PROCESSES):
+    """启动多个工作进程共同消费任务队列（spawn 方式，避免子进程继承父进程的 SQLite 连接）"""
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=run_job_worker, name=f"job-worker-{i}", daemon=True) for i in range(max(1, processes))]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
 
-            # 3. AI分析
-            status.update(label=f"正在调用AI分析文章...", state="running")
-            ai_insight = get_ai_structured_summary(full_text, company_name)
-
-            if ai_insight:
-                # 4. 创建并保存警报
-                alert_text = f"**{ai_insight.event_type}**: {ai_insight.summary} (情绪: {ai_insight.sentiment})"
-                save_alert(company_name, alert_text, news_url, news_title)
-                st.toast(f"为 {company_name} 创建了新警报!", icon="🔔")
-                status.update(label=f"为 {company_name} 创建新警报成功!", state="complete")
-            else:
-                status.update(label=f"AI未能分析文章: {news_title}", state="error")
-    
-    st.success("后台监控Agent运行完毕。")
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"必须至少为 1，当前为 {value}")
+    return number
 
 if __name__ == "__main__":
     # 此部分允许未来通过命令行或定时任务（cron job）运行此脚本
-    print("正在以脚本模式运行后台监控Agent...")
-    run_monitoring_agent()
-    print("运行结束。")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="后台监控Agent")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="同时处理的公司数量")
+    parser.add_argument("--shared-feed", action="store_true", help="为整个监控列表统一拉取一次新闻")
+    parser.add_argument("--bloom-filter", action="store_true", help="在已处理URL查询前使用内存布隆过滤器")
+    parser.add_argument("--daemon", action="store_true", help="常驻调度模式：按各公司的新闻频率自适应安排检查")
+    parser.add_argument("--hourly-poll-budget", "--hourly-budget", dest="hourly_poll_budget", type=_positive_int, default=HOURLY_POLL_BUDGET,
+                        help="调度模式下每小时最多检查的公司次数（按检查计数，不是出站请求数）")
+    parser.add_argument("--max-batch", type=int, default=None, help="调度模式下每轮最多检查的公司数")
+    parser.add_argument("--job-workers", type=int, default=0, help="以 N 个工作进程消费后台任务队列（供 Streamlit 界面提交的任务使用）")
+    args = parser.parse_args()
+    # 命令行模式不加载 Streamlit：进度以 JSON 行事件输出到标准错误
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # 所有入口共用：建表并执行待运行的迁移（如 processed_urls），已是最新时几乎无开销
+    setup_monitoring_tables()
+    if args.job_workers:
+        print(f"正在启动 {args.job_workers} 个任务队列工作进程（Ctrl+C 退出）...")
+        run_job_worker_pool(args.job_workers)
+    elif args.daemon:
+        print("正在以调度模式运行后台监控Agent（Ctrl+C 退出）...")
+        try:
+            run_scheduler(max_workers=args.workers, hourly_poll_budget=args.hourly_poll_budget, max_batch=args.max_batch,
+                          shared_feed=args.shared_feed, use_bloom_filter=args.bloom_filter)
+        except KeyboardInterrupt:
+            pass
+    else:
+        print("正在以脚本模式运行后台监控Agent...")
+        run_monitoring_agent(max_workers=args.workers, shared_feed=args.shared_feed, use_bloom_filter=args.bloom_filter)
+    print("运行结束。")
@@ -1,28 +1,122 @@
 
 import os
 import json
+import time
+from collections import Counter
+from contextvars import ContextVar
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.agents import AgentExecutor, create_react_agent
 from langchain.prompts import PromptTemplate
 from langchain.tools import Tool
 from langchain.memory import ConversationBufferMemory
+from langchain_core.callbacks import BaseCallbackHandler
 import streamlit as st
 import pandas as pd
 from langchain.output_parsers import PydanticOutputParser
-from pydantic import BaseModel, Field
+from typing import Callable, Dict, Optional
 
 # --- 导入我们所有的后台模块和工具 ---
+from cache import LRUCache
 from intelligence import get_ai_structured_summary, search_news_links, browse_article_text
 from mock_data_provider import get_mock_company_data
 from database import add_to_watchlist, get_watchlist
-from engine import generate_cash_flow_forecast, calculate_runway_and_score, analyze_funding_urgency
-from models import FinancialInput
+from engine import (
+    generate_cash_flow_forecast, calculate_runway_and_score, analyze_funding_urgency,
+    simulate_runway_distribution, solve_for_target_runway, solve_for_project_feasibility
+)
+from models import B2BContract, FinancialInput, ScenarioInput, FinancialQueryInput, GoalSeekQueryInput
+from query_parser import parse_b2b_contracts, parse_query
 
+# ReAct 循环上限：重复调用由工具结果缓存兜底，正常问题很少超过 4~5 轮
+MAX_AGENT_ITERATIONS = 10
+MAX_AGENT_EXECUTION_SECONDS = 180
+# 工具结果按会话缓存：(工具名, 规范化输入) -> 结果，TTL 内的重复调用不再重做网络请求和 LLM 调用
+TOOL_CACHE_TTL_SECONDS = 600
+TOOL_CACHE_MAXSIZE = 128
+TURN_STATS_HISTORY = 50
+# 工具内部捕获异常后返回的出错提示以此开头，不写入缓存，下次调用重新执行
+TOOL_ERROR_PREFIX = "抱歉"
+# 求解最大月消耗且问题中没有给出当前月消耗时，传给 FinancialInput 的占位值（万元）
+PLACEHOLDER_MONTHLY_BURN = 1.0
+
+
+class TurnStats(BaseCallbackHandler):
+    """单轮对话的统计：ReAct 迭代次数、各工具调用次数、缓存命中、Agent 的 LLM 调用次数与耗时"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.iterations = 0
+        self.tool_calls: Counter = Counter()
+        self.cache_hits = 0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+        self.total_seconds = 0.0
+        self.seen_inputs = set()
+        self._llm_started: Dict = {}
+
+    def on_agent_action(self, action, **kwargs):
+        self.iterations += 1
+        self.tool_calls[action.tool] += 1
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._llm_started[run_id] = time.perf_counter()
+
+    on_chat_model_start = on_llm_start
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._llm_started.pop(run_id, None)
+        if started is not None:
+            self.llm_calls += 1
+            self.llm_seconds += time.perf_counter() - started
+
+    on_llm_error = on_llm_end
+
+    def finish(self) -> Dict:
+        self.total_seconds = time.perf_counter() - self.started
+        return self.summary()
+
+    def summary(self) -> Dict:
+        return {
+            "iterations": self.iterations,
+            "tool_calls": dict(self.tool_calls),
+            "cache_hits": self.cache_hits,
+            "llm_calls": self.llm_calls,
+            "llm_seconds": round(self.llm_seconds, 3),
+            "total_seconds": round(self.total_seconds, 3),
+            "hit_iteration_limit": self.iterations >= MAX_AGENT_ITERATIONS,
+        }
+
+
+# 当前正在处理的对话轮次及其所属会话的工具结果缓存（Streamlit 每个会话在各自线程中运行，互不干扰）
+_current_turn: ContextVar[Optional[TurnStats]] = ContextVar("current_turn", default=None)
+_current_tool_cache: ContextVar[Optional[LRUCache]] = ContextVar("current_tool_cache", default=None)
+
+
+def _normalize_tool_input(tool_input) -> str:
+    # ReAct 输出的 Action Input 常带引号、多余空格或大小写差异
+    return " ".join(str(tool_input or "").strip().strip("'\"`").split()).casefold()
+
+
+def _memoized_tool(name: str, func: Callable[[str], str]) -> Callable[[str], str]:
+    """包装只读工具：命中本会话的缓存时直接返回；同一轮内重复调用时提示模型不要再调用"""
+    def wrapper(tool_input: str = "") -> str:
+        key = (name, _normalize_tool_input(tool_input))
+        turn = _current_turn.get()
+        cache = _current_tool_cache.get()
+        result = cache.get(key) if cache is not None else None
+        if result is None:
+            result = func(tool_input)
+            if cache is not None and not result.startswith(TOOL_ERROR_PREFIX):
+                cache.set(key, result)
+        elif turn is not None:
+            turn.cache_hits += 1
+        if turn is not None:
+            if key in turn.seen_inputs:
+                return f"（本轮已用相同输入调用过 {name}，结果相同，请直接根据已有信息回答）\n{result}"
+            turn.seen_inputs.add(key)
+        return result
+    return wrapper
 
-class FinancialQueryInput(BaseModel):
-    initial_cash: float = Field(description="公司初始现金，单位是万元")
-    monthly_burn: float = Field(description="公司每月运营成本或消耗，单位是万元")
-    b2c_monthly_revenue: float = Field(0, description="公司每月B2C业务收入，单位是万元")
 
 def get_company_profile_tool(company_name: str) -> str:
     """获取一家公司的核心档案信息，如法人、注册资本、融资历史和专利。"""
@@ -51,20 +145,16 @@ def get_latest_news_summary_tool(company_name: str) -> str:
             return str(ai_summary.model_dump())
     return "未找到该公司近期相关新闻。"
 
-def analyze_financial_scenario_tool(query: str) -> str:
-    """
-    分析和预测公司在特定财务情景下的现金流状况。
-    输入应该是一个清晰描述财务参数的自然语言问题，例如：
-    '分析一家初始现金200万，月消耗30万，每月B2C收入1.5万的公司' 或
-    '如果公司A拿到一笔500万的融资，会怎么样'
-    """
-    print(f"Executing analyze_financial_scenario_tool with query: {query}")
-    llm = st.session_state.llm 
-
-    # 1. 设置 Pydantic Parser
-    parser = PydanticOutputParser(pydantic_object=FinancialQueryInput)
-    
-    # 2. 创建包含格式化指令的 Prompt
+def _extract_query_params(query: str, pydantic_object):
+    """先用规则解析（不调用模型）；置信度不足时再用 LLM + PydanticOutputParser 从自然语言问题中提取参数"""
+    parsed = parse_query(query, pydantic_object)
+    if parsed["confident"]:
+        print(f"规则解析命中，跳过LLM参数提取: {parsed['values']}")
+        return pydantic_object(**parsed["values"])
+    print(f"规则解析置信度不足（缺少 {parsed['missing']}，未归属 {parsed['unassigned']}，"
+          f"无法换算 {parsed['unsupported']}），使用LLM提取参数")
+    llm = st.session_state.llm
+    parser = PydanticOutputParser(pydantic_object=pydantic_object)
     prompt_template = """
     请从以下问题中提取财务参数。
     所有金额单位都应为“万元”，例如“200万”应为200。
@@ -78,28 +168,38 @@ def analyze_financial_scenario_tool(query: str) -> str:
         input_variables=["query"],
         partial_variables={"format_instructions": parser.get_format_instructions()}
     )
-    
-    # 3. 创建Chain并执行
     chain = prompt | llm | parser
-    
+    return chain.invoke({"query": query})
+
+def analyze_financial_scenario_tool(query: str) -> str:
+    """
+    分析和预测公司在特定财务情景下的现金流状况。
+    输入应该是一个清晰描述财务参数的自然语言问题，例如：
+    '分析一家初始现金200万，月消耗30万，每月B2C收入1.5万的公司' 或
+    '如果公司A拿到一笔500万的融资，会怎么样'
+    如果问题要求概率或风险分布，会额外运行蒙特卡洛模拟。
+    """
+    print(f"Executing analyze_financial_scenario_tool with query: {query}")
     try:
-        # 4. 解析结果
-        params = chain.invoke({"query": query})
+        # 1. 从问题中提取财务参数
+        params = _extract_query_params(query, FinancialQueryInput)
         
         fin_input = FinancialInput(
             initial_cash=params.initial_cash,
             monthly_burn=params.monthly_burn,
-            b2c_monthly_revenue=params.b2c_monthly_revenue
+            b2c_monthly_revenue=params.b2c_monthly_revenue,
+            b2b_contracts=[B2BContract(**c) for c in parse_b2b_contracts(query)]
         )
         
         if fin_input.monthly_burn <= 0 and fin_input.initial_cash <= 0:
             return "信息不足，无法进行财务分析。请输入初始现金和月度消耗。"
             
-        # 5. 执行分析并返回结果
+        # 2. 执行分析并返回结果
         cash_flow_df = generate_cash_flow_forecast(fin_input)
         runway, score = calculate_runway_and_score(cash_flow_df)
         funding_analysis = analyze_funding_urgency(score)
         df_markdown = cash_flow_df.head(6).to_markdown()
+        b2b_line = f"- **已计入B2B合同**: {len(fin_input.b2b_contracts)} 份" if fin_input.b2b_contracts else ""
         
         result = f"""
 ### 财务情景分析报告
@@ -108,30 +208,90 @@ def analyze_financial_scenario_tool(query: str) -> str:
 - **现金生命线 (Runway)**: {runway} 个月
 - **财务健康评分**: {score*100:.0f}/100
 - **融资建议**: {funding_analysis['suggestion']}
+{b2b_line}
 
 #### 未来6个月现金流预测 (单位: 万元)
 {df_markdown}
+"""
+        if params.monte_carlo:
+            mc = simulate_runway_distribution(fin_input, seed=0)
+            prob = mc["prob_cash_negative_by_month"]
+            checkpoints = [m for m in (6, 12, 24) if m <= len(prob)]
+            prob_lines = "\n".join(f"- {m}个月内现金转负概率: {prob[m - 1]*100:.1f}%" for m in checkpoints)
+            result += f"""
+#### 蒙特卡洛模拟 ({mc['n_paths']} 条路径)
+- **生命线分布**: P10 {mc['runway_p10']:.0f} 个月 / P50 {mc['runway_p50']:.0f} 个月 / P90 {mc['runway_p90']:.0f} 个月
+{prob_lines}
 """
         return result
     except Exception as e:
         print(f"财务分析工具出错: {e}")
         return f"抱歉，解析您的财务问题时出错。请确保问题中包含了明确的数字，例如 '初始现金200万'。错误详情: {e}"
 
+def solve_funding_goal_tool(query: str) -> str:
+    """
+    目标求解：回答“需要融多少钱才能撑24个月”或“每月最多能花多少钱项目才可行”这类问题。
+    """
+    print(f"Executing solve_funding_goal_tool with query: {query}")
+    try:
+        params = _extract_query_params(query, GoalSeekQueryInput)
+        solving_burn = params.solve_for == 'monthly_burn'
+        if params.initial_cash <= 0:
+            return "信息不足，无法求解。请提供初始现金。"
+        if params.monthly_burn <= 0 and not solving_burn:
+            return "信息不足，无法求解。请提供月度消耗。"
+        if params.target_runway_months <= 0 and params.project_duration_months <= 0:
+            return "信息不足，无法求解。请说明目标生命线月数或项目周期。"
+
+        fin_input = FinancialInput(
+            initial_cash=params.initial_cash,
+            # 求解最大月消耗时问题里通常没有月消耗；FinancialInput 要求大于0，求解器不使用这个值
+            monthly_burn=params.monthly_burn if params.monthly_burn > 0 else PLACEHOLDER_MONTHLY_BURN,
+            b2c_monthly_revenue=params.b2c_monthly_revenue
+        )
+        scenario = ScenarioInput(
+            monthly_extra_burn=params.monthly_extra_burn,
+            monthly_revenue=params.monthly_revenue,
+            revenue_delay_months=params.revenue_delay_months
+        )
+        if params.project_duration_months > 0:
+            solution = solve_for_project_feasibility(fin_input, params.project_duration_months, params.solve_for, scenario)
+        else:
+            solution = solve_for_target_runway(fin_input, params.target_runway_months, params.solve_for, scenario)
+        if not solution["feasible"]:
+            return solution["reason"]
+
+        labels = {"upfront_cost": "最少需要融资/前期投入", "monthly_burn": "公司最大可承受月消耗", "monthly_extra_burn": "项目最大可承受每月新增成本"}
+        return f"""
+### 目标求解结果
+- **{labels[params.solve_for]}**: {solution['value']:.2f} 万元
+- **目标生命线**: {solution['target_runway_months']} 个月
+- **求解后生命线**: {solution['achieved_runway_months']} 个月
+"""
+    except Exception as e:
+        print(f"目标求解工具出错: {e}")
+        return f"抱歉，求解您的问题时出错。请确保问题中包含初始现金、月消耗和目标月数。错误详情: {e}"
+
 tools = [
     Tool(
         name="GetCompanyProfile",
-        func=get_company_profile_tool,
+        func=_memoized_tool("GetCompanyProfile", get_company_profile_tool),
         description="用于查询一家公司的基本档案、融资历史或专利信息。输入应该是一家公司的准确名称。",
     ),
     Tool(
         name="GetLatestNewsSummary",
-        func=get_latest_news_summary_tool,
+        func=_memoized_tool("GetLatestNewsSummary", get_latest_news_summary_tool),
         description="用于获取一家公司最新的市场动态和新闻摘要。输入应该是一家公司的准确名称。",
     ),
     Tool(
         name="AnalyzeFinancialScenario",
-        func=analyze_financial_scenario_tool,
-        description="用于进行公司财务和现金流的模拟与预测。当用户问题包含'现金流'、'生命线'、'融资'、'预测'、'分析'等关键词，并提及具体金额时，应使用此工具。",
+        func=_memoized_tool("AnalyzeFinancialScenario", analyze_financial_scenario_tool),
+        description="用于进行公司财务和现金流的模拟与预测。当用户问题包含'现金流'、'生命线'、'融资'、'预测'、'分析'等关键词，并提及具体金额时，应使用此工具。如需概率分布或风险区间，请在输入中保留相关描述。",
+    ),
+    Tool(
+        name="SolveFundingGoal",
+        func=_memoized_tool("SolveFundingGoal", solve_funding_goal_tool),
+        description="用于反向求解：需要融资多少才能维持目标月数的生命线，或每月最多能消耗多少仍能满足目标/项目可行。输入应为包含初始现金、月消耗和目标月数（或项目周期）的自然语言问题。",
     ),
     Tool(
         name="AddToWatchlist",
@@ -177,7 +337,7 @@ prompt = PromptTemplate.from_template(prompt_template)
 # ✅ 这里是核心修改部分
 def initialize_agent():
     """初始化LLM和Agent，但不包含记忆。"""
-    if "agent_executor" not in st.session_state:
+    if "agent" not in st.session_state:
         print("Initializing Agent for the first time...")
         
         # 从环境变量中获取API Key
@@ -197,21 +357,45 @@ def initialize_agent():
         st.session_state.agent = agent
         st.session_state.llm = llm
 
-# ... [主函数 get_agent_response 保持不变] ...
-def get_agent_response(user_input: str, memory) -> str:
-    """接收用户输入和记忆，返回Agent的最终回答。"""
-    try:
-        agent_executor = AgentExecutor(
+def _get_agent_executor(memory) -> AgentExecutor:
+    """
+    每个会话只构建一次 AgentExecutor 及其工具结果缓存；会话的记忆对象被替换时一并重建，
+    新的对话不会用到旧对话的缓存结果
+    """
+    executor = st.session_state.get("agent_executor")
+    if executor is None or executor.memory is not memory:
+        executor = AgentExecutor(
             agent=st.session_state.agent,
             tools=tools,
-            memory=memory, 
+            memory=memory,
             verbose=True,
             handle_parsing_errors=True,
-            max_iterations=30  
+            max_iterations=MAX_AGENT_ITERATIONS,
+            max_execution_time=MAX_AGENT_EXECUTION_SECONDS,
         )
-        
-        response = agent_executor.invoke({"input": user_input})
+        st.session_state.agent_executor = executor
+        st.session_state.agent_tool_cache = LRUCache(maxsize=TOOL_CACHE_MAXSIZE, ttl=TOOL_CACHE_TTL_SECONDS)
+    return executor
+
+def get_agent_response(user_input: str, memory) -> str:
+    """接收用户输入和记忆，返回Agent的最终回答；本轮统计追加到 st.session_state.agent_turn_stats"""
+    stats = TurnStats()
+    token = _current_turn.set(stats)
+    cache_token = None
+    try:
+        agent_executor = _get_agent_executor(memory)
+        cache_token = _current_tool_cache.set(st.session_state.agent_tool_cache)
+        response = agent_executor.invoke({"input": user_input}, config={"callbacks": [stats]})
         return response.get('output', "Agent没有返回预期的输出。")
     except Exception as e:
         print(f"Agent执行出错: {e}")
-        return f"抱歉，处理您的请求时出错: {e}"
\ No newline at end of file
+        return f"抱歉，处理您的请求时出错: {e}"
+    finally:
+        _current_turn.reset(token)
+        if cache_token is not None:
+            _current_tool_cache.reset(cache_token)
+        summary = stats.finish()
+        print(f"Agent turn stats: {json.dumps(summary, ensure_ascii=False)}")
+        history = st.session_state.setdefault("agent_turn_stats", [])
+        history.append(summary)
+        del history[:-TURN_STATS_HISTORY]
@@ -3,6 +3,8 @@ from dotenv import load_dotenv
 load_dotenv()
 import streamlit as st
 import os
+import subprocess
+import sys
 import pandas as pd
 from typing import Dict
 from langchain.memory import ConversationBufferMemory
@@ -15,27 +17,67 @@ from engine import (
 from models import FinancialInput, B2BContract, ScenarioInput
 from database import (
     create_company_table, setup_monitoring_tables, 
-    add_to_watchlist, remove_from_watchlist, get_watchlist, get_unread_alerts, mark_alert_as_read
+    add_to_watchlist, remove_from_watchlist, get_watchlist, mark_alert_as_read,
+    ALERT_PAGE_SIZE, get_max_alert_id, get_unread_alert_count, get_unread_alert_ids, get_unread_alerts_page,
+    get_unread_alerts_since,
+    enqueue_job, get_job, count_live_job_workers
 )
 from intelligence import search_news_links, browse_article_text, get_ai_structured_summary
 from mock_data_provider import get_mock_company_data
 from agent_brain import initialize_agent, get_agent_response
+from agent import MONITORING_JOB, DEFAULT_JOB_WORKER_PROCESSES
+
+
+def _load_alert_feed() -> dict:
+    """
+    侧边栏警报列表保存在 session_state 中，每次 rerun 只增量拉取上次之后新增的警报，
+    "加载更多" 时按键集游标再取一页，而不是每次重新读取全部未读警报。
+    """
+    feed = st.session_state.get("alert_feed")
+    if feed is None:
+        # 先取最大 id 再读第一页：两次查询之间新增的警报会在下一次增量拉取时补上（按 id 去重）
+        last_seen_id = get_max_alert_id()
+        page = get_unread_alerts_page(ALERT_PAGE_SIZE)
+        feed = {
+            "alerts": page["alerts"],
+            "next_cursor": page["next_cursor"],
+            "last_seen_id": last_seen_id,
+        }
+        st.session_state.alert_feed = feed
+        return feed
+
+    new_alerts = get_unread_alerts_since(feed["last_seen_id"], ALERT_PAGE_SIZE + 1)
+    if len(new_alerts) > ALERT_PAGE_SIZE:
+        # 新增过多时直接从第一页重新加载
+        del st.session_state.alert_feed
+        return _load_alert_feed()
+    # 其他会话中已标记为已读的警报从列表中移除
+    unread_ids = get_unread_alert_ids(a['id'] for a in feed["alerts"])
+    feed["alerts"] = [a for a in feed["alerts"] if a['id'] in unread_ids]
+    if new_alerts:
+        feed["last_seen_id"] = new_alerts[-1]["id"]
+        loaded_ids = {a['id'] for a in feed["alerts"]}
+        new_alerts = [a for a in new_alerts if a['id'] not in loaded_ids]
+        feed["alerts"] = sorted(new_alerts, key=lambda a: (a["created_at"], a["id"]), reverse=True) + feed["alerts"]
+    return feed
 
 
 def display_alerts():
-    """在侧边栏显示未读的监控警报"""
+    """在侧边栏显示未读的监控警报（分页）"""
     st.sidebar.title("🔔 监控警报中心")
 
-    unread_alerts = get_unread_alerts()
+    unread_count = get_unread_alert_count()
 
-    if not unread_alerts:
+    if not unread_count:
+        st.session_state.pop("alert_feed", None)
         st.sidebar.info("目前没有新的警报。")
         return
 
-    st.sidebar.success(f"您有 {len(unread_alerts)} 条未读警报！")
+    st.sidebar.success(f"您有 {unread_count} 条未读警报！")
 
+    feed = _load_alert_feed()
     # 为了让每个警报都能独立展开/折叠，我们用 expander
-    for alert in unread_alerts:
+    for alert in feed["alerts"]:
         with st.sidebar.expander(f"**{alert['company_name']}**: {alert['news_title'][:30]}"):
             st.markdown(alert['alert_text'])
             st.markdown(f"[阅读原文]({alert['source_url']})")
@@ -44,7 +86,74 @@ def display_alerts():
             button_key = f"read_{alert['id']}"
             if st.button("标记为已读", key=button_key):
                 mark_alert_as_read(alert['id'])
+                feed["alerts"] = [a for a in feed["alerts"] if a['id'] != alert['id']]
                 st.rerun() # 立即刷新界面，让已读的警报消失
+
+    if feed["next_cursor"] is not None and st.sidebar.button("加载更多", key="load_more_alerts"):
+        page = get_unread_alerts_page(ALERT_PAGE_SIZE, feed["next_cursor"])
+        loaded_ids = {a['id'] for a in feed["alerts"]}
+        feed["alerts"].extend(a for a in page["alerts"] if a['id'] not in loaded_ids)
+        feed["next_cursor"] = page["next_cursor"]
+        st.rerun()
+
+
+@st.cache_resource
+def _job_worker_pool() -> dict:
+    # 整个 Streamlit 服务只保存一个工作进程池句柄，所有会话共享
+    return {"process": None}
+
+
+def _ensure_job_workers():
+    """没有存活的工作进程时，以独立进程启动 agent.py --job-workers（多个会话共用同一个池）"""
+    pool = _job_worker_pool()
+    process = pool["process"]
+    if count_live_job_workers() or (process is not None and process.poll() is None):
+        return
+    pool["process"] = subprocess.Popen(
+        [sys.executable, "agent.py", "--job-workers", str(DEFAULT_JOB_WORKER_PROCESSES)],
+        cwd=os.path.dirname(os.path.abspath(__file__)), start_new_session=True,
+    )
+
+
+@st.fragment(run_every=2)
+def _monitoring_job_panel():
+    """只轮询任务状态；任务结束后整页 rerun，由 display_alerts 增量拉取新警报"""
+    job = get_job(st.session_state.monitoring_job_id)
+    if job is None:
+        del st.session_state.monitoring_job_id
+        return
+    partial = job["result"] or {}
+    if job["status"] in ("queued", "running"):
+        label = "等待工作进程..." if job["status"] == "queued" else (job["message"] or "监控运行中...")
+        st.progress(job["progress"] or 0.0, text=label)
+        st.caption(f"已生成 {len(partial.get('alerts', []))} 条警报")
+        return
+    del st.session_state.monitoring_job_id
+    if job["status"] == "failed":
+        st.session_state.monitoring_job_notice = ("error", f"监控任务失败：{job['error']}")
+    else:
+        st.session_state.monitoring_job_notice = ("success", f"监控完成，生成 {len(partial.get('alerts', []))} 条警报。")
+    st.rerun()
+
+
+def display_monitoring_controls():
+    """侧边栏：提交监控任务并显示进度；监控在后台工作进程中运行，不阻塞当前会话"""
+    st.sidebar.title("🛰️ 新闻监控")
+    notice = st.session_state.pop("monitoring_job_notice", None)
+    if notice:
+        getattr(st.sidebar, notice[0])(notice[1])
+
+    if st.sidebar.button("立即运行监控", key="run_monitoring", disabled=not get_watchlist()):
+        # 相同 dedup_key 的任务在排队或运行时不会重复提交，多个会话共享同一次运行
+        job = enqueue_job(MONITORING_JOB, dedup_key=f"{MONITORING_JOB}:watchlist")
+        st.session_state.monitoring_job_id = job["id"]
+        if not job["created"]:
+            st.sidebar.info("已有监控任务在运行，将显示该任务的进度。")
+        _ensure_job_workers()
+
+    if "monitoring_job_id" in st.session_state:
+        with st.sidebar:
+            _monitoring_job_panel()
 # =============================================================================
 # Streamlit UI (现在是对话式界面)
 # =============================================================================
@@ -59,6 +168,7 @@ def main():
     # 初始化Agent的核心组件 (LLM和Prompt)
     initialize_agent()
 
+    display_monitoring_controls()
     display_alerts()
     # 为当前会话初始化记忆模块
     if "memory" not in st.session_state:
@@ -89,6 +199,10 @@ def main():
             
             st.session_state.messages.append({"role": "assistant", "content": response})
             st.markdown(response)
+            turn = st.session_state.get("agent_turn_stats", [None])[-1]
+            if turn:
+                st.caption(f"迭代 {turn['iterations']} 次 · 工具调用 {sum(turn['tool_calls'].values())} 次"
+                           f"（缓存命中 {turn['cache_hits']}） · LLM {turn['llm_seconds']:.1f}s / 总计 {turn['total_seconds']:.1f}s")
 
 
 if __name__ == "__main__":
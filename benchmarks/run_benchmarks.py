@@ -0,0 +1,452 @@
+# benchmarks/run_benchmarks.py
+"""
+离线基准测试：覆盖 engine / database / intelligence 的热点路径，
+以及 alert_indexes（10^6 条警报上迁移前后的查询计划与耗时）、
+cold_start（cron 监控进程在新解释器中 import agent 的启动耗时）、
+query_parser（规则解析在样例问题集上的命中率、准确率与耗时）。
+
+用法:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --output new.json --compare bench.json --threshold 1.25
+    python benchmarks/run_benchmarks.py --quick --only engine
+
+结果以JSON保存(每项记录中位数/最小值/运行次数及参数)，便于不同提交之间比较；
+指定 --compare 时，任何一项的中位数超过基线 × threshold 即以非零状态码退出。
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+sys.path.insert(0, str(ROOT))
+
+from models import B2BContract, CompetitiveInput, FinancialInput, ScenarioInput  # noqa: E402
+
+
+def measure(func: Callable[[], None], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict:
+    """运行 repeat 次，返回中位数与最小耗时（秒）。setup 在每次计时前执行且不计入耗时"""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(timings), "min_s": min(timings), "repeat": repeat}
+
+
+# --- engine ---
+
+def _random_financial_input(rng: random.Random, n_contracts: int, months: int) -> FinancialInput:
+    contracts = [
+        B2BContract(
+            contract_name=f"合同{k}",
+            value=rng.uniform(10, 500),
+            sign_date_str=f"{rng.randint(2025, 2028)}-{rng.randint(1, 12):02d}-01",
+            payment_terms_months=rng.randint(0, 24),
+            decay_factor=rng.uniform(0.5, 1.0),
+        )
+        for k in range(n_contracts)
+    ]
+    return FinancialInput(
+        initial_cash=rng.uniform(100, 5000),
+        monthly_burn=rng.uniform(10, 300),
+        b2c_monthly_revenue=rng.uniform(0, 50),
+        b2b_contracts=contracts,
+        months_to_project=months,
+    )
+
+
+def bench_engine(quick: bool) -> Dict[str, Dict]:
+    import engine
+
+    rng = random.Random(0)
+    results = {}
+    repeat = 3 if quick else 10
+    scenario = ScenarioInput(upfront_cost=500, monthly_extra_burn=20, revenue_delay_months=6, monthly_revenue=30)
+
+    horizons = [12, 36] if quick else [12, 36, 120]
+    contract_counts = [0, 10] if quick else [0, 10, 100]
+    for months in horizons:
+        for n_contracts in contract_counts:
+            inputs = _random_financial_input(rng, n_contracts, months)
+            results[f"engine.generate_cash_flow_forecast[months={months},contracts={n_contracts}]"] = {
+                **measure(lambda: engine.generate_cash_flow_forecast(inputs, scenario), repeat, setup=engine.forecast_cache.clear),
+                "params": {"months": months, "contracts": n_contracts},
+            }
+
+    portfolio_size = 1000 if quick else 10000
+    statuses = [
+        CompetitiveInput(
+            tech_barrier_status=rng.choice(CompetitiveInput.model_fields["tech_barrier_status"].annotation.__args__),
+            market_validation_status=rng.choice(CompetitiveInput.model_fields["market_validation_status"].annotation.__args__),
+            team_status=rng.choice(CompetitiveInput.model_fields["team_status"].annotation.__args__),
+        )
+        for _ in range(portfolio_size)
+    ]
+    results[f"engine.score_competitiveness[portfolio={portfolio_size}]"] = {
+        **measure(lambda: [engine.score_competitiveness(s) for s in statuses], repeat),
+        "params": {"portfolio": portfolio_size},
+    }
+
+    n_frames = 100 if quick else 1000
+    frames = [engine.generate_cash_flow_forecast(_random_financial_input(rng, 5, 36)) for _ in range(n_frames)]
+    results[f"engine.calculate_runway_and_score[portfolio={n_frames}]"] = {
+        **measure(lambda: [engine.calculate_runway_and_score(df) for df in frames], repeat, setup=engine.runway_cache.clear),
+        "params": {"portfolio": n_frames},
+    }
+    return results
+
+
+# --- database ---
+
+@contextmanager
+def _temporary_database():
+    import database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with mock.patch.object(database, "DB_FILE", os.path.join(tmp, "bench.db")):
+            database.create_company_table()
+            database.setup_monitoring_tables()
+            yield database
+
+
+def bench_database(quick: bool) -> Dict[str, Dict]:
+    n_rows = 10_000 if quick else 100_000
+    repeat = 3 if quick else 5
+    results = {}
+    with _temporary_database() as database:
+        with database.get_db_connection() as conn:
+            conn.executemany(
+                "INSERT INTO alerts (company_name, alert_text, source_url, news_title, is_read) VALUES (?, ?, ?, ?, ?)",
+                ((f"公司{i % 500}", f"**产品发布**: 样例警报 {i}", f"https://news.example.com/{i}", f"标题 {i}", int(i % 10 != 0))
+                 for i in range(n_rows)),
+            )
+            conn.executemany("INSERT INTO watchlist (company_name) VALUES (?)", ((f"公司{i}",) for i in range(n_rows)))
+
+        params = {"rows": n_rows}
+        results[f"database.get_unread_alerts[rows={n_rows}]"] = {**measure(database.get_unread_alerts, repeat), "params": params}
+        results[f"database.get_watchlist[rows={n_rows}]"] = {**measure(database.get_watchlist, repeat), "params": params}
+
+        counter = iter(range(10**9))
+        batch = 100
+        results[f"database.save_alert[rows={n_rows},calls={batch}]"] = {
+            **measure(lambda: [database.save_alert("公司0", "样例", f"https://bench.example.com/{next(counter)}", "标题") for _ in range(batch)], repeat),
+            "params": {**params, "calls": batch},
+        }
+        results[f"database.add_to_watchlist[rows={n_rows},calls={batch}]"] = {
+            **measure(lambda: [database.add_to_watchlist(f"新公司{next(counter)}") for _ in range(batch)], repeat),
+            "params": {**params, "calls": batch},
+        }
+        results[f"database.save_alerts[rows={n_rows},batch={batch}]"] = {
+            **measure(lambda: database.save_alerts(
+                {"company_name": "公司0", "alert_text": "样例", "source_url": f"https://bench.example.com/{next(counter)}", "news_title": "标题"}
+                for _ in range(batch)), repeat),
+            "params": {**params, "batch": batch},
+        }
+        results[f"database.add_many_to_watchlist[rows={n_rows},batch={batch}]"] = {
+            **measure(lambda: database.add_many_to_watchlist(f"新公司{next(counter)}" for _ in range(batch)), repeat),
+            "params": {**params, "batch": batch},
+        }
+        results[f"database.mark_alert_as_read[rows={n_rows},calls={batch}]"] = {
+            **measure(lambda: [database.mark_alert_as_read(random.randint(1, n_rows)) for _ in range(batch)], repeat),
+            "params": {**params, "calls": batch},
+        }
+
+        # 组合数据：规范化表批量写入，再整体读成数组
+        rng = random.Random(0)
+        n_companies = 200 if quick else 2000
+        competitive = CompetitiveInput(tech_barrier_status='仅有专利或论文 ≥1 件', market_validation_status='仅有战略合作新闻无金额',
+                                       team_status='普通社招为主')
+        portfolio = [(f"组合公司{i}", competitive, _random_financial_input(rng, 5, 36)) for i in range(n_companies)]
+        results[f"database.save_companies_data[companies={n_companies}]"] = {
+            **measure(lambda: database.save_companies_data(iter(portfolio)), repeat),
+            "params": {"companies": n_companies},
+        }
+        results[f"database.load_portfolio_arrays[companies={n_companies}]"] = {
+            **measure(database.load_portfolio_arrays, repeat),
+            "params": {"companies": n_companies},
+        }
+    return results
+
+
+ALERT_INDEX_QUERIES = {
+    "unread": ("SELECT * FROM alerts WHERE is_read = 0 ORDER BY created_at DESC", ()),
+    "unread_page": ("SELECT * FROM alerts WHERE is_read = 0 ORDER BY created_at DESC LIMIT 50", ()),
+    "company_page": ("SELECT * FROM alerts WHERE company_name = ? ORDER BY created_at DESC LIMIT 50", ("公司42",)),
+}
+
+
+def _query_plan(conn, sql: str, args: tuple) -> List[str]:
+    return [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", args)]
+
+
+def bench_alert_indexes(quick: bool) -> Dict[str, Dict]:
+    """在 10^6 条警报（--quick 为 10^5）上对比迁移前后（无索引 / 有索引）的查询计划与耗时"""
+    n_rows = 100_000 if quick else 1_000_000
+    repeat = 3 if quick else 5
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        import database
+
+        with mock.patch.object(database, "DB_FILE", os.path.join(tmp, "bench_indexes.db")):
+            with mock.patch.object(database, "apply_migrations", lambda *a, **k: []):
+                database.setup_monitoring_tables()
+            with database.get_db_connection() as conn:
+                # 约 10% 未读，created_at 在两年内均匀分布
+                conn.executemany(
+                    "INSERT INTO alerts (company_name, alert_text, source_url, news_title, created_at, is_read) VALUES (?, ?, ?, ?, ?, ?)",
+                    ((f"公司{i % 500}", f"**产品发布**: 样例警报 {i}", f"https://news.example.com/{i}", f"标题 {i}",
+                      time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(1_700_000_000 + (i * 7919) % 63_072_000)), int(i % 10 != 0))
+                     for i in range(n_rows)),
+                )
+
+            for stage in ("before", "after"):
+                if stage == "after":
+                    start = time.perf_counter()
+                    database.apply_migrations()
+                    elapsed = time.perf_counter() - start
+                    results[f"database.apply_migrations[rows={n_rows}]"] = {
+                        "median_s": elapsed, "min_s": elapsed, "repeat": 1,
+                        "params": {"rows": n_rows, "schema_version": database.get_schema_version()},
+                    }
+                for name, (sql, args) in ALERT_INDEX_QUERIES.items():
+                    with database.get_db_connection() as conn:
+                        plan = _query_plan(conn, sql, args)
+                        timing = measure(lambda: conn.execute(sql, args).fetchall(), repeat)
+                    results[f"database.alerts_{name}[rows={n_rows},{stage}]"] = {
+                        **timing, "params": {"rows": n_rows, "stage": stage}, "plan": plan,
+                    }
+            database.close_all_connections()
+    return results
+
+
+# --- intelligence ---
+
+class _FixtureResponse:
+    def __init__(self, body: bytes, status_code: int = 200):
+        self.content = body
+        self.text = body.decode("utf-8")
+        self.status_code = status_code
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.exceptions.HTTPError(f"{self.status_code} fixture error", response=self)
+
+    def json(self):
+        return json.loads(self.text)
+
+    def iter_content(self, chunk_size: int = 1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def _fixture_get(url: str, *args, **kwargs) -> _FixtureResponse:
+    """按URL返回本地fixture，不访问网络。Jina Reader 返回503以走 BeautifulSoup 解析路径"""
+    if url.startswith("https://r.jina.ai/"):
+        return _FixtureResponse(b"unavailable", status_code=503)
+    if "bing.com/news" in url:
+        return _FixtureResponse((FIXTURES / "bing_news_rss.xml").read_bytes())
+    return _FixtureResponse((FIXTURES / "article.html").read_bytes())
+
+
+class _FixtureSession:
+    def get(self, url: str, *args, **kwargs) -> _FixtureResponse:
+        return _fixture_get(url)
+
+
+def bench_intelligence(quick: bool) -> Dict[str, Dict]:
+    import intelligence
+    from reporting import Reporter
+
+    repeat = 5 if quick else 20
+    results = {}
+    with mock.patch.object(intelligence, "NEWS_API_KEY", None), \
+            mock.patch.object(intelligence, "get_session", _FixtureSession), \
+            mock.patch.object(intelligence.web_cache, "get_entry", lambda *a, **k: None), \
+            mock.patch.object(intelligence.web_cache, "put_entry", lambda *a, **k: None), \
+            mock.patch.object(intelligence, "_load_aliases", dict), \
+            mock.patch.object(intelligence, "get_reporter", lambda: Reporter(sink=lambda event: None)):
+        browse = getattr(intelligence.browse_article_text, "__wrapped__", intelligence.browse_article_text)
+        search = getattr(intelligence.search_news_links, "__wrapped__", intelligence.search_news_links)
+        results["intelligence.browse_article_text[fixture=article.html]"] = {
+            **measure(lambda: browse("https://news.example.com/articles/1.html"), repeat),
+            "params": {"fixture": "article.html"},
+        }
+        results["intelligence.search_news_links[fixture=bing_news_rss.xml]"] = {
+            **measure(lambda: search("月之暗面", num_articles=5), repeat),
+            "params": {"fixture": "bing_news_rss.xml"},
+        }
+    return results
+
+
+# --- cold start ---
+
+HEAVY_MODULES = ("streamlit", "trafilatura", "langchain", "pandas")
+_COLD_START_SNIPPET = (
+    "import sys, time; t = time.perf_counter(); {preload}import agent; "
+    "print(time.perf_counter() - t); print(','.join(m for m in {heavy!r} if m in sys.modules))"
+)
+
+
+def bench_cold_start(quick: bool) -> Dict[str, Dict]:
+    """
+    在新的解释器进程中测量 cron 监控进程的启动（import agent）耗时。
+    preload 组合模拟改造前会被连带导入的重量级依赖，用于对比节省的启动时间。
+    """
+    import subprocess
+
+    repeat = 3 if quick else 7
+    variants = {
+        "headless": "",
+        "preload=streamlit+trafilatura+pandas": "import streamlit, trafilatura, pandas; ",
+    }
+    results = {}
+    for name, preload in variants.items():
+        timings, loaded = [], ""
+        for _ in range(repeat):
+            out = subprocess.run(
+                [sys.executable, "-c", _COLD_START_SNIPPET.format(preload=preload, heavy=HEAVY_MODULES)],
+                cwd=ROOT, capture_output=True, text=True, check=True,
+            ).stdout.splitlines()
+            timings.append(float(out[0]))
+            loaded = out[1] if len(out) > 1 else ""
+        results[f"cold_start.import_agent[{name}]"] = {
+            "median_s": statistics.median(timings), "min_s": min(timings), "repeat": repeat,
+            "params": {"variant": name, "heavy_modules_loaded": loaded.split(",") if loaded else []},
+        }
+    return results
+
+
+# --- query parser ---
+
+def bench_query_parser(quick: bool) -> Dict[str, Dict]:
+    """
+    在 fixtures/financial_queries.json 上评估规则解析：expected 为 null 的问题应判定为置信度不足（回退 LLM），
+    其余问题应以高置信度解析出与 expected 一致的字段。hit_rate 为跳过 LLM 的比例。
+    """
+    import models
+    from query_parser import parse_query
+
+    corpus = json.loads((FIXTURES / "financial_queries.json").read_text(encoding="utf-8"))
+    confident = correct = wrong_confident = 0
+    for item in corpus:
+        model = getattr(models, item["model"])
+        parsed = parse_query(item["query"], model)
+        expected = item["expected"]
+        matches = expected is not None and all(
+            parsed["values"].get(name, model.model_fields[name].default) == value for name, value in expected.items())
+        confident += parsed["confident"]
+        correct += matches and parsed["confident"] or (expected is None and not parsed["confident"])
+        wrong_confident += parsed["confident"] and not matches
+
+    repeat = 20 if quick else 100
+    timing = measure(lambda: [parse_query(item["query"], getattr(models, item["model"])) for item in corpus], repeat)
+    total = len(corpus)
+    return {
+        f"query_parser.parse_query[corpus={total}]": {
+            **timing,
+            "params": {
+                "queries": total,
+                "hit_rate": round(confident / total, 3),
+                "accuracy": round(correct / total, 3),
+                "wrong_confident": wrong_confident,
+            },
+            "notes": [f"命中率 {confident}/{total}（跳过LLM），结果正确 {correct}/{total}，高置信度但解析错误 {wrong_confident}"],
+        }
+    }
+
+
+SUITES = {
+    "engine": bench_engine,
+    "database": bench_database,
+    "alert_indexes": bench_alert_indexes,
+    "intelligence": bench_intelligence,
+    "cold_start": bench_cold_start,
+    "query_parser": bench_query_parser,
+}
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """返回中位数超过 基线 × threshold 的基准项说明"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        ratio = current["median_s"] / previous["median_s"] if previous["median_s"] else float("inf")
+        current["baseline_median_s"] = previous["median_s"]
+        current["ratio"] = round(ratio, 3)
+        if ratio > threshold:
+            regressions.append(f"{name}: {previous['median_s']*1000:.2f}ms -> {current['median_s']*1000:.2f}ms (x{ratio:.2f})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="DataAnalyzer 离线基准测试")
+    parser.add_argument("--output", help="结果JSON输出路径")
+    parser.add_argument("--compare", help="用于回归检查的基线JSON")
+    parser.add_argument("--threshold", type=float, default=1.25, help="允许的中位数耗时倍数上限 (默认 1.25)")
+    parser.add_argument("--only", choices=sorted(SUITES), action="append", help="只运行指定的基准组，可重复")
+    parser.add_argument("--quick", action="store_true", help="缩小数据规模，用于快速冒烟")
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Dict] = {}
+    for suite in args.only or SUITES:
+        print(f"运行 {suite} 基准...")
+        results.update(SUITES[suite](args.quick))
+
+    regressions = []
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))["results"]
+        regressions = compare(results, baseline, args.threshold)
+
+    for name, r in results.items():
+        suffix = f"  (x{r['ratio']:.2f} vs 基线)" if "ratio" in r else ""
+        print(f"{name:<80} {r['median_s']*1000:10.3f} ms{suffix}")
+        for detail in r.get("plan", []):
+            print(f"    QUERY PLAN: {detail}")
+        for note in r.get("notes", []):
+            print(f"    {note}")
+
+    if args.output:
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "results": results,
+        }
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"结果已写入 {args.output}")
+
+    if regressions:
+        print("\n性能回归:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# cache.py
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, Optional
+
+from pydantic import BaseModel
+
+_MISSING = object()
+
+
+def _to_canonical(obj: Any) -> Any:
+    """把 pydantic 模型及常见容器转换为可稳定序列化的结构"""
+    if isinstance(obj, BaseModel):
+        return {"__model__": type(obj).__name__, **_to_canonical(obj.model_dump(mode="json"))}
+    if isinstance(obj, dict):
+        return {str(k): _to_canonical(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_canonical(v) for v in obj]
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    return str(obj)
+
+
+def canonical_hash(*parts: Any) -> str:
+    """对任意组合的 pydantic 模型/基础类型计算内容哈希，字段顺序不影响结果"""
+    payload = json.dumps(_to_canonical(list(parts)), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """
+    线程安全、有容量上限和过期时间(TTL)的LRU缓存，不依赖Streamlit，
+    可在cron、批处理任务中使用，并统计命中/未命中/淘汰次数。
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class SingleFlight:
+    """
+    合并同一键上的并发调用：第一个调用者(leader)真正执行，
+    其余调用者等待并共享同一结果（或异常），避免重复的昂贵请求。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: "dict[Hashable, Future]" = {}
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
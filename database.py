@@ -1,19 +1,148 @@
 # database.py
 
+import atexit
 import json
+import os
 import sqlite3
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
 from models import CompetitiveInput, FinancialInput
+from url_index import BloomFilter, canonicalize_url
 
-DB_FILE = "companies_data.db"
+DB_FILE = os.getenv("DB_FILE", "companies_data.db")
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False) # check_same_thread=False for Streamlit
-    conn.row_factory = sqlite3.Row
-    return conn
+# --- 连接管理 ---
+# 连接池按数据库文件复用连接（及其预编译语句缓存），不再每次调用都重新打开。
+# WAL 模式下读写互不阻塞，cron Agent 和 Streamlit UI 可以同时访问同一个库。
+BUSY_TIMEOUT_SECONDS = 10
+MAX_IDLE_CONNECTIONS = 8
+CACHED_STATEMENTS = 256
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",      # WAL 下 NORMAL 已保证一致性，只在检查点时 fsync
+    "PRAGMA cache_size = -32000",       # 约 32MB 页缓存
+    "PRAGMA mmap_size = 268435456",     # 256MB 内存映射读
+    "PRAGMA temp_store = MEMORY",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_SECONDS * 1000}",
+)
+
+class ConnectionPool:
+    """单个数据库文件的连接池；借出的连接在 with 块结束时自动提交/回滚并归还"""
+
+    def __init__(self, db_file: str, max_idle: int = MAX_IDLE_CONNECTIONS):
+        self.db_file = db_file
+        self.max_idle = max_idle
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        # check_same_thread=False: Streamlit 每次 rerun 可能在不同线程，连接在线程间借用
+        conn = sqlite3.connect(self.db_file, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False,
+                               cached_statements=CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._open()
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+class PooledConnection:
+    """
+    包装借出的 sqlite3 连接，用法与原来的 sqlite3.Connection 相同：
+    `with get_db_connection() as conn:` 退出时提交（异常时回滚）并把连接还给连接池。
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        self._pool = pool
+        self._conn: Optional[sqlite3.Connection] = pool.acquire()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            return self._conn.__exit__(exc_type, exc, tb)
+        finally:
+            self.close()
+
+    def close(self):
+        """归还连接（而不是真正关闭）"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __del__(self):
+        # 调用方未使用 with 时，在对象回收时归还
+        try:
+            self.close()
+        except Exception:
+            pass
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def _get_pool(db_file: str) -> ConnectionPool:
+    with _pools_lock:
+        pool = _pools.get(db_file)
+        if pool is None:
+            pool = _pools[db_file] = ConnectionPool(db_file)
+        return pool
+
+def get_db_connection(db_file: Optional[str] = None) -> PooledConnection:
+    """从连接池借出一个连接（默认业务库 DB_FILE）"""
+    return PooledConnection(_get_pool(db_file or DB_FILE))
+
+@atexit.register
+def close_all_connections():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
+
+def _executemany_counted(conn, sql: str, rows: Iterable) -> dict:
+    """
+    在调用方的事务中批量执行写入，rows 可以是生成器（逐行消费，不整体载入内存）。
+    返回 {'inserted': 实际写入行数, 'ignored': 因冲突被忽略的行数}
+    """
+    submitted = 0
+    def counting(rows):
+        nonlocal submitted
+        for row in rows:
+            submitted += 1
+            yield row
+    before = conn.total_changes
+    conn.executemany(sql, counting(rows))
+    inserted = conn.total_changes - before
+    return {"inserted": inserted, "ignored": submitted - inserted}
 
 # --- 公司数据存储相关 ---
 
 def create_company_table():
+    # competitive_data / financial_data 为旧版的 JSON 文本列，迁移 3 之后数据存放在规范化表中
     with get_db_connection() as conn:
         conn.execute('''
             CREATE TABLE IF NOT EXISTS companies (
@@ -24,14 +153,56 @@ def create_company_table():
             )
         ''')
 
+@lru_cache(maxsize=4096)
+def _sign_month(sign_date_str: str) -> Tuple[int, int]:
+    import pandas as pd  # 与 engine 使用相同的日期解析；延迟导入以免拖慢 cron 监控进程的启动
+    ts = pd.to_datetime(sign_date_str)
+    return ts.year, ts.month
+
+def _payment_month(sign_date_str: str, payment_terms_months: int) -> str:
+    """合同预计回款月份 'YYYY-MM'（签约月 + 账期，与 engine 的回款口径一致）"""
+    year, month = _sign_month(sign_date_str)
+    year, month0 = divmod(year * 12 + month - 1 + payment_terms_months, 12)
+    return f"{year:04d}-{month0 + 1:02d}"
+
+def _write_company(conn, company_name: str, competitive_input: CompetitiveInput, financial_input: FinancialInput) -> bool:
+    """把一家公司的数据写入规范化表（覆盖已有数据），在调用方的事务中执行；返回是否为新公司"""
+    created = conn.execute("INSERT INTO companies (name) VALUES (?) ON CONFLICT(name) DO NOTHING", (company_name,)).rowcount == 1
+    company_id = conn.execute("SELECT id FROM companies WHERE name = ?", (company_name,)).fetchone()['id']
+    conn.execute('''
+        INSERT OR REPLACE INTO company_competitive (company_id, tech_barrier_status, market_validation_status, team_status)
+        VALUES (?, ?, ?, ?)
+    ''', (company_id, competitive_input.tech_barrier_status, competitive_input.market_validation_status, competitive_input.team_status))
+    conn.execute('''
+        INSERT OR REPLACE INTO company_financials (company_id, initial_cash, monthly_burn, b2c_monthly_revenue, months_to_project)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (company_id, financial_input.initial_cash, financial_input.monthly_burn,
+          financial_input.b2c_monthly_revenue, financial_input.months_to_project))
+    conn.execute("DELETE FROM b2b_contracts WHERE company_id = ?", (company_id,))
+    conn.executemany('''
+        INSERT INTO b2b_contracts (company_id, contract_name, value, sign_date, payment_terms_months, decay_factor, payment_month)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [(company_id, c.contract_name, c.value, c.sign_date_str, c.payment_terms_months, c.decay_factor,
+           _payment_month(c.sign_date_str, c.payment_terms_months)) for c in financial_input.b2b_contracts])
+    return created
+
 def save_company_data(company_name: str, competitive_input: CompetitiveInput, financial_input: FinancialInput):
     with get_db_connection() as conn:
-        competitive_json = competitive_input.model_dump_json()
-        financial_json = financial_input.model_dump_json()
-        conn.execute('''
-            INSERT OR REPLACE INTO companies (name, competitive_data, financial_data)
-            VALUES (?, ?, ?)
-        ''', (company_name, competitive_json, financial_json))
+        _write_company(conn, company_name, competitive_input, financial_input)
+
+def save_companies_data(companies: Iterable[Tuple[str, CompetitiveInput, FinancialInput]]) -> dict:
+    """
+    批量保存 (公司名, 竞争力输入, 财务输入)，在单个事务内完成；已存在的公司会被覆盖而不是忽略。
+    返回 {'inserted': 新增公司数, 'updated': 被覆盖的已有公司数}
+    """
+    inserted = updated = 0
+    with get_db_connection() as conn:
+        for company_name, competitive_input, financial_input in companies:
+            if _write_company(conn, company_name, competitive_input, financial_input):
+                inserted += 1
+            else:
+                updated += 1
+    return {"inserted": inserted, "updated": updated}
 
 def get_all_company_names() -> list:
     with get_db_connection() as conn:
@@ -40,17 +211,90 @@ def get_all_company_names() -> list:
 
 def load_company_data(company_name: str) -> tuple:
     with get_db_connection() as conn:
-        data = conn.execute("SELECT * FROM companies WHERE name = ?", (company_name,)).fetchone()
-    
-    if data:
-        competitive_data = json.loads(data['competitive_data'])
-        financial_data = json.loads(data['financial_data'])
-        return competitive_data, financial_data
-    return None, None
+        data = conn.execute('''
+            SELECT c.id, cc.tech_barrier_status, cc.market_validation_status, cc.team_status,
+                   f.initial_cash, f.monthly_burn, f.b2c_monthly_revenue, f.months_to_project
+            FROM companies c
+            JOIN company_competitive cc ON cc.company_id = c.id
+            JOIN company_financials f ON f.company_id = c.id
+            WHERE c.name = ?
+        ''', (company_name,)).fetchone()
+        if not data:
+            return None, None
+        contracts = conn.execute('''
+            SELECT contract_name, value, sign_date AS sign_date_str, payment_terms_months, decay_factor
+            FROM b2b_contracts WHERE company_id = ? ORDER BY id
+        ''', (data['id'],)).fetchall()
+
+    competitive_data = {k: data[k] for k in ('tech_barrier_status', 'market_validation_status', 'team_status')}
+    financial_data = {k: data[k] for k in ('initial_cash', 'monthly_burn', 'b2c_monthly_revenue', 'months_to_project')}
+    financial_data['b2b_contracts'] = [dict(row) for row in contracts]
+    return competitive_data, financial_data
 
 def delete_company_data(company_name: str):
     with get_db_connection() as conn:
-        conn.execute("DELETE FROM companies WHERE name = ?", (company_name,))
+        row = conn.execute("SELECT id FROM companies WHERE name = ?", (company_name,)).fetchone()
+        if not row:
+            return
+        for table in ("b2b_contracts", "company_financials", "company_competitive"):
+            conn.execute(f"DELETE FROM {table} WHERE company_id = ?", (row['id'],))
+        conn.execute("DELETE FROM companies WHERE id = ?", (row['id'],))
+
+# --- 组合层面的查询 ---
+
+def find_companies_by_burn(min_monthly_burn: float) -> list:
+    """月消耗高于 min_monthly_burn 的公司，按月消耗从高到低"""
+    with get_db_connection() as conn:
+        cursor = conn.execute('''
+            SELECT c.name, f.initial_cash, f.monthly_burn, f.b2c_monthly_revenue
+            FROM company_financials f JOIN companies c ON c.id = f.company_id
+            WHERE f.monthly_burn > ? ORDER BY f.monthly_burn DESC
+        ''', (min_monthly_burn,))
+        return [dict(row) for row in cursor.fetchall()]
+
+def get_b2b_value_due(start_month: str, end_month: str) -> dict:
+    """回款月份落在 [start_month, end_month]（'YYYY-MM'）内的B2B合同总额及按 decay_factor 折算后的预期金额"""
+    with get_db_connection() as conn:
+        row = conn.execute('''
+            SELECT COUNT(*) AS contracts, COALESCE(SUM(value), 0) AS total_value,
+                   COALESCE(SUM(value * decay_factor), 0) AS expected_value
+            FROM b2b_contracts WHERE payment_month BETWEEN ? AND ?
+        ''', (start_month, end_month)).fetchone()
+        return dict(row)
+
+def load_portfolio_arrays(company_names: Optional[List[str]] = None) -> dict:
+    """
+    一次性把整个组合（或指定公司）读成按列存储的 numpy 数组，可直接交给 engine.forecast_portfolio_arrays，
+    不需要为每家公司构建 pydantic 模型。names 给出各行对应的公司名。
+    """
+    import numpy as np  # 只有组合分析用到，延迟导入
+    with get_db_connection() as conn:
+        rows = conn.execute('''
+            SELECT c.id, c.name, f.initial_cash, f.monthly_burn, f.b2c_monthly_revenue, f.months_to_project
+            FROM company_financials f JOIN companies c ON c.id = f.company_id ORDER BY c.name
+        ''').fetchall()
+        if company_names is not None:
+            wanted = set(company_names)
+            rows = [row for row in rows if row['name'] in wanted]
+        index_of = {row['id']: i for i, row in enumerate(rows)}
+        # 回款月序号 = 年 * 12 + 月 - 1，与 engine 的月份序号一致
+        contracts = [row for row in conn.execute('''
+            SELECT company_id, value, decay_factor,
+                   CAST(substr(payment_month, 1, 4) AS INTEGER) * 12 + CAST(substr(payment_month, 6, 2) AS INTEGER) - 1 AS payment_ordinal
+            FROM b2b_contracts ORDER BY company_id, id
+        ''') if row['company_id'] in index_of]
+
+    return {
+        "names": [row['name'] for row in rows],
+        "initial_cash": np.array([row['initial_cash'] for row in rows], dtype=float),
+        "monthly_burn": np.array([row['monthly_burn'] for row in rows], dtype=float),
+        "b2c_monthly_revenue": np.array([row['b2c_monthly_revenue'] for row in rows], dtype=float),
+        "months_to_project": np.array([row['months_to_project'] for row in rows], dtype=np.int64),
+        "contract_company": np.array([index_of[row['company_id']] for row in contracts], dtype=np.int64),
+        "contract_value": np.array([row['value'] for row in contracts], dtype=float),
+        "contract_decay": np.array([row['decay_factor'] for row in contracts], dtype=float),
+        "contract_payment_ordinal": np.array([row['payment_ordinal'] for row in contracts], dtype=np.int64),
+    }
 
 # --- 后台监控Agent相关 ---
 
@@ -76,6 +320,166 @@ def setup_monitoring_tables():
                 is_read INTEGER DEFAULT 0
             )
         ''')
+        # 公司别名（如 月之暗面 / 北京月之暗面科技有限公司 / Moonshot AI），用于新闻相关性匹配
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS company_aliases (
+                id INTEGER PRIMARY KEY,
+                company_name TEXT NOT NULL,
+                alias TEXT NOT NULL,
+                UNIQUE (company_name, alias)
+            )
+        ''')
+    apply_migrations()
+
+# --- 数据库结构迁移 ---
+# 每项为 (版本号, 说明, 步骤列表)，步骤为 SQL 语句或接收连接的函数（用于数据回填）。
+# 已发布的迁移不再修改，新的结构变更只追加新版本。
+
+def _backfill_processed_urls(conn):
+    rows = conn.execute("SELECT source_url, company_name, created_at FROM alerts WHERE source_url IS NOT NULL").fetchall()
+    conn.executemany(
+        "INSERT OR IGNORE INTO processed_urls (url, company_name, processed_at) VALUES (?, ?, ?)",
+        ((canonicalize_url(row['source_url']), row['company_name'], row['created_at']) for row in rows),
+    )
+
+def _migrate_company_blobs(conn):
+    """把 companies 表中的 JSON 文本拆分写入规范化表，随后清空旧列"""
+    rows = conn.execute("SELECT name, competitive_data, financial_data FROM companies WHERE financial_data IS NOT NULL").fetchall()
+    for row in rows:
+        _write_company(conn, row['name'], CompetitiveInput.model_validate_json(row['competitive_data']),
+                       FinancialInput.model_validate_json(row['financial_data']))
+    conn.execute("UPDATE companies SET competitive_data = NULL, financial_data = NULL")
+
+MIGRATIONS = [
+    (1, "警报查询索引：未读警报按时间倒序的部分索引、按公司查询警报的索引", [
+        # 侧边栏查询 WHERE is_read = 0 ORDER BY created_at DESC 直接按索引顺序读取，无需全表扫描和排序；
+        # 部分索引只包含未读行，体积随未读数而非历史警报总数增长
+        "CREATE INDEX IF NOT EXISTS idx_alerts_unread_created ON alerts (created_at DESC, id DESC) WHERE is_read = 0",
+        "CREATE INDEX IF NOT EXISTS idx_alerts_company_created ON alerts (company_name, created_at DESC)",
+    ]),
+    (2, "已处理URL表（规范化URL为主键），并从已有警报回填", [
+        '''
+        CREATE TABLE IF NOT EXISTS processed_urls (
+            url TEXT PRIMARY KEY,
+            company_name TEXT,
+            processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+        ''',
+        _backfill_processed_urls,
+    ]),
+    (3, "公司数据规范化：财务参数、B2B合同、竞争力状态拆为独立的表，并从 JSON 文本迁移", [
+        # 只调用了 setup_monitoring_tables 的库也能完成迁移
+        '''
+        CREATE TABLE IF NOT EXISTS companies (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            competitive_data TEXT,
+            financial_data TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS company_financials (
+            company_id INTEGER PRIMARY KEY,
+            initial_cash REAL NOT NULL,
+            monthly_burn REAL NOT NULL,
+            b2c_monthly_revenue REAL NOT NULL DEFAULT 0,
+            months_to_project INTEGER NOT NULL DEFAULT 36
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_company_financials_burn ON company_financials (monthly_burn)",
+        '''
+        CREATE TABLE IF NOT EXISTS b2b_contracts (
+            id INTEGER PRIMARY KEY,
+            company_id INTEGER NOT NULL,
+            contract_name TEXT NOT NULL,
+            value REAL NOT NULL,
+            sign_date TEXT NOT NULL,
+            payment_terms_months INTEGER NOT NULL,
+            decay_factor REAL NOT NULL,
+            payment_month TEXT NOT NULL
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_b2b_contracts_company ON b2b_contracts (company_id)",
+        "CREATE INDEX IF NOT EXISTS idx_b2b_contracts_payment_month ON b2b_contracts (payment_month)",
+        '''
+        CREATE TABLE IF NOT EXISTS company_competitive (
+            company_id INTEGER PRIMARY KEY,
+            tech_barrier_status TEXT NOT NULL,
+            market_validation_status TEXT NOT NULL,
+            team_status TEXT NOT NULL
+        )
+        ''',
+        _migrate_company_blobs,
+    ]),
+    (4, "后台任务队列：任务表（同一 dedup_key 同时只允许一个排队/运行中的任务）与工作进程心跳表", [
+        '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            dedup_key TEXT,
+            params TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            worker_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            heartbeat_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        ''',
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_dedup ON jobs (dedup_key) WHERE status IN ('queued', 'running')",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_queued ON jobs (id) WHERE status = 'queued'",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_running_heartbeat ON jobs (heartbeat_at) WHERE status = 'running'",
+        '''
+        CREATE TABLE IF NOT EXISTS job_workers (
+            worker_id TEXT PRIMARY KEY,
+            pid INTEGER NOT NULL,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            heartbeat_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    (5, "任务认领次数：每次认领加一，超过上限的无响应任务不再重新排队", [
+        "ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0",
+    ]),
+]
+
+def get_schema_version() -> int:
+    """当前已应用的迁移版本（未迁移过的库为 0）"""
+    with get_db_connection() as conn:
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'").fetchone()
+        if not exists:
+            return 0
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0]
+
+def apply_migrations(target_version: Optional[int] = None) -> list:
+    """按版本顺序应用尚未执行的迁移，返回本次应用的版本号列表"""
+    applied = []
+    with get_db_connection() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # 在写事务内读取版本号：Agent 与 UI 同时启动时只有一方执行迁移，另一方等待后看到新版本
+        conn.execute("BEGIN IMMEDIATE")
+        current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0]
+        for version, description, statements in MIGRATIONS:
+            if version <= current or (target_version is not None and version > target_version):
+                continue
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute("INSERT INTO schema_migrations (version, description) VALUES (?, ?)", (version, description))
+            applied.append(version)
+    return applied
 
 def get_watchlist() -> list:
     """获取所有在监视列表中的公司名称"""
@@ -88,11 +492,31 @@ def add_to_watchlist(company_name: str):
     with get_db_connection() as conn:
         conn.execute("INSERT OR IGNORE INTO watchlist (company_name) VALUES (?)", (company_name,))
 
+def add_many_to_watchlist(company_names: Iterable[str]) -> dict:
+    """批量添加到监视列表（单个事务），返回新增/已存在的数量"""
+    with get_db_connection() as conn:
+        return _executemany_counted(conn, "INSERT OR IGNORE INTO watchlist (company_name) VALUES (?)",
+                                    ((name,) for name in company_names))
+
 def remove_from_watchlist(company_name: str):
     """从监视列表移除公司"""
     with get_db_connection() as conn:
         conn.execute("DELETE FROM watchlist WHERE company_name = ?", (company_name,))
 
+def add_company_alias(company_name: str, alias: str):
+    """为公司添加一个别名"""
+    with get_db_connection() as conn:
+        conn.execute("INSERT OR IGNORE INTO company_aliases (company_name, alias) VALUES (?, ?)", (company_name, alias))
+
+def get_company_aliases() -> dict:
+    """获取所有公司的别名，返回 {公司名: [别名, ...]}"""
+    with get_db_connection() as conn:
+        cursor = conn.execute("SELECT company_name, alias FROM company_aliases ORDER BY company_name, alias")
+        aliases = {}
+        for row in cursor.fetchall():
+            aliases.setdefault(row['company_name'], []).append(row['alias'])
+        return aliases
+
 def save_alert(company_name: str, alert_text: str, source_url: str, news_title: str):
     """保存新的警报"""
     with get_db_connection() as conn:
@@ -101,13 +525,257 @@ def save_alert(company_name: str, alert_text: str, source_url: str, news_title:
             VALUES (?, ?, ?, ?)
         """, (company_name, alert_text, source_url, news_title))
 
+def get_recent_alert_counts(days: int = 7) -> dict:
+    """最近 days 天内每家公司的警报数 {公司名: 数量}"""
+    with get_db_connection() as conn:
+        cursor = conn.execute(
+            "SELECT company_name, COUNT(*) AS n FROM alerts WHERE created_at >= datetime('now', ?) GROUP BY company_name",
+            (f"-{int(days)} days",),
+        )
+        return {row['company_name']: row['n'] for row in cursor.fetchall()}
+
+def save_alerts(alerts: Iterable[Dict]) -> dict:
+    """
+    批量保存警报（单个事务）。每项为含 company_name/alert_text/source_url/news_title 的 dict；
+    source_url 已存在的警报会被忽略，返回 {'inserted': ..., 'ignored': ...}
+    """
+    with get_db_connection() as conn:
+        return _executemany_counted(conn, """
+            INSERT OR IGNORE INTO alerts (company_name, alert_text, source_url, news_title)
+            VALUES (?, ?, ?, ?)
+        """, ((a['company_name'], a['alert_text'], a['source_url'], a['news_title']) for a in alerts))
+
 def get_unread_alerts() -> list:
     """获取所有未读的警报"""
     with get_db_connection() as conn:
         cursor = conn.execute("SELECT * FROM alerts WHERE is_read = 0 ORDER BY created_at DESC")
         return [dict(row) for row in cursor.fetchall()]
 
+ALERT_PAGE_SIZE = 20
+
+def get_unread_alert_count() -> int:
+    """未读警报数量（只扫描未读部分索引，不读取警报正文）"""
+    with get_db_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM alerts WHERE is_read = 0").fetchone()[0]
+
+def get_unread_alerts_page(limit: int = ALERT_PAGE_SIZE, cursor: Optional[tuple] = None) -> dict:
+    """
+    按 (created_at, id) 倒序对未读警报做键集分页。
+    cursor 为上一页返回的 next_cursor；返回 {'alerts': [...], 'next_cursor': (created_at, id) 或 None}。
+    与 OFFSET 分页不同，翻到任意深度都只需沿索引定位一次。
+    """
+    with get_db_connection() as conn:
+        if cursor is None:
+            rows = conn.execute(
+                "SELECT * FROM alerts WHERE is_read = 0 ORDER BY created_at DESC, id DESC LIMIT ?", (limit + 1,)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT * FROM alerts WHERE is_read = 0 AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?",
+                (*cursor, limit + 1),
+            ).fetchall()
+    alerts = [dict(row) for row in rows[:limit]]
+    next_cursor = (alerts[-1]['created_at'], alerts[-1]['id']) if len(rows) > limit else None
+    return {"alerts": alerts, "next_cursor": next_cursor}
+
+def get_max_alert_id() -> int:
+    """当前最大的警报 id，作为增量拉取的起点"""
+    with get_db_connection() as conn:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM alerts").fetchone()[0]
+
+def get_unread_alerts_since(last_seen_id: int, limit: int = ALERT_PAGE_SIZE) -> list:
+    """增量获取 id 大于 last_seen_id 的未读警报（按 id 升序），用于只拉取上次刷新之后新增的警报"""
+    with get_db_connection() as conn:
+        cursor = conn.execute("SELECT * FROM alerts WHERE id > ? AND is_read = 0 ORDER BY id LIMIT ?", (last_seen_id, limit))
+        return [dict(row) for row in cursor.fetchall()]
+
+def get_unread_alert_ids(alert_ids: Iterable[int]) -> set:
+    """alert_ids 中仍未读的 id（用于剔除已在其他会话中标记为已读的警报）"""
+    alert_ids = list(alert_ids)
+    if not alert_ids:
+        return set()
+    with get_db_connection() as conn:
+        placeholders = ", ".join("?" * len(alert_ids))
+        cursor = conn.execute(f"SELECT id FROM alerts WHERE is_read = 0 AND id IN ({placeholders})", alert_ids)
+        return {row['id'] for row in cursor.fetchall()}
+
 def mark_alert_as_read(alert_id: int):
     """将警报标记为已读"""
     with get_db_connection() as conn:
-        conn.execute("UPDATE alerts SET is_read = 1 WHERE id = ?", (alert_id,))
\ No newline at end of file
+        conn.execute("UPDATE alerts SET is_read = 1 WHERE id = ?", (alert_id,))
+# --- 已处理URL ---
+# 监控Agent处理过（生成警报或确认为重复报道）的文章URL，与警报是否已读无关
+
+def is_url_processed(url: str) -> bool:
+    """按规范化URL做主键查找"""
+    with get_db_connection() as conn:
+        return conn.execute("SELECT 1 FROM processed_urls WHERE url = ?", (canonicalize_url(url),)).fetchone() is not None
+
+def mark_url_processed(url: str, company_name: Optional[str] = None):
+    """记录已处理的URL（重复记录会被忽略）"""
+    with get_db_connection() as conn:
+        conn.execute("INSERT OR IGNORE INTO processed_urls (url, company_name) VALUES (?, ?)", (canonicalize_url(url), company_name))
+
+def mark_urls_processed(entries: Iterable[Tuple[str, Optional[str]]]) -> dict:
+    """批量记录 (URL, 公司名)，单个事务内完成"""
+    with get_db_connection() as conn:
+        return _executemany_counted(conn, "INSERT OR IGNORE INTO processed_urls (url, company_name) VALUES (?, ?)",
+                                    ((canonicalize_url(url), company_name) for url, company_name in entries))
+
+class ProcessedUrlIndex:
+    """
+    已处理URL的查询入口：可选地在内存中维护一个布隆过滤器，
+    过滤器判定"不存在"的URL直接视为新URL，其余再查 processed_urls 主键确认。
+    过滤器只包含构建时表中已有的URL和经由本实例写入的URL；其他进程（如任务队列工作进程）
+    之后写入的URL要在 refresh() 之后才会被识别，长期复用同一实例时应在每轮检查前调用。
+    """
+
+    def __init__(self, use_bloom_filter: bool = False, error_rate: float = 0.001):
+        self.use_bloom_filter = use_bloom_filter
+        self._error_rate = error_rate
+        self._bloom: Optional[BloomFilter] = None
+        self.refresh()
+
+    def refresh(self):
+        """按 processed_urls 表的当前内容重建布隆过滤器（未启用过滤器时不做任何事）"""
+        if not self.use_bloom_filter:
+            return
+        with get_db_connection() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM processed_urls").fetchone()[0]
+            # 预留一倍容量给本进程运行期间新增的URL
+            bloom = BloomFilter(max(2 * count, 1024), self._error_rate)
+            for row in conn.execute("SELECT url FROM processed_urls"):
+                bloom.add(row['url'])
+        self._bloom = bloom
+
+    def __contains__(self, url: str) -> bool:
+        if self._bloom is not None and canonicalize_url(url) not in self._bloom:
+            return False
+        return is_url_processed(url)
+
+    def add(self, url: str, company_name: Optional[str] = None):
+        self.add_many([(url, company_name)])
+
+    def add_many(self, entries: Iterable[Tuple[str, Optional[str]]]) -> dict:
+        entries = list(entries)
+        result = mark_urls_processed(entries)
+        if self._bloom is not None:
+            for url, _ in entries:
+                self._bloom.add(canonicalize_url(url))
+        return result
+
+# --- 后台任务队列 ---
+# UI 会话只负责入队和轮询，任务由独立的工作进程池认领执行；进度、部分结果都写回 jobs 表。
+# dedup_key 相同的任务在排队/运行期间只会存在一个（部分唯一索引保证），多个会话共享同一个任务。
+JOB_STALE_SECONDS = 300        # 运行中的任务超过该时间没有心跳，视为工作进程已退出，重新排队
+WORKER_STALE_SECONDS = 60
+MAX_JOB_ATTEMPTS = 3           # 任务被认领后工作进程无响应的次数达到该值即标记为失败，避免反复拖垮工作进程
+
+def _job_from_row(row) -> dict:
+    job = dict(row)
+    job['params'] = json.loads(job['params']) if job['params'] else {}
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+def enqueue_job(kind: str, params: Optional[dict] = None, dedup_key: Optional[str] = None) -> dict:
+    """
+    提交任务。若已有相同 dedup_key 的任务在排队或运行，不再新建，直接返回该任务。
+    返回 {'id': 任务id, 'created': 是否新建}
+    """
+    with get_db_connection() as conn:
+        cursor = conn.execute("INSERT OR IGNORE INTO jobs (kind, dedup_key, params) VALUES (?, ?, ?)",
+                              (kind, dedup_key, json.dumps(params or {}, ensure_ascii=False)))
+        if cursor.rowcount:
+            return {"id": cursor.lastrowid, "created": True}
+        row = conn.execute("SELECT id FROM jobs WHERE dedup_key = ? AND status IN ('queued', 'running')", (dedup_key,)).fetchone()
+        return {"id": row['id'], "created": False}
+
+def claim_next_job(worker_id: str, kinds: Optional[List[str]] = None) -> Optional[dict]:
+    """原子地认领最早排队的任务（单条 UPDATE ... RETURNING，多个工作进程不会认领同一任务）"""
+    kind_filter = f"AND kind IN ({', '.join('?' * len(kinds))})" if kinds else ""
+    with get_db_connection() as conn:
+        rows = conn.execute(f'''
+            UPDATE jobs SET status = 'running', worker_id = ?, attempts = attempts + 1,
+                            started_at = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP
+            WHERE id = (SELECT id FROM jobs WHERE status = 'queued' {kind_filter} ORDER BY id LIMIT 1)
+            RETURNING *
+        ''', (worker_id, *(kinds or []))).fetchall()
+        return _job_from_row(rows[0]) if rows else None
+
+def update_job_progress(job_id: int, worker_id: str, progress: Optional[float] = None, message: Optional[str] = None,
+                        partial_result: Optional[dict] = None) -> bool:
+    """
+    更新进度/说明/部分结果，同时刷新心跳。只有仍持有该任务的工作进程能写入
+    （任务因心跳超时被重新排队后，原进程的更新会被忽略），返回是否写入成功
+    """
+    with get_db_connection() as conn:
+        cursor = conn.execute('''
+            UPDATE jobs SET progress = COALESCE(?, progress), message = COALESCE(?, message),
+                            result = COALESCE(?, result), heartbeat_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND worker_id = ? AND status = 'running'
+        ''', (progress, message, json.dumps(partial_result, ensure_ascii=False) if partial_result is not None else None,
+              job_id, worker_id))
+        return cursor.rowcount == 1
+
+def finish_job(job_id: int, worker_id: str, result: Optional[dict] = None, error: Optional[str] = None) -> bool:
+    """标记任务完成（error 不为空时为失败）；与 update_job_progress 一样只接受仍持有该任务的工作进程"""
+    with get_db_connection() as conn:
+        cursor = conn.execute('''
+            UPDATE jobs SET status = ?, progress = CASE WHEN ? IS NULL THEN 1 ELSE progress END,
+                            result = COALESCE(?, result), error = ?, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND worker_id = ? AND status = 'running'
+        ''', ('failed' if error else 'done', error,
+              json.dumps(result, ensure_ascii=False) if result is not None else None, error, job_id, worker_id))
+        return cursor.rowcount == 1
+
+def get_job(job_id: int) -> Optional[dict]:
+    with get_db_connection() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_from_row(row) if row else None
+
+def get_active_jobs(kind: Optional[str] = None) -> list:
+    """排队中和运行中的任务"""
+    with get_db_connection() as conn:
+        cursor = conn.execute(
+            "SELECT * FROM jobs WHERE status IN ('queued', 'running') AND (? IS NULL OR kind = ?) ORDER BY id", (kind, kind)
+        )
+        return [_job_from_row(row) for row in cursor.fetchall()]
+
+def requeue_stale_jobs(stale_seconds: int = JOB_STALE_SECONDS, max_attempts: int = MAX_JOB_ATTEMPTS) -> int:
+    """
+    把心跳超时的运行中任务重新排队，返回重新排队的数量。
+    已被认领 max_attempts 次仍无响应的任务直接标记为失败（很可能是任务本身导致工作进程崩溃）
+    """
+    cutoff = f"-{int(stale_seconds)} seconds"
+    with get_db_connection() as conn:
+        conn.execute('''
+            UPDATE jobs SET status = 'failed', worker_id = NULL, finished_at = CURRENT_TIMESTAMP,
+                            error = '工作进程多次无响应，已放弃该任务'
+            WHERE status = 'running' AND heartbeat_at < datetime('now', ?) AND attempts >= ?
+        ''', (cutoff, max_attempts))
+        cursor = conn.execute('''
+            UPDATE jobs SET status = 'queued', worker_id = NULL, message = '工作进程无响应，已重新排队'
+            WHERE status = 'running' AND heartbeat_at < datetime('now', ?)
+        ''', (cutoff,))
+        return cursor.rowcount
+
+def register_job_worker(worker_id: str):
+    """
+    登记/刷新工作进程心跳，并刷新它正在运行的任务的心跳：
+    流水线在长时间的AI分析阶段不会产生进度事件，任务心跳不能只依赖 update_job_progress
+    """
+    with get_db_connection() as conn:
+        conn.execute('''
+            INSERT INTO job_workers (worker_id, pid) VALUES (?, ?)
+            ON CONFLICT(worker_id) DO UPDATE SET heartbeat_at = CURRENT_TIMESTAMP
+        ''', (worker_id, os.getpid()))
+        conn.execute("UPDATE jobs SET heartbeat_at = CURRENT_TIMESTAMP WHERE worker_id = ? AND status = 'running'", (worker_id,))
+
+def unregister_job_worker(worker_id: str):
+    with get_db_connection() as conn:
+        conn.execute("DELETE FROM job_workers WHERE worker_id = ?", (worker_id,))
+
+def count_live_job_workers(stale_seconds: int = WORKER_STALE_SECONDS) -> int:
+    with get_db_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM job_workers WHERE heartbeat_at >= datetime('now', ?)",
+                            (f"-{int(stale_seconds)} seconds",)).fetchone()[0]
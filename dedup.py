@@ -0,0 +1,158 @@
+# dedup.py
+
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from database import PooledConnection, get_db_connection
+
+# 64位 SimHash；汉明距离 ≤ NEAR_DUPLICATE_DISTANCE 视为同一报道的转载/改写
+FINGERPRINT_BITS = 64
+NEAR_DUPLICATE_DISTANCE = 7
+# 把指纹切成 DISTANCE+1 段：距离 ≤ DISTANCE 的两个指纹至少有一段完全相同（抽屉原理），
+# 因此只需按段精确查找候选，再计算完整汉明距离
+BANDS = NEAR_DUPLICATE_DISTANCE + 1
+BAND_BITS = FINGERPRINT_BITS // BANDS
+SHINGLE_SIZE = 2   # 标题较短，2-gram 对中文转载的改动更稳健
+
+FINGERPRINT_FILE = os.getenv("FINGERPRINT_FILE", "web_cache.db")
+_initialized_files = set()
+_init_lock = threading.Lock()
+
+
+def _normalize(text: str) -> str:
+    text = re.sub(r"<[^>]+>", " ", text or "")     # RSS描述里常带HTML标签
+    text = re.sub(r"[\W_]+", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def simhash(text: str) -> int:
+    """基于字符 n-gram 的 SimHash，对中英文都适用"""
+    normalized = _normalize(text)
+    if len(normalized) < SHINGLE_SIZE:
+        shingles = [normalized] if normalized else []
+    else:
+        shingles = [normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)]
+    weights = [0] * FINGERPRINT_BITS
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    return sum(1 << bit for bit, w in enumerate(weights) if w > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _bands(fingerprint: int) -> List[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [(fingerprint >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+
+
+def _to_signed(fingerprint: int) -> int:
+    """SQLite INTEGER 是有符号64位"""
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def cluster_near_duplicates(articles: List[Dict], text_of: Callable[[Dict], str]) -> List[Dict]:
+    """
+    对同一批结果做近似重复聚类，按原顺序保留每个簇的第一篇作为代表，
+    并在代表上记录 duplicates（被合并的篇数）。
+    """
+    representatives: List[Dict] = []
+    fingerprints: List[int] = []
+    band_index: Dict[tuple, List[int]] = {}
+    for article in articles:
+        fingerprint = simhash(text_of(article))
+        match = None
+        for band_no, band in enumerate(_bands(fingerprint)):
+            for candidate in band_index.get((band_no, band), []):
+                if hamming_distance(fingerprint, fingerprints[candidate]) <= NEAR_DUPLICATE_DISTANCE:
+                    match = candidate
+                    break
+            if match is not None:
+                break
+        if match is not None:
+            representatives[match]["duplicates"] = representatives[match].get("duplicates", 0) + 1
+            continue
+        position = len(representatives)
+        representatives.append(dict(article))
+        fingerprints.append(fingerprint)
+        for band_no, band in enumerate(_bands(fingerprint)):
+            band_index.setdefault((band_no, band), []).append(position)
+    return representatives
+
+
+# --- 跨运行的持久化指纹索引 ---
+
+def _connect() -> PooledConnection:
+    # 借用连接池中的连接（WAL、busy_timeout 等设置与业务库一致）；with 块结束或 close() 时归还
+    with _init_lock:
+        if FINGERPRINT_FILE not in _initialized_files:
+            band_columns = ", ".join(f"band{i} INTEGER NOT NULL" for i in range(BANDS))
+            with get_db_connection(FINGERPRINT_FILE) as conn:
+                conn.execute(f'''
+                    CREATE TABLE IF NOT EXISTS article_fingerprints (
+                        id INTEGER PRIMARY KEY,
+                        company_name TEXT NOT NULL,
+                        kind TEXT NOT NULL,
+                        url TEXT NOT NULL,
+                        fingerprint INTEGER NOT NULL,
+                        {band_columns},
+                        seen_at REAL NOT NULL,
+                        UNIQUE (company_name, kind, url)
+                    )
+                ''')
+                for i in range(BANDS):
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_fingerprint_band{i} ON article_fingerprints (company_name, kind, band{i})")
+            _initialized_files.add(FINGERPRINT_FILE)
+    return get_db_connection(FINGERPRINT_FILE)
+
+
+def find_seen_duplicate(company_name: str, text: str, url: str, kind: str = "headline") -> Optional[str]:
+    """若该公司的索引中已有与 text 近似重复、但URL不同的文章，返回其URL"""
+    fingerprint = simhash(text)
+    clauses = " OR ".join(f"band{i} = ?" for i in range(BANDS))
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            f"SELECT url, fingerprint FROM article_fingerprints WHERE company_name = ? AND kind = ? AND url != ? AND ({clauses})",
+            (company_name, kind, url, *_bands(fingerprint)),
+        ).fetchall()
+    finally:
+        conn.close()
+    for row in rows:
+        if hamming_distance(fingerprint, _to_unsigned(row["fingerprint"])) <= NEAR_DUPLICATE_DISTANCE:
+            return row["url"]
+    return None
+
+
+def remember(entries: List[Dict], kind: str = "headline"):
+    """
+    记录 {'company_name':..., 'url':..., 'text':...} 的指纹，供之后的运行识别该公司的转载。
+    同一篇通稿可能涉及多家公司，指纹按公司分别记录，互不影响。
+    """
+    now = time.time()
+    rows = []
+    for entry in entries:
+        fingerprint = simhash(entry["text"])
+        rows.append((entry["company_name"], kind, entry["url"], _to_signed(fingerprint), *_bands(fingerprint), now))
+    placeholders = ", ".join("?" * (5 + BANDS))
+    band_names = ", ".join(f"band{i}" for i in range(BANDS))
+    conn = _connect()
+    try:
+        with conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO article_fingerprints (company_name, kind, url, fingerprint, {band_names}, seen_at) VALUES ({placeholders})",
+                rows,
+            )
+    finally:
+        conn.close()
@@ -1,9 +1,13 @@
 
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import hashlib
+import numpy as np
 import pandas as pd
-from dateutil.relativedelta import relativedelta
-from typing import Tuple, Optional
-from models import CompetitiveInput, FinancialInput, ScenarioInput
+from typing import List, Tuple, Optional
+from cache import LRUCache, canonical_hash
+from models import B2BContract, CompetitiveInput, FinancialInput, ScenarioInput
 
 def score_competitiveness(inputs: CompetitiveInput) -> dict:
     scores = {"技术壁垒": 0.0, "市场验证": 0.0, "人才团队": 0.0}
@@ -18,38 +22,231 @@ def score_competitiveness(inputs: CompetitiveInput) -> dict:
     elif inputs.team_status == '普通社招为主': scores["人才团队"] = 0.5
     return scores
 
-def generate_cash_flow_forecast(inputs: FinancialInput, scenario: Optional[ScenarioInput] = None) -> pd.DataFrame:
-    dates = pd.period_range(start=pd.to_datetime("today"), periods=inputs.months_to_project, freq='M')
-    df = pd.DataFrame(index=dates, columns=['B2C收入', 'B2B回款', '项目收入', '总流入', '月度消耗', '项目消耗', '总消耗', '月度净现金流', '期末现金']).fillna(0.0)
-    df['B2C收入'], df['月度消耗'] = inputs.b2c_monthly_revenue, inputs.monthly_burn
-    if scenario:
-        if scenario.revenue_delay_months < len(df):
-            df.iloc[scenario.revenue_delay_months:, df.columns.get_loc('项目收入')] = scenario.monthly_revenue
-        df['项目消耗'] = scenario.monthly_extra_burn
-    for contract in inputs.b2b_contracts:
-        payment_period = (pd.to_datetime(contract.sign_date_str) + relativedelta(months=contract.payment_terms_months)).to_period('M')
-        if payment_period in df.index:
-            df.loc[payment_period, 'B2B回款'] += contract.value * contract.decay_factor
-    last_month_cash = inputs.initial_cash
+FORECAST_COLUMNS = ['总流入', '总消耗', '月度净现金流', '期末现金']
+SURVIVAL_HORIZON_MONTHS = 36
+
+# 与Streamlit无关的进程内缓存，cron/批处理同样生效
+forecast_cache = LRUCache(maxsize=512, ttl=3600)
+runway_cache = LRUCache(maxsize=2048, ttl=3600)
+
+def _month_ordinal(ts) -> int:
+    return ts.year * 12 + ts.month - 1
+
+@lru_cache(maxsize=4096)
+def _sign_month_ordinal(sign_date_str: str) -> int:
+    return _month_ordinal(pd.to_datetime(sign_date_str))
+
+def _contract_offsets(contracts: List[B2BContract], start: pd.Period) -> np.ndarray:
+    """每份合同回款所在月份相对预测起始月的偏移：回款月 = 签约月 + 账期"""
+    start_ordinal = _month_ordinal(start)
+    return np.array([_sign_month_ordinal(c.sign_date_str) + c.payment_terms_months - start_ordinal for c in contracts], dtype=np.int64)
+
+def _forecast_arrays(inputs: FinancialInput, scenario: Optional[ScenarioInput], start: pd.Period) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """按月构建 总流入/总消耗/月度净现金流/期末现金 四个数组（与逐月循环逐位一致）。"""
+    n = inputs.months_to_project
+    b2c = np.full(n, float(inputs.b2c_monthly_revenue))
+    b2b = np.zeros(n)
+    project_revenue = np.zeros(n)
+    burn = np.full(n, float(inputs.monthly_burn))
+    project_burn = np.zeros(n)
     if scenario:
-        last_month_cash += scenario.upfront_cost
-    for period in df.index:
-        df.loc[period, '总流入'] = df.loc[period, 'B2C收入'] + df.loc[period, 'B2B回款'] + df.loc[period, '项目收入']
-        df.loc[period, '总消耗'] = df.loc[period, '月度消耗'] + df.loc[period, '项目消耗']
-        df.loc[period, '月度净现金流'] = df.loc[period, '总流入'] - df.loc[period, '总消耗']
-        df.loc[period, '期末现金'] = last_month_cash + df.loc[period, '月度净现金流']
-        last_month_cash = df.loc[period, '期末现金']
-    df.index = df.index.to_timestamp().strftime('%Y-%m')
-    return df[['总流入', '总消耗', '月度净现金流', '期末现金']].round(2)
+        if scenario.revenue_delay_months < n:
+            project_revenue[scenario.revenue_delay_months:] = scenario.monthly_revenue
+        project_burn[:] = scenario.monthly_extra_burn
+    if inputs.b2b_contracts:
+        # 合同回款一次性映射到月份桶
+        offsets = _contract_offsets(inputs.b2b_contracts, start)
+        amounts = np.array([c.value * c.decay_factor for c in inputs.b2b_contracts])
+        in_range = (offsets >= 0) & (offsets < n)
+        np.add.at(b2b, offsets[in_range], amounts[in_range])
+    inflow = b2c + b2b + project_revenue
+    outflow = burn + project_burn
+    net = inflow - outflow
+    opening_cash = inputs.initial_cash + (scenario.upfront_cost if scenario else 0)
+    cash = np.cumsum(np.concatenate(([opening_cash], net)))[1:]
+    return inflow, outflow, net, cash
+
+def generate_cash_flow_forecast(inputs: FinancialInput, scenario: Optional[ScenarioInput] = None) -> pd.DataFrame:
+    start = pd.Period(pd.to_datetime("today"), freq='M')
+    # 预测起始月决定合同回款落在哪个月，因此也是缓存键的一部分
+    key = canonical_hash("forecast", inputs, scenario, str(start))
+    cached = forecast_cache.get(key)
+    if cached is not None:
+        return cached.copy()
+    dates = pd.period_range(start=start, periods=inputs.months_to_project, freq='M')
+    inflow, outflow, net, cash = _forecast_arrays(inputs, scenario, start)
+    df = pd.DataFrame({'总流入': inflow, '总消耗': outflow, '月度净现金流': net, '期末现金': cash}, index=dates.to_timestamp().strftime('%Y-%m'))
+    df = df[FORECAST_COLUMNS].round(2)
+    forecast_cache.set(key, df.copy())
+    return df
 
 def calculate_runway_and_score(cash_flow_df: pd.DataFrame) -> Tuple[int, float]:
+    # 直接哈希期末现金的 float64 字节：结果只取决于数值及其顺序，与索引标签无关
+    key = ("runway", hashlib.sha256(cash_flow_df['期末现金'].to_numpy(dtype=float).tobytes()).hexdigest())
+    return runway_cache.get_or_compute(key, lambda: _calculate_runway_and_score(cash_flow_df))
+
+def _calculate_runway_and_score(cash_flow_df: pd.DataFrame) -> Tuple[int, float]:
     try:
         runway_months = cash_flow_df.index.get_loc(cash_flow_df[cash_flow_df['期末现金'] < 0].index[0])
     except IndexError:
         runway_months = len(cash_flow_df)
-    survival_score = min(runway_months / 36, 1.0)
+    survival_score = min(runway_months / SURVIVAL_HORIZON_MONTHS, 1.0)
     return runway_months, round(survival_score, 2)
 
+def forecast_cache_stats() -> dict:
+    """预测缓存的命中/未命中/淘汰统计"""
+    return {"generate_cash_flow_forecast": forecast_cache.stats(), "calculate_runway_and_score": runway_cache.stats()}
+
+def _runway_from_cash(cash: np.ndarray, horizons: np.ndarray) -> np.ndarray:
+    """沿最后一维找到首个期末现金为负的月份；超出各自预测期的月份不参与判断"""
+    if cash.shape[-1] == 0:
+        # 没有任何月份（空组合或预测期为0）：生命线即预测期本身
+        return np.broadcast_to(horizons, cash.shape[:-1]).astype(np.int64)
+    months = np.arange(cash.shape[-1])
+    negative = (np.round(cash, 2) < 0) & (months < horizons[..., None])
+    return np.where(negative.any(axis=-1), negative.argmax(axis=-1), horizons)
+
+def _survival_scores(runway_months: np.ndarray) -> np.ndarray:
+    return np.round(np.minimum(runway_months / SURVIVAL_HORIZON_MONTHS, 1.0), 2)
+
+def portfolio_arrays(financial_inputs: List[FinancialInput]) -> dict:
+    """
+    把一组 FinancialInput 转换为按列存储的数组（与 database.load_portfolio_arrays 的返回格式相同）：
+    公司维度的 initial_cash/monthly_burn/b2c_monthly_revenue/months_to_project，
+    以及扁平化的合同数组 contract_company（所属公司下标）/contract_value/contract_decay/contract_payment_ordinal（回款月序号）。
+    """
+    contracts = [(i, c) for i, f in enumerate(financial_inputs) for c in f.b2b_contracts]
+    return {
+        "initial_cash": np.array([f.initial_cash for f in financial_inputs], dtype=float),
+        "monthly_burn": np.array([f.monthly_burn for f in financial_inputs], dtype=float),
+        "b2c_monthly_revenue": np.array([f.b2c_monthly_revenue for f in financial_inputs], dtype=float),
+        "months_to_project": np.array([f.months_to_project for f in financial_inputs], dtype=np.int64),
+        "contract_company": np.array([i for i, _ in contracts], dtype=np.int64),
+        "contract_value": np.array([c.value for _, c in contracts], dtype=float),
+        "contract_decay": np.array([c.decay_factor for _, c in contracts], dtype=float),
+        "contract_payment_ordinal": np.array([_sign_month_ordinal(c.sign_date_str) + c.payment_terms_months for _, c in contracts], dtype=np.int64),
+    }
+
+def forecast_portfolio(financial_inputs: List[FinancialInput], scenarios: List[Optional[ScenarioInput]]) -> dict:
+    """
+    批量预测：一次性计算 (公司, 情景, 月份) 三维期末现金立方体，
+    并返回每个组合的生命线月数与生存评分（结果与逐个调用
+    generate_cash_flow_forecast + calculate_runway_and_score 一致）。
+    各公司预测期不同时按最长预测期对齐，超出部分填 NaN。
+    """
+    return forecast_portfolio_arrays(portfolio_arrays(financial_inputs), scenarios)
+
+def forecast_portfolio_arrays(portfolio: dict, scenarios: List[Optional[ScenarioInput]]) -> dict:
+    """同 forecast_portfolio，但直接接收按列存储的组合数组（可由 database.load_portfolio_arrays 从数据库批量读取）"""
+    start = pd.Period(pd.to_datetime("today"), freq='M')
+    horizons = np.asarray(portfolio["months_to_project"], dtype=np.int64)
+    n_months = int(horizons.max()) if len(horizons) else 0
+    n_companies, n_scenarios = len(horizons), len(scenarios)
+    months = np.arange(n_months)
+
+    # 公司维度: 基础流入(B2C+B2B)、基础消耗、初始现金
+    base_inflow = np.repeat(np.asarray(portfolio["b2c_monthly_revenue"], dtype=float)[:, None], n_months, axis=1)
+    base_burn = np.repeat(np.asarray(portfolio["monthly_burn"], dtype=float)[:, None], n_months, axis=1)
+    initial_cash = np.asarray(portfolio["initial_cash"], dtype=float)
+    company = np.asarray(portfolio["contract_company"], dtype=np.int64)
+    if len(company):
+        offsets = np.asarray(portfolio["contract_payment_ordinal"], dtype=np.int64) - _month_ordinal(start)
+        amounts = np.asarray(portfolio["contract_value"], dtype=float) * np.asarray(portfolio["contract_decay"], dtype=float)
+        in_range = (offsets >= 0) & (offsets < horizons[company])
+        b2b = np.zeros((n_companies, n_months))
+        np.add.at(b2b, (company[in_range], offsets[in_range]), amounts[in_range])
+        base_inflow += b2b
+
+    # 情景维度: 项目收入、项目消耗、前期投入
+    scenario_revenue = np.zeros((n_scenarios, n_months))
+    scenario_burn = np.zeros((n_scenarios, n_months))
+    upfront = np.zeros(n_scenarios)
+    for j, sc in enumerate(scenarios):
+        if sc:
+            scenario_revenue[j] = np.where(months >= sc.revenue_delay_months, sc.monthly_revenue, 0.0)
+            scenario_burn[j] = sc.monthly_extra_burn
+            upfront[j] = sc.upfront_cost
+
+    inflow = base_inflow[:, None, :] + scenario_revenue[None, :, :]
+    outflow = base_burn[:, None, :] + scenario_burn[None, :, :]
+    net = inflow - outflow
+    opening_cash = initial_cash[:, None] + upfront[None, :]
+    cash = np.cumsum(np.concatenate((opening_cash[..., None], net), axis=-1), axis=-1)[..., 1:]
+    cash[np.broadcast_to(months >= horizons[:, None, None], cash.shape)] = np.nan
+
+    runway_months = _runway_from_cash(cash, np.broadcast_to(horizons[:, None], (n_companies, n_scenarios)))
+    return {
+        "months": pd.period_range(start=start, periods=n_months, freq='M').to_timestamp().strftime('%Y-%m').tolist(),
+        "cash": np.round(cash, 2),
+        "net_cash_flow": np.round(np.where(np.isnan(cash), np.nan, net), 2),
+        "runway_months": runway_months,
+        "survival_scores": _survival_scores(runway_months),
+    }
+
+MONTE_CARLO_CHUNK_PATHS = 10000
+
+def _simulate_chunk(inputs: FinancialInput, scenario: Optional[ScenarioInput], start: pd.Period, n_paths: int,
+                    seed: np.random.SeedSequence, payment_slip_months: float, delay_jitter_months: float, burn_volatility: float) -> np.ndarray:
+    """模拟一批路径，返回每条路径的生命线月数"""
+    rng = np.random.default_rng(seed)
+    n = inputs.months_to_project
+    months = np.arange(n)
+    inflow = np.full((n_paths, n), float(inputs.b2c_monthly_revenue))
+    if inputs.b2b_contracts:
+        # 合同违约: 以 decay_factor 为履约概率；回款滑点: 泊松分布的额外延迟月数
+        offsets = _contract_offsets(inputs.b2b_contracts, start)
+        values = np.array([c.value for c in inputs.b2b_contracts])
+        pay_prob = np.array([c.decay_factor for c in inputs.b2b_contracts])
+        paid = rng.random((n_paths, len(values))) < pay_prob
+        slipped = offsets + rng.poisson(payment_slip_months, (n_paths, len(values)))
+        valid = paid & (slipped >= 0) & (slipped < n)
+        flat = (np.arange(n_paths)[:, None] * n + slipped)[valid]
+        inflow += np.bincount(flat, weights=np.broadcast_to(values, valid.shape)[valid], minlength=n_paths * n).reshape(n_paths, n)
+    burn = float(inputs.monthly_burn) * np.maximum(1 + burn_volatility * rng.standard_normal((n_paths, n)), 0)
+    opening_cash = inputs.initial_cash
+    if scenario:
+        delay = scenario.revenue_delay_months + rng.poisson(delay_jitter_months, n_paths)
+        inflow += np.where(months[None, :] >= delay[:, None], scenario.monthly_revenue, 0.0)
+        burn += scenario.monthly_extra_burn
+        opening_cash += scenario.upfront_cost
+    cash = opening_cash + np.cumsum(inflow - burn, axis=1)
+    return _runway_from_cash(cash, np.full(n_paths, n))
+
+def simulate_runway_distribution(inputs: FinancialInput, scenario: Optional[ScenarioInput] = None, n_paths: int = 20000,
+                                 seed: Optional[int] = None, payment_slip_months: float = 1.0, delay_jitter_months: float = 1.0,
+                                 burn_volatility: float = 0.1, max_workers: int = 1) -> dict:
+    """
+    蒙特卡洛模式：对合同违约(按 decay_factor)、回款滑点、项目回报延迟和月度消耗波动
+    进行向量化抽样，返回生命线分布(P10/P50/P90)及各月现金转负的累计概率。
+    路径按固定大小分块并由 seed 派生子种子，因此结果与 max_workers 无关、可复现。
+    """
+    if n_paths < 1:
+        raise ValueError(f"n_paths 必须至少为 1，当前为 {n_paths}")
+    start = pd.Period(pd.to_datetime("today"), freq='M')
+    n_chunks = max(1, -(-n_paths // MONTE_CARLO_CHUNK_PATHS))
+    sizes = [min(MONTE_CARLO_CHUNK_PATHS, n_paths - k * MONTE_CARLO_CHUNK_PATHS) for k in range(n_chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    args = [(inputs, scenario, start, size, chunk_seed, payment_slip_months, delay_jitter_months, burn_volatility)
+            for size, chunk_seed in zip(sizes, seeds)]
+    if max_workers > 1 and n_chunks > 1:
+        with ProcessPoolExecutor(max_workers=min(max_workers, n_chunks)) as pool:
+            runways = np.concatenate(list(pool.map(_simulate_chunk, *zip(*args))))
+    else:
+        runways = np.concatenate([_simulate_chunk(*a) for a in args])
+
+    n = inputs.months_to_project
+    p10, p50, p90 = np.percentile(runways, [10, 50, 90])
+    return {
+        "n_paths": int(runways.size),
+        "runway_p10": float(p10),
+        "runway_p50": float(p50),
+        "runway_p90": float(p90),
+        "runway_mean": round(float(runways.mean()), 2),
+        "months": pd.period_range(start=start, periods=n, freq='M').to_timestamp().strftime('%Y-%m').tolist(),
+        # 第 m 个月末（含）之前现金已转负的路径占比
+        "prob_cash_negative_by_month": np.round((runways[:, None] <= np.arange(n)[None, :]).mean(axis=0), 4),
+    }
+
 def analyze_funding_urgency(survival_score: float) -> dict:
     if survival_score > 0.75: return {"level": "低", "suggestion": "现金流健康，无需或可选择性融资。"}
     elif 0.50 <= survival_score <= 0.74: return {"level": "中", "suggestion": "建议进行战略性融资，以加速发展。"}
@@ -60,4 +257,57 @@ def check_project_feasibility(runway_months: int, project_duration: int, buffer_
     required_months = project_duration + buffer_months
     is_feasible = runway_months >= required_months
     reason = f"公司当前生命线({runway_months}个月){'足以' if is_feasible else '不足以'}覆盖项目周期加安全缓冲({required_months}个月)。"
-    return {"feasible": is_feasible, "reason": reason}
\ No newline at end of file
+    return {"feasible": is_feasible, "reason": reason}
+
+GOAL_SEEK_VARIABLES = ('upfront_cost', 'monthly_burn', 'monthly_extra_burn')
+
+def solve_for_target_runway(inputs: FinancialInput, target_runway_months: int, variable: str = 'upfront_cost',
+                            scenario: Optional[ScenarioInput] = None) -> dict:
+    """
+    目标求解：求出使生命线 ≥ target_runway_months 的
+    最少 upfront_cost（融资额）或最大 monthly_burn / monthly_extra_burn。
+    期末现金对这三个变量都是单调的仿射函数，因此直接由预先算好的流入数组给出闭式解，
+    不需要反复重建DataFrame。
+    """
+    if variable not in GOAL_SEEK_VARIABLES:
+        raise ValueError(f"不支持求解的变量: {variable}，可选: {', '.join(GOAL_SEEK_VARIABLES)}")
+    scenario = scenario or ScenarioInput()
+    # 目标超过预测期时，把预测期延长到目标月数
+    horizon_inputs = inputs.model_copy(update={"months_to_project": max(inputs.months_to_project, target_runway_months)})
+    start = pd.Period(pd.to_datetime("today"), freq='M')
+    inflow, outflow, net, _ = _forecast_arrays(horizon_inputs, scenario, start)
+    months_elapsed = np.arange(1, target_runway_months + 1)
+    opening_cash = inputs.initial_cash + scenario.upfront_cost
+
+    if target_runway_months <= 0:
+        value = {'upfront_cost': scenario.upfront_cost, 'monthly_burn': inputs.monthly_burn, 'monthly_extra_burn': scenario.monthly_extra_burn}[variable]
+    elif variable == 'upfront_cost':
+        # 前 T 个月累计净现金流的最低点必须被期初现金覆盖
+        lowest_point = inputs.initial_cash + np.cumsum(net[:target_runway_months]).min()
+        value = np.ceil(max(0.0, -lowest_point) * 100) / 100
+    else:
+        # 第 m 月期末现金 = 期初现金 + 累计流入 - m × 月总消耗 ≥ 0
+        affordable_outflow = ((opening_cash + np.cumsum(inflow[:target_runway_months])) / months_elapsed).min()
+        other_burn = scenario.monthly_extra_burn if variable == 'monthly_burn' else inputs.monthly_burn
+        value = np.floor((affordable_outflow - other_burn) * 100) / 100
+
+    feasible = value > 0 if variable == 'monthly_burn' else value >= 0
+    if not feasible:
+        return {"variable": variable, "value": None, "target_runway_months": target_runway_months, "feasible": False,
+                "reason": f"在当前参数下，无论如何调整 {variable} 都无法达到 {target_runway_months} 个月的生命线。"}
+
+    solved_inputs, solved_scenario = horizon_inputs, scenario
+    if variable == 'monthly_burn':
+        solved_inputs = horizon_inputs.model_copy(update={variable: float(value)})
+    else:
+        solved_scenario = scenario.model_copy(update={variable: float(value)})
+    _, _, _, cash = _forecast_arrays(solved_inputs, solved_scenario, start)
+    achieved = int(_runway_from_cash(cash, np.array(len(cash))))
+    return {"variable": variable, "value": float(value), "target_runway_months": target_runway_months,
+            "achieved_runway_months": achieved, "feasible": True,
+            "reason": f"{variable} = {float(value):.2f} 时，生命线可达到 {achieved} 个月（目标 {target_runway_months} 个月）。"}
+
+def solve_for_project_feasibility(inputs: FinancialInput, project_duration: int, variable: str = 'upfront_cost',
+                                  scenario: Optional[ScenarioInput] = None, buffer_months: int = 6) -> dict:
+    """求出使 check_project_feasibility 通过的最少融资额或最大消耗"""
+    return solve_for_target_runway(inputs, project_duration + buffer_months, variable, scenario)
@@ -0,0 +1,86 @@
+# entity_matcher.py
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set
+
+# 内置的常见别名；数据库 company_aliases 表中的别名会与之合并
+DEFAULT_ALIASES: Dict[str, List[str]] = {
+    "月之暗面": ["北京月之暗面科技有限公司", "Moonshot AI"],
+}
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+class EntityMatcher:
+    """
+    Aho-Corasick 多模式匹配器：由监控列表（公司名 + 别名）一次性构建，
+    对每篇文章只扫描一遍即可得到其中提到的所有公司。
+    英文别名要求单词边界完整，避免 "Moonshot AI" 误匹配 "Moonshot AIR"。
+    """
+
+    def __init__(self, aliases: Dict[str, Iterable[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[tuple]] = [[]]   # 每个状态命中的 (公司, 模式长度, 模式首尾是否需要单词边界)
+        for company, names in aliases.items():
+            for name in {company, *names}:
+                if name and name.strip():
+                    self._add(name.strip().casefold(), company)
+        self._build_failure_links()
+
+    def _add(self, pattern: str, company: str):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = nxt
+        self._output[state].append((company, len(pattern), _is_word_char(pattern[0]), _is_word_char(pattern[-1])))
+
+    def _build_failure_links(self):
+        # 广度优先：第一层状态的失败指针指向根，其余状态沿父状态的失败链查找
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def find(self, text: Optional[str]) -> Set[str]:
+        """返回文本中提到的所有公司（规范名）"""
+        found: Set[str] = set()
+        if not text:
+            return found
+        folded = text.casefold()
+        state = 0
+        for end, ch in enumerate(folded):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for company, length, left_boundary, right_boundary in self._output[state]:
+                start = end - length + 1
+                if left_boundary and start > 0 and _is_word_char(folded[start - 1]):
+                    continue
+                if right_boundary and end + 1 < len(folded) and _is_word_char(folded[end + 1]):
+                    continue
+                found.add(company)
+        return found
+
+    def mentions(self, text: Optional[str], company: str) -> bool:
+        return company in self.find(text)
+
+
+def merge_aliases(company_names: Iterable[str], stored_aliases: Optional[Dict[str, List[str]]] = None) -> Dict[str, List[str]]:
+    """合并内置别名与数据库中的别名，只保留 company_names 中的公司"""
+    stored_aliases = stored_aliases or {}
+    return {name: [*DEFAULT_ALIASES.get(name, []), *stored_aliases.get(name, [])] for name in company_names}
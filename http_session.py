@@ -0,0 +1,122 @@
+# http_session.py
+
+import random
+import ssl
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.poolmanager import PoolManager
+from urllib3.util.retry import Retry
+from urllib3.util.ssl_ import create_urllib3_context
+
+# --- 连接池配置 ---
+# 每个主机的连接池大小（keep-alive 连接数），未列出的主机使用默认值
+HOST_POOL_SIZES: Dict[str, int] = {
+    "newsapi.org": 8,
+    "www.bing.com": 8,
+    "r.jina.ai": 16,
+    "generativelanguage.googleapis.com": 8,
+}
+DEFAULT_POOL_SIZE = 10
+DEFAULT_POOL_COUNT = 32
+
+# --- 重试配置 ---
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5      # 第 n 次重试前等待约 factor * 2^(n-1) 秒
+RETRY_BACKOFF_MAX = 30
+RETRY_STATUS_FORCELIST = (429, 500, 502, 503, 504)
+RETRY_ALLOWED_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# 读超时不重试：否则 20 秒超时的 GET 最坏要等约 4 倍时间，拖垮抓取对冲的时间预算
+RETRY_READ = False
+# POST（Gemini generateContent）每次都会计费：只在服务端带 Retry-After 拒绝时重试
+POST_RETRY_STATUS = frozenset({429, 503})
+
+# 兼顾安全与兼容性的密码套件（沿用 12.py 中的 TLS 1.2 配置）
+TLS12_CIPHERS = (
+    'ECDHE-ECDSA-AES128-GCM-SHA256:ECDHE-RSA-AES128-GCM-SHA256:'
+    'ECDHE-ECDSA-AES256-GCM-SHA384:ECDHE-RSA-AES256-GCM-SHA384:'
+    'ECDHE-ECDSA-CHACHA20-POLY1305:ECDHE-RSA-CHACHA20-POLY1305:'
+    'DHE-RSA-AES128-GCM-SHA256:DHE-RSA-AES256-GCM-SHA384'
+)
+
+
+class JitteredRetry(Retry):
+    """指数退避 + 全抖动（full jitter），避免大量并发请求同时重试；Retry-After 头优先"""
+
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if method.upper() == "POST":
+            return bool(self.total and has_retry_after and status_code in POST_RETRY_STATUS)
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def build_retry() -> Retry:
+    return JitteredRetry(
+        total=RETRY_TOTAL,
+        read=RETRY_READ,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_FORCELIST,
+        allowed_methods=RETRY_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,  # 重试耗尽后返回最后一次响应，由调用方按状态码处理
+    )
+
+
+class PooledHttpAdapter(HTTPAdapter):
+    """
+    带连接池、重试的适配器。force_tls12=True 时沿用 12.py 中 TlsV12HttpAdapter 的做法，
+    强制 TLS 1.2 以兼容有问题的代理。SSL 上下文只创建一次，握手按主机复用连接。
+    """
+
+    def __init__(self, pool_maxsize: int = DEFAULT_POOL_SIZE, force_tls12: bool = False, **kwargs):
+        self.force_tls12 = force_tls12
+        super().__init__(pool_connections=DEFAULT_POOL_COUNT, pool_maxsize=pool_maxsize, max_retries=build_retry(), **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.force_tls12:
+            context = create_urllib3_context(ciphers=TLS12_CIPHERS)
+            context.minimum_version = ssl.TLSVersion.TLSv1_2
+            context.maximum_version = ssl.TLSVersion.TLSv1_2
+            pool_kwargs["ssl_context"] = context
+        self.poolmanager = PoolManager(num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs)
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def build_session(force_tls12: bool = False) -> requests.Session:
+    session = requests.Session()
+    session.mount("https://", PooledHttpAdapter(force_tls12=force_tls12))
+    session.mount("http://", PooledHttpAdapter())
+    # 为高频主机单独挂载更大的连接池（requests 按最长前缀匹配适配器）
+    for host, size in HOST_POOL_SIZES.items():
+        session.mount(f"https://{host}/", PooledHttpAdapter(pool_maxsize=size, force_tls12=force_tls12))
+    return session
+
+
+def get_session() -> requests.Session:
+    """进程内共享的 requests.Session，所有出站请求复用其 keep-alive 连接"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def configure_session(pool_sizes: Optional[Dict[str, int]] = None, force_tls12: bool = False) -> requests.Session:
+    """调整各主机连接池大小或启用 TLS 1.2 后重建共享 Session"""
+    global _session
+    with _session_lock:
+        if pool_sizes:
+            HOST_POOL_SIZES.update(pool_sizes)
+        if _session is not None:
+            _session.close()
+        _session = build_session(force_tls12=force_tls12)
+    return _session
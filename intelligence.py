@@ -1,46 +1,112 @@
 # intelligence.py
 
-import streamlit as st
 import requests
 from bs4 import BeautifulSoup
 import json
 import os
-from urllib.parse import quote_plus
-from typing import Optional, List, Dict
+import re
+from urllib.parse import quote_plus, urlparse
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Tuple
 from models import AIInsight
-import trafilatura
+from http_session import get_session
+from cache import LRUCache, SingleFlight, canonical_hash
+import web_cache
+import dedup
+from database import get_company_aliases
+from entity_matcher import EntityMatcher, merge_aliases
+from reporting import get_reporter, streamlit_cache_data, streamlit_running
 import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 # --- 配置 ---
 # 从环境变量安全加载API密钥
-NEWS_API_KEY = st.secrets.get("NEWS_API_KEY", os.getenv("NEWS_API_KEY"))
-GEMINI_API_KEY = st.secrets.get("GEMINI_API_KEY", os.getenv("GEMINI_API_KEY"))
+def _get_secret(name: str) -> Optional[str]:
+    """
+    在 Streamlit 运行时内优先读取 st.secrets；cron、基准测试等场景（或没有 secrets.toml 时）
+    直接读取环境变量，不会因此导入 streamlit。
+    """
+    if streamlit_running():
+        import streamlit as st
+        try:
+            return st.secrets.get(name, os.getenv(name))
+        except Exception:
+            pass
+    return os.getenv(name)
+
+NEWS_API_KEY = _get_secret("NEWS_API_KEY")
+GEMINI_API_KEY = _get_secret("GEMINI_API_KEY")
+
+# --- 每个主机的并发连接上限 ---
+# 并发监控时，同一主机同时进行的请求数不超过此处配置，未列出的主机使用默认值
+HOST_CONCURRENCY_LIMITS = {
+    "newsapi.org": 4,
+    "bing.com": 4,
+    "r.jina.ai": 8,
+    "generativelanguage.googleapis.com": 4,
+}
+DEFAULT_HOST_CONCURRENCY = 4
+_host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_host_semaphores_lock = threading.Lock()
+
+def configure_host_limits(limits: Dict[str, int], default: Optional[int] = None):
+    """覆盖每个主机的并发上限（会重建已有的信号量，应在开始并发请求前调用）"""
+    global DEFAULT_HOST_CONCURRENCY
+    with _host_semaphores_lock:
+        HOST_CONCURRENCY_LIMITS.update(limits)
+        if default is not None:
+            DEFAULT_HOST_CONCURRENCY = default
+        _host_semaphores.clear()
+
+def _host_key(url: str) -> str:
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+def _host_semaphore(url: str) -> threading.BoundedSemaphore:
+    host = _host_key(url)
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(HOST_CONCURRENCY_LIMITS.get(host, DEFAULT_HOST_CONCURRENCY))
+            _host_semaphores[host] = semaphore
+    return semaphore
+
+@contextmanager
+def _host_slot(url: str):
+    """占用目标主机的一个并发名额"""
+    with _host_semaphore(url):
+        yield
 # --- 内部函数 ---
-def _search_newsapi(company_name: str) -> List[Dict]:
-    """私有函数：通过NewsAPI进行搜索"""
+def _search_newsapi(company_name: str, query: Optional[str] = None) -> List[Dict]:
+    """私有函数：通过NewsAPI进行搜索（query 为空时按公司名精确搜索）"""
     if not NEWS_API_KEY:
-        st.warning("NewsAPI 密钥未设置，跳过此情报源。")
+        get_reporter().warning("NewsAPI 密钥未设置，跳过此情报源。")
         return []
 
-    query = f'"{company_name}"'
+    query = query or f'"{company_name}"'
     url = f"https://newsapi.org/v2/everything?q={quote_plus(query)}&language=zh&sortBy=publishedAt&pageSize=20"
     headers = {"Authorization": f"Bearer {NEWS_API_KEY}"}
     try:
-        resp = requests.get(url, headers=headers, timeout=15)
+        with _host_slot(url):
+            resp = get_session().get(url, headers=headers, timeout=15)
         resp.raise_for_status()
         data = resp.json()
         return data.get("articles", []) if data.get("status") == "ok" else []
     except requests.exceptions.RequestException as e:
-        st.warning(f"通过 NewsAPI 搜索失败: {e}")
+        get_reporter().warning(f"通过 NewsAPI 搜索失败: {e}")
         return []
 
-def _search_bing_rss(company_name: str) -> List[Dict]:
-    """私有函数：通过Bing新闻RSS进行搜索作为备用"""
-    search_query = quote_plus(f'"{company_name}"')
+def _search_bing_rss(company_name: str, query: Optional[str] = None) -> List[Dict]:
+    """私有函数：通过Bing新闻RSS进行搜索作为备用（query 为空时按公司名精确搜索）"""
+    search_query = quote_plus(query or f'"{company_name}"')
     url = f"https://www.bing.com/news/search?q={search_query}&format=rss"
     headers = {'User-Agent': 'Mozilla/5.0'}
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        with _host_slot(url):
+            response = get_session().get(url, headers=headers, timeout=15)
         response.raise_for_status()
         soup = BeautifulSoup(response.content, 'xml')
         articles = []
@@ -52,19 +118,42 @@ def _search_bing_rss(company_name: str) -> List[Dict]:
             })
         return articles
     except requests.exceptions.RequestException as e:
-        st.warning(f"通过 Bing News RSS 备用源搜索失败: {e}")
+        get_reporter().warning(f"通过 Bing News RSS 备用源搜索失败: {e}")
         return []
 
 # --- 外部调用函数 ---
 
-@st.cache_data(ttl=3600)  # 缓存1小时
-def search_news_links(company_name: str, num_articles: int = 5) -> List[Dict]:
-    """
-    多源情报获取与去重、过滤
-    """
+def headline_text(article: Dict) -> str:
+    return f"{article.get('title') or ''} {article.get('description') or ''}"
+
+# 公司别名变更后最多 5 分钟生效
+_matcher_cache = LRUCache(maxsize=256, ttl=300)
+
+def _load_aliases() -> Dict[str, List[str]]:
+    try:
+        return get_company_aliases()
+    except sqlite3.Error:
+        # 别名表尚未创建（如未初始化数据库的cron环境）时只使用内置别名
+        return {}
+
+def build_entity_matcher(company_names: List[str]) -> EntityMatcher:
+    """由公司名及其别名构建一次多模式匹配器，可在整个监控列表上复用"""
+    key = tuple(sorted(company_names))
+    return _matcher_cache.get_or_compute(key, lambda: EntityMatcher(merge_aliases(company_names, _load_aliases())))
+
+def _merge_by_url(*article_lists: List[Dict]) -> List[Dict]:
     all_articles = []
     seen_urls = set()
+    for article_list in article_lists:
+        for article in article_list:
+            url = article.get("url")
+            if url and url not in seen_urls:
+                seen_urls.add(url)
+                all_articles.append(article)
+    return all_articles
 
+def _collect_relevant_articles(company_name: str) -> List[Dict]:
+    """从各情报源检索，按URL精确去重、过滤不相关文章，再做近似重复聚类"""
     # 来源1: NewsAPI
     newsapi_articles = _search_newsapi(company_name)
     
@@ -72,82 +161,371 @@ def search_news_links(company_name: str, num_articles: int = 5) -> List[Dict]:
     bing_articles = _search_bing_rss(company_name)
     
     # 合并与去重
-    for article_list in [newsapi_articles, bing_articles]:
-        for article in article_list:
-            url = article.get("url")
-            if url and url not in seen_urls:
-                seen_urls.add(url)
-                all_articles.append(article)
+    all_articles = _merge_by_url(newsapi_articles, bing_articles)
 
-    # 过滤不相关的文章
+    # 过滤不相关的文章（公司名或任一别名出现在标题/描述中）
+    matcher = build_entity_matcher([company_name])
     relevant_articles = []
     for article in all_articles:
-        title = article.get("title", "")
-        description = article.get("description", "")
-        if company_name in title or company_name in description:
-            relevant_articles.append({"title": title, "url": article["url"]})
-            
-    if not relevant_articles:
-        st.warning(f"未能检索到关于 “{company_name}” 的强相关新闻。")
+        title = article.get("title") or ""
+        description = article.get("description") or ""
+        if matcher.mentions(f"{title}\n{description}", company_name):
+            relevant_articles.append({"title": title, "url": article["url"], "description": description})
 
+    # 同一篇通稿被多家媒体转载时，只保留一篇代表进入下游
+    return dedup.cluster_near_duplicates(relevant_articles, headline_text)
+
+def _select_articles(company_name: str, relevant_articles: List[Dict], num_articles: int, exclude_seen_duplicates: bool) -> List[Dict]:
+    # 这里只查询指纹；只有监控流程真正处理过的文章才会被记录（见 agent._AlertBuffer）
+    if exclude_seen_duplicates:
+        relevant_articles = [a for a in relevant_articles if not dedup.find_seen_duplicate(company_name, headline_text(a), a["url"])]
     return relevant_articles[:num_articles]
 
-@st.cache_data(ttl=86400) # 缓存1天
-def browse_article_text(url: str) -> str:
-    """用 Jina Reader 读取网页正文，带普通requests作为降级方案"""
-    try:
-        reader_url = f"https://r.jina.ai/{url}"
-        resp = requests.get(reader_url, timeout=20)
-        resp.raise_for_status()
-        content = ""
-        # Jina Reader 可能直接返回文本，也可能返回JSON
-        if resp.text.strip().startswith("{"):
-             content = resp.json().get("data", {}).get("content", "")
+@streamlit_cache_data(ttl=3600)  # 缓存1小时
+def _search_cache_key(company_name: str) -> str:
+    """检索结果取决于公司名及其别名；别名变化后旧的缓存结果不再命中"""
+    aliases = merge_aliases([company_name], _load_aliases())[company_name]
+    return canonical_hash(company_name, sorted(set(aliases)))
+
+def search_news_links(company_name: str, num_articles: int = 5, exclude_seen_duplicates: bool = False) -> List[Dict]:
+    """
+    多源情报获取与去重、过滤
+    exclude_seen_duplicates=True 时，还会丢弃与之前运行中已为该公司处理过的文章近似重复、但URL不同的转载
+    """
+    # 持久化缓存（跨进程/重启有效）优先，过期后重新检索
+    cache_key = _search_cache_key(company_name)
+    cached = web_cache.get_entry("search", cache_key)
+    if cached and cached["fresh"]:
+        relevant_articles = cached["content"]
+    else:
+        relevant_articles = _collect_relevant_articles(company_name)
+        if relevant_articles:
+            web_cache.put_entry("search", cache_key, relevant_articles, ttl=web_cache.SEARCH_TTL)
+        elif cached:
+            # 检索失败时退回到过期的缓存结果
+            relevant_articles = cached["content"]
         else:
-            content = resp.text
-        if len(content) > 100: # 简单判断内容是否有效
-             return content
-    except Exception as e:
-        logging.warning(f"[Jina Reader 失败] URL: {url}, Error: {e}")
+            get_reporter().warning(f"未能检索到关于 “{company_name}” 的强相关新闻。")
+
+    return _select_articles(company_name, relevant_articles, num_articles, exclude_seen_duplicates)
+
+# NewsAPI 的 q 参数最长 500 字符
+FEED_QUERY_MAX_CHARS = 500
+
+def _feed_queries(terms: List[str]) -> List[str]:
+    """把监控列表（含别名）拼成尽量少的 OR 查询，每条不超过长度上限"""
+    queries, current = [], ""
+    for name in dict.fromkeys(terms):
+        term = f'"{name}"'
+        candidate = f"{current} OR {term}" if current else term
+        if current and len(candidate) > FEED_QUERY_MAX_CHARS:
+            queries.append(current)
+            candidate = term
+        current = candidate
+    if current:
+        queries.append(current)
+    return queries
+
+def search_news_for_watchlist(company_names: List[str], num_articles: int = 5,
+                              exclude_seen_duplicates: bool = False) -> Dict[str, List[Dict]]:
+    """
+    共享订阅模式：用少量 OR 查询一次性拉取整个监控列表的新闻，
+    每篇文章只用多模式匹配器扫描一遍，分配给其中提到的所有公司。
+    返回 {公司名: 文章列表}，每家公司的结果与 search_news_links 格式相同。
+    """
+    matcher = build_entity_matcher(company_names)
+    aliases = merge_aliases(company_names, _load_aliases())
+    article_lists = []
+    for query in _feed_queries([term for name in company_names for term in (name, *aliases[name])]):
+        article_lists.append(_search_newsapi("", query=query))
+        article_lists.append(_search_bing_rss("", query=query))
 
+    per_company: Dict[str, List[Dict]] = {name: [] for name in company_names}
+    for article in _merge_by_url(*article_lists):
+        title = article.get("title") or ""
+        description = article.get("description") or ""
+        for company_name in matcher.find(f"{title}\n{description}"):
+            per_company[company_name].append({"title": title, "url": article["url"], "description": description})
+
+    return {
+        company_name: _select_articles(company_name, dedup.cluster_near_duplicates(articles, headline_text), num_articles, exclude_seen_duplicates)
+        for company_name, articles in per_company.items()
+    }
 
-    # 降级方案: 普通爬虫
+def _validators(resp) -> dict:
+    return {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+
+def _revalidate_article(url: str, entry: dict) -> bool:
+    """对过期的缓存条目发起条件请求，源站返回304时说明正文未变化"""
+    headers = {'User-Agent': 'Mozilla/5.0', **web_cache.conditional_headers(entry)}
     try:
-        resp = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=20)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.content, "html.parser")
-        paragraphs = soup.find_all('p')
-        paras = [p.get_text().strip() for p in paragraphs if len(p.get_text().strip()) > 30]
-        if paras:
-            return "\n".join(paras)
+        with _host_slot(url):
+            resp = get_session().get(url, headers=headers, timeout=20)
+        return resp.status_code == 304
     except Exception as e:
-        # --- MODIFIED ---
-        logging.warning(f"[BeautifulSoup 失败] URL: {url}, Error: {e}")
+        logging.warning(f"[条件请求失败] URL: {url}, Error: {e}")
+        return False
+
+class ExtractionCancelled(Exception):
+    """对冲提取中已有其他策略胜出，当前策略放弃"""
+
+class _HedgeControl:
+    """
+    一次正文提取的共享状态。某个策略胜出后 cancel() 通知其余策略停止：
+    尚未开始（或仍在等待主机名额）的策略直接放弃；已发出的请求在读到下一块数据时断开，
+    主机名额由该策略自己在 finally 中归还，保证同一主机的并发请求数不会超过上限。
+    """
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+    def acquire(self, url: str) -> threading.BoundedSemaphore:
+        semaphore = _host_semaphore(url)
+        while not semaphore.acquire(timeout=0.1):
+            if self.cancelled.is_set():
+                raise ExtractionCancelled(url)
+        if self.cancelled.is_set():
+            semaphore.release()
+            raise ExtractionCancelled(url)
+        return semaphore
+
+    def release(self, token: threading.BoundedSemaphore):
+        token.release()
 
-          
+    def cancel(self):
+        self.cancelled.set()
+
+ARTICLE_FETCH_TIMEOUT = (5, 20)  # (连接, 读取) 超时
+ARTICLE_CHUNK_BYTES = 64 * 1024
+
+def _fetch_article(url: str, control: _HedgeControl, headers: Optional[dict] = None) -> requests.Response:
+    """分块下载页面，每块之间检查是否已被取消；取消时断开连接"""
+    token = control.acquire(url)
+    try:
+        with get_session().get(url, headers=headers, timeout=ARTICLE_FETCH_TIMEOUT, stream=True) as resp:
+            body = bytearray()
+            for chunk in resp.iter_content(ARTICLE_CHUNK_BYTES):
+                if control.cancelled.is_set():
+                    raise ExtractionCancelled(url)
+                body += chunk
+            resp._content = bytes(body)  # 让 .text / .json() 照常使用已读取的正文
+        return resp
+    finally:
+        control.release(token)
+
+def _extract_via_jina(url: str, control: _HedgeControl) -> Tuple[str, dict]:
+    """用 Jina Reader 读取网页正文"""
+    resp = _fetch_article(f"https://r.jina.ai/{url}", control)
+    resp.raise_for_status()
+    content = ""
+    # Jina Reader 可能直接返回文本，也可能返回JSON
+    if resp.text.strip().startswith("{"):
+         content = resp.json().get("data", {}).get("content", "")
+    else:
+        content = resp.text
+    if len(content) > 100: # 简单判断内容是否有效
+         return content, {}
+    return "", {}
+
+def _extract_via_soup(url: str, control: _HedgeControl) -> Tuple[str, dict]:
+    """降级方案: 普通爬虫"""
+    resp = _fetch_article(url, control, headers={'User-Agent': 'Mozilla/5.0'})
+    resp.raise_for_status()
+    soup = BeautifulSoup(resp.content, "html.parser")
+    paragraphs = soup.find_all('p')
+    paras = [p.get_text().strip() for p in paragraphs if len(p.get_text().strip()) > 30]
+    if paras:
+        return "\n".join(paras), _validators(resp)
+    return "", {}
+
+def _extract_via_trafilatura(url: str, control: _HedgeControl) -> Tuple[str, dict]:
+    """与 12.py 相同：通过共享 Session 下载，再交给 trafilatura 提取正文"""
+    resp = _fetch_article(url, control, headers={'User-Agent': 'Mozilla/5.0'})
+    resp.raise_for_status()
+    downloaded = resp.text
+    if downloaded:
+        import trafilatura  # 只有走到此策略时才加载（导入耗时较长）
+        extracted = trafilatura.extract(downloaded, include_comments=False, include_tables=False)
+        if extracted and len(extracted) > 100:
+            return extracted, _validators(resp)
+    return "", {}
+
+EXTRACTION_STRATEGIES = {
+    "Jina Reader": _extract_via_jina,
+    "BeautifulSoup": _extract_via_soup,
+    "Trafilatura": _extract_via_trafilatura,
+}
+
+# --- 正文提取模式 ---
+# hedged: 先启动排名第一的策略，若 HEDGE_DELAY_SECONDS 内没有合格结果(或它已失败)就启动下一个，
+#         取第一个通过质量阈值的结果；HEDGE_DELAY_SECONDS = 0 时所有策略同时启动。
+# sequential: 原来的逐个降级
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "hedged")
+HEDGE_DELAY_SECONDS = float(os.getenv("HEDGE_DELAY_SECONDS", "2.0"))
+# 某个域名累计尝试次数达到该值后，按各策略在该域名上的胜率调整启动顺序
+STRATEGY_REORDER_MIN_ATTEMPTS = 5
+
+_extraction_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="extract")
+_strategy_stats: Dict[Tuple[str, str], Dict[str, float]] = {}
+_strategy_stats_lock = threading.Lock()
+
+def _record_strategy(domain: str, name: str, **increments):
+    with _strategy_stats_lock:
+        stats = _strategy_stats.setdefault((domain, name), {"attempts": 0, "successes": 0, "wins": 0, "total_latency": 0.0})
+        for field, value in increments.items():
+            stats[field] += value
+
+def _strategy_order(domain: str) -> List[str]:
+    """按该域名上的历史胜率(其次平均耗时)排序策略；样本不足时使用默认顺序"""
+    default = list(EXTRACTION_STRATEGIES)
+    with _strategy_stats_lock:
+        stats = {name: _strategy_stats.get((domain, name)) for name in default}
+    if sum(s["attempts"] for s in stats.values() if s) < STRATEGY_REORDER_MIN_ATTEMPTS:
+        return default
+    def rank(name):
+        s = stats[name]
+        if not s or not s["attempts"]:
+            return (0.0, float("inf"), default.index(name))
+        return (-s["wins"] / s["attempts"], s["total_latency"] / s["attempts"], default.index(name))
+    return sorted(default, key=rank)
+
+def extraction_stats() -> Dict[str, Dict[str, dict]]:
+    """按域名汇总各提取策略的尝试次数、胜率和平均耗时"""
+    report: Dict[str, Dict[str, dict]] = {}
+    with _strategy_stats_lock:
+        for (domain, name), s in _strategy_stats.items():
+            report.setdefault(domain, {})[name] = {
+                "attempts": s["attempts"],
+                "wins": s["wins"],
+                "win_rate": round(s["wins"] / s["attempts"], 3) if s["attempts"] else 0.0,
+                "success_rate": round(s["successes"] / s["attempts"], 3) if s["attempts"] else 0.0,
+                "avg_latency_s": round(s["total_latency"] / s["attempts"], 3) if s["attempts"] else 0.0,
+            }
+    return report
+
+def _run_strategy(name: str, url: str, control: _HedgeControl) -> Tuple[str, dict]:
+    if control.cancelled.is_set():
+        return "", {}
+    started = time.perf_counter()
     try:
-        downloaded = trafilatura.fetch_url(url)
-        if downloaded:
-            extracted = trafilatura.extract(downloaded, include_comments=False, include_tables=False)
-            if extracted and len(extracted) > 100:
-                return extracted
+        text, validators = EXTRACTION_STRATEGIES[name](url, control)
+    except ExtractionCancelled:
+        return "", {}  # 落败的策略不计入统计
     except Exception as e:
-        # --- MODIFIED ---
-        logging.warning(f"[Trafilatura 失败] URL: {url}, Error: {e}")
+        logging.warning(f"[{name} 失败] URL: {url}, Error: {e}")
+        text, validators = "", {}
+    _record_strategy(_host_key(url), name, attempts=1, successes=int(bool(text)), total_latency=time.perf_counter() - started)
+    return text, validators
 
-    return ""
+def _extract_article_text(url: str) -> Tuple[str, dict]:
+    """读取网页正文；同时返回源站的 ETag/Last-Modified（用于之后的条件请求）"""
+    domain = _host_key(url)
+    order = _strategy_order(domain)
+    control = _HedgeControl()
 
+    if EXTRACTION_MODE != "hedged":
+        for name in order:
+            text, validators = _run_strategy(name, url, control)
+            if text:
+                _record_strategy(domain, name, wins=1)
+                return text, validators
+        return "", {}
 
+    queue = list(order)
+    running = {}
+    try:
+        while queue or running:
+            if queue:
+                name = queue.pop(0)
+                running[_extraction_pool.submit(_run_strategy, name, url, control)] = name
+            # 还有备选策略时只等待对冲延迟；某个策略失败会立即进入下一轮并启动下一个策略
+            done, _ = wait(running, timeout=HEDGE_DELAY_SECONDS if queue else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                text, validators = future.result()
+                if text:
+                    _record_strategy(domain, name, wins=1)
+                    return text, validators
+    finally:
+        # 取消尚未开始的策略；进行中的策略在读到下一块数据时断开连接，并在返回时归还主机名额
+        control.cancel()
+        for future in running:
+            future.cancel()
+    return "", {}
+
+@streamlit_cache_data(ttl=86400) # 缓存1天
+def browse_article_text(url: str) -> str:
+    """读取网页正文：先查持久化缓存，过期条目用条件请求重新验证，必要时才重新下载和提取"""
+    cached = web_cache.get_entry("article", url)
+    if cached and cached["fresh"]:
+        return cached["content"]
+    if cached and web_cache.conditional_headers(cached) and _revalidate_article(url, cached):
+        web_cache.refresh_entry("article", url, ttl=web_cache.ARTICLE_TTL)
+        return cached["content"]
+
+    text, validators = _extract_article_text(url)
+    if text:
+        web_cache.put_entry("article", url, text, ttl=web_cache.ARTICLE_TTL, **validators)
+    return text
+
+
+
+# --- AI摘要缓存 ---
+# 修改Prompt或更换模型时必须同步修改版本号，使旧缓存失效
+GEMINI_MODEL = "gemini-1.5-flash-latest"
+SUMMARY_PROMPT_VERSION = "v1"
+# 批量Prompt与单篇Prompt不同，结果单独缓存；批量查询时优先复用单篇结果
+BATCH_SUMMARY_PROMPT_VERSION = "batch-v1"
+SUMMARY_TEXT_LIMIT = 12000
+SUMMARY_CACHE_TTL = 30 * 86400
+
+_summary_flight = SingleFlight()
+_summary_stats = {"hits": 0, "misses": 0}
+_summary_stats_lock = threading.Lock()
+
+def _summary_cache_key(full_text: str, company_name: str, prompt_version: str = SUMMARY_PROMPT_VERSION) -> str:
+    """同一正文经不同URL、转载或重复提问得到的结果共用一个键"""
+    normalized = re.sub(r"\s+", " ", full_text[:SUMMARY_TEXT_LIMIT]).strip()
+    return canonical_hash(normalized, company_name, prompt_version, GEMINI_MODEL)
+
+def _count_summary(field: str):
+    with _summary_stats_lock:
+        _summary_stats[field] += 1
+
+def summary_cache_stats() -> dict:
+    """AI摘要缓存的命中率；shared 为并发请求合并到同一次API调用的次数"""
+    with _summary_stats_lock:
+        hits, misses = _summary_stats["hits"], _summary_stats["misses"]
+    lookups = hits + misses
+    return {"hits": hits, "misses": misses, "shared": _summary_flight.shared,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0}
 
 def get_ai_structured_summary(full_text: str, company_name: str) -> Optional[AIInsight]:
-    """调用Gemini AI模型生成结构化的JSON情报（已修正兼容Gemini 1.5）"""
+    """调用Gemini AI模型生成结构化的JSON情报（已修正兼容Gemini 1.5）；结果按正文内容哈希持久化缓存"""
     if not GEMINI_API_KEY:
-        st.error("GEMINI_API_KEY 未在环境变量中设置！")
+        get_reporter().error("GEMINI_API_KEY 未在环境变量中设置！")
         return None
     if not full_text or len(full_text.strip()) < 50:
         # 如果文本内容太少，直接返回提示，不调用API
         return AIInsight(event_type="内容不足", key_entities="无", sentiment="中性", summary="未能从新闻链接中提取足够内容进行分析。")
 
+    key = _summary_cache_key(full_text, company_name)
+    cached = web_cache.get_entry("ai_insight", key)
+    if cached and cached["fresh"]:
+        _count_summary("hits")
+        return AIInsight.model_validate(cached["content"])
+    _count_summary("misses")
+
+    def call_and_store() -> Optional[AIInsight]:
+        insight = _call_gemini_summary(full_text, company_name)
+        if insight:
+            web_cache.put_entry("ai_insight", key, insight.model_dump(), ttl=SUMMARY_CACHE_TTL)
+        return insight
+
+    # 并发的相同请求只调用一次API
+    return _summary_flight.do(key, call_and_store)
+
+def _call_gemini_summary(full_text: str, company_name: str) -> Optional[AIInsight]:
     # 优化的Prompt，更清晰地指示模型输出JSON
     prompt = f"""
     作为一名顶级的风险投资分析师，请仔细阅读以下关于“{company_name}”公司的新闻文章内容。
@@ -158,9 +536,18 @@ def get_ai_structured_summary(full_text: str, company_name: str) -> Optional[AII
     - "summary": (string) 对整个事件的简明扼要的总结.
 
     --- 文章内容如下 ---
-    {full_text[:12000]}
+    {full_text[:SUMMARY_TEXT_LIMIT]}
     """
-    
+    try:
+        json_text = _generate_json(prompt)
+        # 使用 Pydantic 模型进行验证和解析
+        return AIInsight.model_validate_json(json_text) if json_text else None
+    except Exception as e:
+        get_reporter().error(f"解析AI模型返回时发生未知错误: {e}")
+        return None
+
+def _generate_json(prompt: str, timeout: int = 90) -> Optional[str]:
+    """向Gemini发送一次JSON模式的 generateContent 请求，返回模型输出的JSON文本；失败时返回None"""
     # 简化的Payload，这是修正的核心
     payload = {
         "contents": [{"parts": [{"text": prompt}]}], 
@@ -170,34 +557,147 @@ def get_ai_structured_summary(full_text: str, company_name: str) -> Optional[AII
         }
     }
     
-    api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent?key={GEMINI_API_KEY}"
+    api_url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
     headers = {'Content-Type': 'application/json'}
     
     try:
-        response = requests.post(api_url, headers=headers, json=payload, timeout=90)
+        with _host_slot(api_url):
+            response = get_session().post(api_url, headers=headers, json=payload, timeout=timeout)
         
         # 即使状态码不是200，也打印出返回内容以帮助调试
         if response.status_code != 200:
-            st.error(f"AI模型返回错误，状态码: {response.status_code}")
-            st.error(f"错误详情: {response.text}")
+            get_reporter().error(f"AI模型返回错误，状态码: {response.status_code}")
+            get_reporter().error(f"错误详情: {response.text}")
             return None
 
         result = response.json()
 
         if "candidates" in result and result["candidates"]:
             # Gemini 1.5 在JSON模式下，内容在 'text' 字段里
-            json_text = result["candidates"][0]["content"]["parts"][0]["text"]
-            # 使用 Pydantic 模型进行验证和解析
-            return AIInsight.model_validate_json(json_text)
+            return result["candidates"][0]["content"]["parts"][0]["text"]
         else:
             # 处理没有 candidate 但有 error 的情况
             error_message = result.get('error', {}).get('message', '未知错误')
-            st.error(f"AI分析失败: {error_message}")
+            get_reporter().error(f"AI分析失败: {error_message}")
             return None
             
     except requests.exceptions.RequestException as e:
-        st.error(f"网络请求失败，无法调用AI模型: {e}")
+        get_reporter().error(f"网络请求失败，无法调用AI模型: {e}")
         return None
     except Exception as e:
-        st.error(f"解析AI模型返回时发生未知错误: {e}")
-        return None
\ No newline at end of file
+        get_reporter().error(f"解析AI模型返回时发生未知错误: {e}")
+        return None
+
+# --- 批量摘要 ---
+# 一次请求中所有文章的估算token总数上限，以及每批最多文章数（受模型输出长度限制）
+BATCH_TOKEN_BUDGET = 60000
+BATCH_MAX_ITEMS = 10
+
+def _estimate_tokens(text: str) -> int:
+    """粗略估算：中文约1字1 token，英文约4字符1 token，这里统一按字符数保守估计"""
+    return len(text)
+
+def _pack_batches(items: List[Tuple[int, str, str]], token_budget: int, max_items: int) -> List[List[Tuple[int, str, str]]]:
+    """按token预算把 (序号, 正文, 公司) 顺序装箱"""
+    batches, current, used = [], [], 0
+    for item in items:
+        cost = _estimate_tokens(item[1][:SUMMARY_TEXT_LIMIT]) + 200
+        if current and (used + cost > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def _call_gemini_summary_batch(batch: List[Tuple[int, str, str]]) -> Dict[int, AIInsight]:
+    """一次请求分析多篇文章；逐条校验，格式不合格的条目被忽略（由调用方单独重试）"""
+    articles = "\n\n".join(
+        f"=== 文章 id={idx} | 公司: {company_name} ===\n{full_text[:SUMMARY_TEXT_LIMIT]}"
+        for idx, full_text, company_name in batch
+    )
+    prompt = f"""
+    作为一名顶级的风险投资分析师，请仔细阅读以下 {len(batch)} 篇新闻文章，每篇都标注了 id 和所关注的公司。
+    请针对每篇文章、从该公司的角度提炼出最关键的商业情报，并严格返回一个JSON数组，每篇文章对应一个对象，包含以下键：
+    - "id": (integer) 文章的 id.
+    - "event_type": (string) 总结新闻的核心事件类型 (例如: '新一轮融资', '产品发布', '高管变动', '战略合作', '负面消息').
+    - "key_entities": (string) 事件中涉及的关键实体，用逗号分隔 (例如: '投资方A, 合作伙伴B').
+    - "sentiment": (string) 必须是 "正面", "中性", "负面" 其中之一.
+    - "summary": (string) 对整个事件的简明扼要的总结.
+
+    --- 文章内容如下 ---
+    {articles}
+    """
+    json_text = _generate_json(prompt, timeout=180)
+    if not json_text:
+        return {}
+    try:
+        parsed = json.loads(json_text)
+    except json.JSONDecodeError as e:
+        logging.warning(f"[批量摘要] 无法解析模型返回的JSON: {e}")
+        return {}
+    expected_ids = {idx for idx, _, _ in batch}
+    insights = {}
+    for obj in parsed if isinstance(parsed, list) else []:
+        try:
+            idx = int(obj.pop("id"))
+            if idx in expected_ids:
+                insights[idx] = AIInsight.model_validate(obj)
+        except Exception as e:
+            logging.warning(f"[批量摘要] 跳过格式不合格的条目: {e}")
+    return insights
+
+def _fresh_summary(*keys: str) -> Optional[dict]:
+    """按顺序返回第一个仍在有效期内的摘要缓存条目"""
+    for key in keys:
+        cached = web_cache.get_entry("ai_insight", key)
+        if cached and cached["fresh"]:
+            return cached
+    return None
+
+def get_ai_structured_summaries_batch(items: List[Tuple[str, str]], token_budget: int = BATCH_TOKEN_BUDGET,
+                                      max_items_per_request: int = BATCH_MAX_ITEMS) -> List[Optional[AIInsight]]:
+    """
+    批量版 get_ai_structured_summary：items 为 (正文, 公司名) 列表，可以来自不同公司。
+    先查摘要缓存，其余文章按token预算打包进尽可能少的请求；
+    某条在批量结果中缺失或校验失败时，单独退回到 get_ai_structured_summary。
+    返回与 items 一一对应的结果列表。
+    """
+    results: List[Optional[AIInsight]] = [None] * len(items)
+    pending: Dict[str, Tuple[int, str, str]] = {}   # 批量缓存键 -> 首次出现的 (位置, 正文, 公司名)
+    duplicates: Dict[int, List[int]] = {}            # 首次出现的位置 -> 同一缓存键的所有位置
+    for idx, (full_text, company_name) in enumerate(items):
+        if not GEMINI_API_KEY or not full_text or len(full_text.strip()) < 50:
+            results[idx] = get_ai_structured_summary(full_text, company_name)
+            continue
+        batch_key = _summary_cache_key(full_text, company_name, BATCH_SUMMARY_PROMPT_VERSION)
+        cached = _fresh_summary(_summary_cache_key(full_text, company_name), batch_key)
+        if cached:
+            _count_summary("hits")
+            results[idx] = AIInsight.model_validate(cached["content"])
+        elif batch_key in pending:
+            duplicates[pending[batch_key][0]].append(idx)   # 同一批内的重复文章只发送一次
+        else:
+            pending[batch_key] = (idx, full_text, company_name)
+            duplicates[idx] = [idx]
+
+    for batch in _pack_batches(list(pending.values()), token_budget, max_items_per_request):
+        if len(batch) == 1:
+            idx, full_text, company_name = batch[0]
+            insight = get_ai_structured_summary(full_text, company_name)
+            for position in duplicates[idx]:
+                results[position] = insight
+            continue
+        insights = _call_gemini_summary_batch(batch)
+        for idx, full_text, company_name in batch:
+            insight = insights.get(idx)
+            if insight:
+                _count_summary("misses")
+                web_cache.put_entry("ai_insight", _summary_cache_key(full_text, company_name, BATCH_SUMMARY_PROMPT_VERSION),
+                                    insight.model_dump(), ttl=SUMMARY_CACHE_TTL)
+            else:
+                insight = get_ai_structured_summary(full_text, company_name)
+            for position in duplicates[idx]:
+                results[position] = insight
+    return results
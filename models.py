@@ -46,6 +46,25 @@ class ScenarioInput(BaseModel):
     revenue_delay_months: int = Field(0, ge=0, description="项目回报延迟月数")
     monthly_revenue: float = Field(0, ge=0, description="项目每月产生收入")
 
+# --- 用于对话Agent从自然语言问题中提取参数的模型（金额单位：万元） ---
+class FinancialQueryInput(BaseModel):
+    initial_cash: float = Field(description="公司初始现金，单位是万元")
+    monthly_burn: float = Field(description="公司每月运营成本或消耗，单位是万元")
+    b2c_monthly_revenue: float = Field(0, description="公司每月B2C业务收入，单位是万元")
+    monte_carlo: bool = Field(False, description="用户是否要求概率分布、风险区间、压力测试或蒙特卡洛模拟")
+
+class GoalSeekQueryInput(BaseModel):
+    initial_cash: float = Field(description="公司初始现金，单位是万元")
+    monthly_burn: float = Field(0, description="公司每月运营成本或消耗，单位是万元；求解最大月消耗时问题里通常没有，填0")
+    b2c_monthly_revenue: float = Field(0, description="公司每月B2C业务收入，单位是万元")
+    solve_for: Literal['upfront_cost', 'monthly_burn', 'monthly_extra_burn'] = Field(
+        'upfront_cost', description="要求解的变量：融资额/前期投入用 upfront_cost，公司最大月消耗用 monthly_burn，项目最大每月新增成本用 monthly_extra_burn")
+    target_runway_months: int = Field(0, description="目标生命线月数，例如'撑24个月'应为24")
+    project_duration_months: int = Field(0, description="项目周期月数；如果用户问项目是否可行，填写项目周期，否则为0")
+    monthly_extra_burn: float = Field(0, description="项目每月新增成本，单位是万元")
+    monthly_revenue: float = Field(0, description="项目每月产生收入，单位是万元")
+    revenue_delay_months: int = Field(0, description="项目回报延迟月数")
+
 class FundingRound(BaseModel):
     round_name: str         # 融资轮次，如 "A轮", "战略投资"
     date: str               # 融资日期
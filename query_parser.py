@@ -0,0 +1,294 @@
+# query_parser.py
+
+import re
+from datetime import date
+from typing import Dict, List, Tuple, Type
+
+from pydantic import BaseModel
+
+# 规则解析财务问题："初始现金200万，月消耗30万，每月B2C收入1.5万" 这类问题可以直接填充参数模型，
+# 不必再调用一次 LLM。缺少必填项、出现无法归属的数字或金额没有单位时判定为置信度不足，
+# 由调用方回退到 LLM 提取。金额统一换算为"万元"，时长统一换算为"月"；
+# 出现人民币以外的币种或百分比（增长率等）时规则无法换算，同样判定为置信度不足。
+
+# 金额单位 → 万元倍数
+MONEY_UNITS = {
+    "亿元": 1e4, "亿": 1e4, "千万元": 1e3, "千万": 1e3, "百万元": 100, "百万": 100,
+    "万元": 1, "万": 1, "w": 1, "千元": 0.1, "千": 0.1, "元": 1e-4, "块": 1e-4,
+    "billion": 1e5, "bn": 1e5, "b": 1e5, "million": 100, "mn": 100, "m": 100, "thousand": 0.1, "k": 0.1,
+}
+# 时长单位 → 月数
+DURATION_UNITS = {"个多月": 1, "个月": 1, "months": 1, "month": 1, "年": 12, "years": 12, "year": 12}
+
+# (字段, 数量类型, 关键词, 给出区间时取保守的一端, 换算系数)
+# 以 "_" 开头的字段只用于确定数字的归属（B2B 合同、预测期），不写入参数模型
+_MONTHLY = r"(?:每个?月|一个月|月度?)"
+FIELD_RULES = [
+    ("initial_cash", "money",
+     r"(?:初始|期初|账上|账面|在手|可用)?现金(?!流)(?:余额|储备)?|账上|账面资金|在手资金|可用资金|存款|余额"
+     r"|cash on hand|cash balance|cash(?! ?flow)|in the bank", "low", 1),
+    ("monthly_burn", "money",
+     rf"{_MONTHLY}(?:的)?(?:运营)?(?:消耗|支出|成本|开销|花费|花销|花|烧掉|烧)|运营成本|烧钱|消耗|支出|开销"
+     r"|monthly (?:burn|expenses?|costs?|opex|spend)|burn rate|burn(?:ing)?|opex|expenses?|spend(?:ing)?", "high", 1),
+    ("monthly_burn", "money", r"(?:每年|年度?)(?:的)?(?:运营)?(?:消耗|支出|成本|开销)|annual (?:burn|expenses?|costs?|opex)", "high", 1 / 12),
+    ("b2c_monthly_revenue", "money",
+     rf"{_MONTHLY}?(?:的)?B2C(?:业务)?(?:月)?(?:收入|营收)|{_MONTHLY}(?:的)?(?:营业)?(?:收入|营收|流水)|营收|收入"
+     r"|MRR|monthly revenue|revenue|sales", "low", 1),
+    ("b2c_monthly_revenue", "money", r"(?:每年|年度?)(?:的)?(?:B2C)?(?:营业)?(?:收入|营收|流水)|ARR|annual revenue", "low", 1 / 12),
+    ("monthly_extra_burn", "money",
+     rf"{_MONTHLY}?(?:新增|额外|追加)(?:的)?(?:成本|支出|消耗|投入)?"
+     r"|(?:extra|additional) (?:monthly )?(?:burn|costs?|spend)", "high", 1),
+    ("monthly_revenue", "money",
+     rf"项目{_MONTHLY}?(?:能|可以|可)?(?:产生|带来|贡献)?(?:的)?(?:收入|营收|回报)|project (?:monthly )?revenue", "low", 1),
+    ("upfront_cost", "money",
+     r"前期(?:一次性)?(?:投入|成本|投资)|一次性(?:投入|成本|投资)|启动资金|融资|upfront(?: costs?| investment)?|funding|raise", "high", 1),
+    ("target_runway_months", "months", r"撑(?:过|到|满)?|维持|坚持|支撑|活|生命线|跑道|runway|survive|last|sustain", "high", 1),
+    ("project_duration_months", "months",
+     r"项目(?:周期|持续|为期|时长|期限)(?:为|是)?|周期|为期|持续|project (?:duration|length)|lasting|lasts", "high", 1),
+    ("revenue_delay_months", "months",
+     r"(?:回报|收入|营收)?(?:延迟|推迟|滞后)|后(?:才)?(?:开始)?(?:有|产生|带来)?(?:收入|回报|营收)|delay(?:ed)?(?: by| of)?|after", "high", 1),
+    ("_horizon_months", "months", r"未来|接下来|今后|预测|(?:之|以)?后|projection|forecast|over the next|next", "low", 1),
+    ("_b2b_value", "money", r"B2B(?:业务)?(?:合同|订单|收入|回款)?|(?:大客户)?(?:合同|订单)(?:金额|额)?|contracts?", "low", 1),
+    ("_b2b_payment_terms_months", "months", r"账期|回款周期|付款周期|回款|付款", "high", 1),
+]
+
+# 要求至少提供其中一项的字段组（仅当模型包含这些字段时检查）
+REQUIRES_ONE_OF = [("target_runway_months", "project_duration_months")]
+
+MONTE_CARLO_RE = re.compile(
+    r"概率|分布|风险区间|置信区间|压力测试|蒙特卡[洛罗]|P\d{2}|monte ?carlo|probabilit|distribution|stress test|percentile",
+    re.IGNORECASE)
+SOLVE_FOR_RULES = [
+    ("monthly_extra_burn", re.compile(
+        r"最多(?:能|可以|可)?(?:新增|追加|额外)|最大(?:可承受)?(?:的)?(?:每月)?(?:新增|额外|追加)"
+        r"|(?:新增|额外|追加)(?:成本|支出)?最多|max(?:imum)? (?:extra|additional)", re.IGNORECASE)),
+    ("monthly_burn", re.compile(
+        r"最多(?:能|可以|可)?(?:花|消耗|支出|烧)|最大(?:可承受)?(?:的)?(?:每月|月)?(?:消耗|支出|开销)"
+        r"|(?:月消耗|每月消耗|月支出)最多|max(?:imum)? (?:monthly )?(?:burn|spend)|how much can (?:we|i) (?:burn|spend)",
+        re.IGNORECASE)),
+]
+
+_CN_DIGIT_VALUES = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_CN_MULTIPLIERS = {"十": 10, "百": 100, "千": 1000}
+_NUMBER = r"(?:\d+(?:,\d{3})*(?:\.\d+)?|[零〇一二两三四五六七八九十百千]+(?:点[零〇一二三四五六七八九]+)?)"
+_RANGE_SEP = r"\s*(?:-|~|～|—|–|到|至|to)\s*"
+
+
+def _unit_pattern(units: Dict[str, float]) -> str:
+    return "|".join(re.escape(u) for u in sorted(units, key=len, reverse=True))
+
+
+# 币种标记在扫描数字前抹去；foreign 分组为人民币以外的币种（不做汇率换算）
+_CURRENCY_RE = re.compile(
+    r"人民币|RMB|CNY|[¥￥]|(?P<foreign>(?<![A-Za-z])(?:USD|HKD|EUR|GBP|JPY)(?![A-Za-z])|US\$|HK\$|[$€£]"
+    r"|美元|美金|港币|港元|欧元|英镑|日元)", re.IGNORECASE)
+_PERCENT_RE = re.compile(rf"(?<![A-Za-z0-9.]){_NUMBER}\s*(?:[%％]|percent(?![A-Za-z]))|百分之{_NUMBER}", re.IGNORECASE)
+_DATE_RES = [
+    re.compile(r"(?<!\d)(?P<year>(?:19|20)\d{2})\s*年\s*(?P<month>1[0-2]|0?[1-9])\s*月(?:\s*(?P<day>[12]\d|3[01]|0?[1-9])\s*[日号])?"),
+    re.compile(r"(?<![\d.])(?P<year>(?:19|20)\d{2})[-/](?P<month>1[0-2]|0?[1-9])(?:[-/](?P<day>[12]\d|3[01]|0?[1-9]))?(?![\d.])"),
+]
+_YEAR_RE = re.compile(r"(?<!\d)(?:19|20)\d{2}\s*年")
+_DURATION_RE = re.compile(
+    rf"(?<![A-Za-z0-9.])(?:(?P<low>{_NUMBER})(?:{_RANGE_SEP}(?P<high>{_NUMBER}))?|(?P<half>半))\s*"
+    rf"(?P<unit>{_unit_pattern(DURATION_UNITS)})(?P<and_half>半)?(?![A-Za-z])", re.IGNORECASE)
+_MONEY_RE = re.compile(
+    rf"(?<![A-Za-z0-9.])(?P<low>{_NUMBER})\s*(?P<low_unit>{_unit_pattern(MONEY_UNITS)})?"
+    rf"(?:{_RANGE_SEP}(?P<high>{_NUMBER})\s*(?P<high_unit>{_unit_pattern(MONEY_UNITS)})?)?(?![A-Za-z0-9%％])", re.IGNORECASE)
+_CLAUSE_SEP_RE = re.compile(r"[，,；;。！!？?\n]")
+_RESPECTIVELY_RE = re.compile(r"分别|respectively", re.IGNORECASE)
+_KEYWORD_RES = [(field, kind, re.compile(rf"(?<![A-Za-z])(?:{pattern})(?![A-Za-z])", re.IGNORECASE), side, scale)
+                for field, kind, pattern, side, scale in FIELD_RULES]
+
+
+def parse_number(text: str) -> float:
+    """解析阿拉伯数字（可带千分位）或中文数字，如 "1,500"、"1.5"、"两百五十"、"一千五"、"三点五" """
+    text = text.replace(",", "")
+    if text[0].isdigit():
+        return float(text)
+    integer, _, fraction = text.partition("点")
+    total, digit, last_multiplier, zero_seen = 0, 0, 1, False
+    for ch in integer:
+        if ch in _CN_MULTIPLIERS:
+            last_multiplier = _CN_MULTIPLIERS[ch]
+            total += (digit or 1) * last_multiplier
+            digit, zero_seen = 0, False
+        else:
+            digit = _CN_DIGIT_VALUES[ch]
+            zero_seen = zero_seen or digit == 0
+    # "两百五"、"一千五" 这类省略末位单位的口语写法
+    total += digit * last_multiplier / 10 if digit and last_multiplier >= 100 and not zero_seen else digit
+    if fraction:
+        total += float("0." + "".join(str(_CN_DIGIT_VALUES[ch]) for ch in fraction))
+    return total
+
+
+def _mask(text: str, start: int, end: int) -> str:
+    return text[:start] + " " * (end - start) + text[end:]
+
+
+def _scan(text: str) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+    """
+    返回 (关键词命中, 数量, 日期)，位置均相对于原文。
+    识别出的日期、时长、金额依次在副本中抹去，避免被后面的规则重复识别。
+    """
+    masked = text
+    for m in _CURRENCY_RE.finditer(masked):
+        masked = _mask(masked, m.start(), m.end())
+
+    dates = []
+    for date_re in _DATE_RES:
+        for m in date_re.finditer(masked):
+            dates.append({"pos": m.start(), "value": f"{int(m['year'])}-{int(m['month']):02d}-{int(m['day'] or 1):02d}"})
+            masked = _mask(masked, m.start(), m.end())
+    for m in _YEAR_RE.finditer(masked):
+        masked = _mask(masked, m.start(), m.end())
+
+    quantities = []
+    for m in _DURATION_RE.finditer(masked):
+        months = DURATION_UNITS[m["unit"].lower()]
+        low = 0.5 if m["half"] else parse_number(m["low"])
+        high = parse_number(m["high"]) if m["high"] else low
+        if m["and_half"]:   # "一年半"、"两个月半"
+            low, high = low + 0.5, high + 0.5
+        quantities.append({"kind": "months", "start": m.start(), "end": m.end(), "raw": m.group(),
+                           "low": low * months, "high": high * months, "unit_missing": False})
+        masked = _mask(masked, m.start(), m.end())
+    for m in _MONEY_RE.finditer(masked):
+        low_unit, high_unit = m["low_unit"], m["high_unit"] if m["high"] else None
+        unit = (low_unit or high_unit or "").lower()
+        # 不带单位的中文数字（"一家"、"一笔"）不是金额
+        if not unit and not m["low"][0].isdigit():
+            continue
+        low = parse_number(m["low"]) * MONEY_UNITS.get((low_unit or unit).lower(), 1)
+        high = parse_number(m["high"]) * MONEY_UNITS.get((high_unit or unit).lower(), 1) if m["high"] else low
+        quantities.append({"kind": "money", "start": m.start(), "end": m.end(), "raw": m.group().strip(),
+                           "low": low, "high": high, "unit_missing": not unit})
+        masked = _mask(masked, m.start(), m.end())
+
+    # 关键词取最左最长匹配，"项目每月收入" 不会再被拆出 "收入"
+    hits = []
+    for order, (field, kind, pattern, side, scale) in enumerate(_KEYWORD_RES):
+        for m in pattern.finditer(masked):
+            if m.end() > m.start():
+                hits.append({"field": field, "kind": kind, "side": side, "scale": scale,
+                             "start": m.start(), "end": m.end(), "order": order})
+    hits.sort(key=lambda h: (h["start"], h["start"] - h["end"], h["order"]))
+    keywords, covered_until = [], -1
+    for hit in hits:
+        if hit["start"] >= covered_until:
+            keywords.append(hit)
+            covered_until = hit["end"]
+    quantities.sort(key=lambda q: q["start"])
+    return keywords, quantities, sorted(dates, key=lambda d: d["pos"])
+
+
+def _bind(text: str) -> Tuple[List[Dict], List[str], List[Dict]]:
+    """
+    在每个分句内把数量归属到关键词：优先取前面最近的未占用关键词，没有时取后面最近的；
+    分句中出现"分别"时按出现顺序一一对应。返回 (归属结果, 无法归属的数字原文, 日期)。
+    """
+    keywords, quantities, dates = _scan(text)
+    bounds = [0] + [m.end() for m in _CLAUSE_SEP_RE.finditer(text)] + [len(text) + 1]
+    bindings, unassigned = [], []
+    for clause_start, clause_end in zip(bounds, bounds[1:]):
+        clause_keywords = [k for k in keywords if clause_start <= k["start"] < clause_end]
+        clause_quantities = [q for q in quantities if clause_start <= q["start"] < clause_end]
+        respectively = _RESPECTIVELY_RE.search(text, clause_start, clause_end) is not None
+        used = set()
+        for q in clause_quantities:
+            candidates = [i for i, k in enumerate(clause_keywords) if k["kind"] == q["kind"] and i not in used]
+            if respectively:
+                chosen = candidates[0] if candidates else None
+            else:
+                before = [i for i in candidates if clause_keywords[i]["end"] <= q["start"]]
+                after = [i for i in candidates if clause_keywords[i]["start"] >= q["end"]]
+                chosen = before[-1] if before else (after[0] if after else None)
+            if chosen is None:
+                unassigned.append(q["raw"])
+                continue
+            used.add(chosen)
+            k = clause_keywords[chosen]
+            value = (q["high"] if k["side"] == "high" else q["low"]) * k["scale"]
+            bindings.append({"field": k["field"], "kind": q["kind"], "value": value, "pos": q["start"],
+                             "raw": q["raw"], "unit_missing": q["unit_missing"]})
+    return bindings, unassigned, dates
+
+
+def _unsupported(text: str) -> List[str]:
+    """规则无法换算的内容：人民币以外的币种、百分比"""
+    found = [m.group() for m in _CURRENCY_RE.finditer(text) if m["foreign"]]
+    return found + [m.group() for m in _PERCENT_RE.finditer(text)]
+
+
+def _solve_for(text: str) -> str:
+    for field, pattern in SOLVE_FOR_RULES:
+        if pattern.search(text):
+            return field
+    return "upfront_cost"
+
+
+def parse_query(text: str, model: Type[BaseModel]) -> Dict:
+    """
+    按 model 的字段从问题中提取参数。返回:
+    {'values': 可直接传给 model(**values) 的字段, 'missing': 缺少的必填项,
+     'unassigned': 无法归属或模型中没有对应字段的数字, 'unsupported': 外币标记和百分比,
+     'confident': 是否可以跳过 LLM}
+    """
+    fields = model.model_fields
+    bindings, unassigned, _ = _bind(text or "")
+    values, conflicts, unit_missing = {}, [], []
+    for b in bindings:
+        field = b["field"]
+        if field.startswith("_"):
+            continue
+        if field not in fields:
+            unassigned.append(b["raw"])
+            continue
+        value = int(round(b["value"])) if b["kind"] == "months" else round(b["value"], 4)
+        if field in values and values[field] != value:
+            conflicts.append(field)
+        if b["unit_missing"]:
+            unit_missing.append(field)
+        values[field] = value
+    if "monte_carlo" in fields:
+        values["monte_carlo"] = bool(MONTE_CARLO_RE.search(text or ""))
+    if "solve_for" in fields:
+        values["solve_for"] = _solve_for(text or "")
+
+    missing = [name for name, info in fields.items() if info.is_required() and name not in values]
+    for group in REQUIRES_ONE_OF:
+        if all(name in fields for name in group) and not any(values.get(name) for name in group):
+            missing.append("|".join(group))
+    unsupported = _unsupported(text or "")
+    found_numbers = any(not b["field"].startswith("_") and b["field"] in fields for b in bindings)
+    confident = found_numbers and not (missing or unassigned or conflicts or unit_missing or unsupported)
+    return {"values": values, "missing": missing, "unassigned": unassigned, "unsupported": unsupported,
+            "confident": confident}
+
+
+def parse_b2b_contracts(text: str) -> List[Dict]:
+    """
+    提取 B2B 合同（字段与 models.B2BContract 一致）。签约日期、账期归属于其前面最近的合同，
+    前面没有合同时归属于第一份合同；未给出签约日期时按本月签约处理，未给出账期时按 0 处理。
+    """
+    bindings, _, dates = _bind(text or "")
+    contracts = [b for b in bindings if b["field"] == "_b2b_value" and b["value"] > 0]
+    if not contracts:
+        return []
+    terms = [b for b in bindings if b["field"] == "_b2b_payment_terms_months"]
+
+    def owner(pos: int) -> int:
+        preceding = [i for i, c in enumerate(contracts) if c["pos"] <= pos]
+        return preceding[-1] if preceding else 0
+
+    sign_dates, payment_terms = {}, {}
+    for d in dates:
+        sign_dates.setdefault(owner(d["pos"]), d["value"])
+    for t in terms:
+        payment_terms.setdefault(owner(t["pos"]), int(round(t["value"])))
+    this_month = date.today().replace(day=1).isoformat()
+    return [
+        {"contract_name": f"B2B合同{i + 1}", "value": round(c["value"], 4),
+         "sign_date_str": sign_dates.get(i, this_month), "payment_terms_months": payment_terms.get(i, 0)}
+        for i, c in enumerate(contracts)
+    ]
@@ -0,0 +1,140 @@
+# reporting.py
+
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+# 监控流水线的进度汇报接口：在 Streamlit 页面中显示为 toast/status，
+# 在 cron、调度进程等无界面环境中输出为结构化事件（JSON 行），两者共用同一套流水线代码。
+# 本模块不在导入时加载 streamlit，只有确实在 Streamlit 运行时内才会导入。
+
+logger = logging.getLogger("monitoring")
+
+
+def streamlit_running() -> bool:
+    """当前进程是否运行在 Streamlit 服务中（未导入 streamlit 时直接返回 False）"""
+    if "streamlit" not in sys.modules:
+        return False
+    from streamlit import runtime
+    return runtime.exists()
+
+
+def streamlit_cache_data(ttl: int):
+    """
+    在 Streamlit 运行时内等同于 st.cache_data(ttl=ttl)；在脚本/cron 中直接调用原函数，
+    因此被装饰的模块导入时不需要加载 streamlit（持久化缓存仍由 web_cache 负责）。
+    """
+    def decorator(func):
+        cached = None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            nonlocal cached
+            if not streamlit_running():
+                return func(*args, **kwargs)
+            if cached is None:
+                import streamlit as st
+                cached = st.cache_data(ttl=ttl)(func)
+            return cached(*args, **kwargs)
+
+        wrapper.clear = lambda: cached.clear() if cached is not None else None
+        return wrapper
+    return decorator
+
+
+class StatusHandle:
+    """status() 返回的句柄，与 st.status 的 update 用法一致"""
+
+    def __init__(self, reporter: "Reporter", label: str):
+        self._reporter = reporter
+        self.label = label
+
+    def update(self, label: Optional[str] = None, state: Optional[str] = None, expanded: Optional[bool] = None):
+        if label is not None:
+            self.label = label
+        self._reporter.emit("status", label=self.label, state=state)
+
+
+class Reporter:
+    """无界面的汇报器：每条消息都转换为一个结构化事件交给 sink（默认写入 monitoring 日志）"""
+
+    def __init__(self, sink: Optional[Callable[[Dict], None]] = None):
+        self._sink = sink or self._log_event
+
+    @staticmethod
+    def _log_event(event: Dict):
+        logger.info(json.dumps(event, ensure_ascii=False))
+
+    def emit(self, event: str, **fields):
+        self._sink({"ts": round(time.time(), 3), "event": event, **fields})
+
+    def toast(self, message: str, icon: Optional[str] = None):
+        self.emit("toast", message=message)
+
+    def info(self, message: str):
+        self.emit("info", message=message)
+
+    def success(self, message: str):
+        self.emit("success", message=message)
+
+    def warning(self, message: str):
+        self.emit("warning", message=message)
+
+    def error(self, message: str):
+        self.emit("error", message=message)
+
+    @contextmanager
+    def status(self, label: str, state: str = "running"):
+        self.emit("status", label=label, state=state)
+        yield StatusHandle(self, label)
+
+
+class StreamlitReporter(Reporter):
+    """在 Streamlit 页面中显示进度（与改造前直接调用 st.* 的效果相同）"""
+
+    def _st(self):
+        import streamlit as st
+        return st
+
+    def toast(self, message: str, icon: Optional[str] = None):
+        self._st().toast(message, icon=icon)
+
+    def info(self, message: str):
+        self._st().info(message)
+
+    def success(self, message: str):
+        self._st().success(message)
+
+    def warning(self, message: str):
+        self._st().warning(message)
+
+    def error(self, message: str):
+        self._st().error(message)
+
+    @contextmanager
+    def status(self, label: str, state: str = "running"):
+        with self._st().status(label, state=state) as status:
+            yield status
+
+
+_reporter: Optional[Reporter] = None
+_reporter_lock = threading.Lock()
+
+
+def set_reporter(reporter: Optional[Reporter]):
+    """替换全局汇报器；传入 None 时恢复为按运行环境自动选择"""
+    global _reporter
+    with _reporter_lock:
+        _reporter = reporter
+
+
+def get_reporter() -> Reporter:
+    """显式设置的汇报器优先；否则在 Streamlit 运行时内使用 StreamlitReporter，其余情况输出结构化事件"""
+    if _reporter is not None:
+        return _reporter
+    return StreamlitReporter() if streamlit_running() else Reporter()
@@ -0,0 +1,79 @@
+# tests/test_agent_brain.py
+"""
+SolveFundingGoal 工具：三种求解目标都能从自然语言问题走到求解器。
+问题都能被规则解析器高置信度解析，因此不会调用 LLM。
+"""
+
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# agent_brain 依赖 langchain 0.x 的 API；环境中的 langchain 版本不兼容时跳过
+agent_brain = pytest.importorskip("agent_brain", exc_type=ImportError)
+import engine  # noqa: E402
+from cache import LRUCache  # noqa: E402
+from models import FinancialInput, ScenarioInput  # noqa: E402
+
+
+def _solved_value(result: str) -> float:
+    return float(re.search(r"\*\*: ([\d.]+) 万元", result).group(1))
+
+
+def test_solve_max_monthly_burn_without_stated_burn():
+    result = agent_brain.solve_funding_goal_tool("账上有500万，每月最多能花多少才能撑24个月")
+    assert "公司最大可承受月消耗" in result
+    expected = engine.solve_for_target_runway(FinancialInput(initial_cash=500, monthly_burn=1), 24, 'monthly_burn')
+    assert _solved_value(result) == pytest.approx(expected["value"])
+
+
+def test_solve_upfront_cost():
+    result = agent_brain.solve_funding_goal_tool("账上1000万，月消耗80万，需要融多少钱才能撑24个月？")
+    assert "最少需要融资/前期投入" in result
+    expected = engine.solve_for_target_runway(FinancialInput(initial_cash=1000, monthly_burn=80), 24, 'upfront_cost')
+    assert _solved_value(result) == pytest.approx(expected["value"])
+
+
+def test_solve_monthly_extra_burn_for_project():
+    result = agent_brain.solve_funding_goal_tool(
+        "现金1000万，月消耗60万，一个为期12个月的项目，项目每月收入10万，3个月后开始有收入，每月最多能新增多少成本？")
+    assert "项目最大可承受每月新增成本" in result
+    expected = engine.solve_for_project_feasibility(
+        FinancialInput(initial_cash=1000, monthly_burn=60), 12, 'monthly_extra_burn',
+        ScenarioInput(monthly_revenue=10, revenue_delay_months=3))
+    assert _solved_value(result) == pytest.approx(expected["value"])
+
+
+def test_upfront_cost_still_requires_monthly_burn():
+    assert "信息不足" in agent_brain.solve_funding_goal_tool("账上1000万，需要融多少钱才能撑24个月？")
+
+
+def _call_in_session(cache, tool, tool_input):
+    token = agent_brain._current_tool_cache.set(cache)
+    try:
+        return tool(tool_input)
+    finally:
+        agent_brain._current_tool_cache.reset(token)
+
+
+def test_tool_results_are_cached_per_session():
+    calls = []
+    tool = agent_brain._memoized_tool("Echo", lambda x: calls.append(x) or f"结果{len(calls)}")
+    session_a, session_b = (LRUCache(maxsize=agent_brain.TOOL_CACHE_MAXSIZE, ttl=agent_brain.TOOL_CACHE_TTL_SECONDS)
+                            for _ in range(2))
+    assert _call_in_session(session_a, tool, " '月之暗面' ") == "结果1"
+    assert _call_in_session(session_a, tool, "月之暗面") == "结果1"
+    assert _call_in_session(session_b, tool, "月之暗面") == "结果2"
+    assert len(calls) == 2
+
+
+def test_tool_errors_are_not_cached():
+    calls = []
+    tool = agent_brain._memoized_tool("Fails", lambda x: calls.append(x) or f"{agent_brain.TOOL_ERROR_PREFIX}，出错了")
+    cache = LRUCache(maxsize=4)
+    _call_in_session(cache, tool, "x")
+    _call_in_session(cache, tool, "x")
+    assert len(calls) == 2
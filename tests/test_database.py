@@ -0,0 +1,166 @@
+# tests/test_database.py
+"""结构迁移（按版本顺序、幂等、带数据回填）与后台任务队列（认领、心跳归属、无响应重排与失败上限）"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import database  # noqa: E402
+from models import B2BContract, CompetitiveInput, FinancialInput  # noqa: E402
+
+LATEST_VERSION = database.MIGRATIONS[-1][0]
+
+COMPETITIVE = CompetitiveInput(tech_barrier_status='仅有专利或论文 ≥1 件', market_validation_status='已获得有少量预付款的合同',
+                               team_status='普通社招为主')
+FINANCIAL = FinancialInput(initial_cash=500, monthly_burn=30, b2c_monthly_revenue=2, b2b_contracts=[
+    B2BContract(contract_name="大客户", value=100, sign_date_str="2024-03-01", payment_terms_months=3)])
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "companies.db"))
+    yield
+    database.close_all_connections()
+
+
+@pytest.fixture
+def job_db(db_file):
+    database.setup_monitoring_tables()
+
+
+def _legacy_tables(monkeypatch):
+    """只建迁移之前就存在的表，模拟旧版本的数据库"""
+    with monkeypatch.context() as m:
+        m.setattr(database, "apply_migrations", lambda *args, **kwargs: [])
+        database.setup_monitoring_tables()
+    database.create_company_table()
+
+
+def _make_stale(job_id):
+    with database.get_db_connection() as conn:
+        conn.execute("UPDATE jobs SET heartbeat_at = datetime('now', '-1 hour') WHERE id = ?", (job_id,))
+
+
+# --- 迁移 ---
+
+def test_migrations_apply_in_order_and_only_once(db_file, monkeypatch):
+    _legacy_tables(monkeypatch)
+    assert database.get_schema_version() == 0
+    assert database.apply_migrations(target_version=2) == [1, 2]
+    assert database.get_schema_version() == 2
+    assert database.apply_migrations() == list(range(3, LATEST_VERSION + 1))
+    assert database.apply_migrations() == []
+    assert database.get_schema_version() == LATEST_VERSION
+
+
+def test_migration_versions_are_increasing():
+    versions = [version for version, _, _ in database.MIGRATIONS]
+    assert versions == sorted(set(versions))
+
+
+def test_processed_urls_backfilled_from_alerts(db_file, monkeypatch):
+    _legacy_tables(monkeypatch)
+    with database.get_db_connection() as conn:
+        conn.execute("INSERT INTO alerts (company_name, alert_text, source_url) VALUES (?, ?, ?)",
+                     ("月之暗面", "融资", "https://www.example.com/a/?utm_source=rss"))
+    database.apply_migrations()
+    assert database.is_url_processed("https://example.com/a")
+
+
+def test_company_blobs_migrated_to_normalized_tables(db_file, monkeypatch):
+    _legacy_tables(monkeypatch)
+    with database.get_db_connection() as conn:
+        conn.execute("INSERT INTO companies (name, competitive_data, financial_data) VALUES (?, ?, ?)",
+                     ("月之暗面", COMPETITIVE.model_dump_json(), FINANCIAL.model_dump_json()))
+    database.apply_migrations()
+    competitive, financial = database.load_company_data("月之暗面")
+    assert CompetitiveInput(**competitive) == COMPETITIVE
+    assert FinancialInput(**financial) == FINANCIAL
+    with database.get_db_connection() as conn:
+        row = conn.execute("SELECT competitive_data, financial_data FROM companies").fetchone()
+    assert (row["competitive_data"], row["financial_data"]) == (None, None)
+
+
+# --- 任务队列 ---
+
+def test_enqueue_dedups_active_jobs(job_db):
+    first = database.enqueue_job("monitor", {"company": "A"}, dedup_key="monitor:A")
+    assert first["created"]
+    assert database.enqueue_job("monitor", {"company": "A"}, dedup_key="monitor:A") == {"id": first["id"], "created": False}
+    assert database.enqueue_job("monitor", {"company": "B"}, dedup_key="monitor:B")["created"]
+    # 任务结束后同一 dedup_key 可以再次提交
+    database.claim_next_job("w1")
+    database.finish_job(first["id"], "w1", result={"ok": True})
+    assert database.enqueue_job("monitor", {"company": "A"}, dedup_key="monitor:A")["created"]
+
+
+def test_claim_is_fifo_and_filters_kinds(job_db):
+    report = database.enqueue_job("report")["id"]
+    monitor = database.enqueue_job("monitor", {"company": "A"})["id"]
+    job = database.claim_next_job("w1", ["monitor"])
+    assert (job["id"], job["status"], job["worker_id"], job["params"]) == (monitor, "running", "w1", {"company": "A"})
+    assert database.claim_next_job("w2", ["monitor"]) is None
+    assert database.claim_next_job("w2")["id"] == report
+    assert database.claim_next_job("w3") is None
+
+
+def test_only_owner_can_update_or_finish(job_db):
+    job_id = database.enqueue_job("monitor")["id"]
+    database.claim_next_job("w1")
+    assert database.update_job_progress(job_id, "w1", progress=0.5, message="检索中", partial_result={"n": 1})
+    assert not database.update_job_progress(job_id, "w2", progress=0.9)
+    assert not database.finish_job(job_id, "w2", result={"n": 2})
+    assert database.finish_job(job_id, "w1", result={"n": 3})
+    job = database.get_job(job_id)
+    assert (job["status"], job["progress"], job["result"]) == ("done", 1, {"n": 3})
+    assert not database.update_job_progress(job_id, "w1", progress=0.1)
+
+
+def test_failed_job_keeps_progress(job_db):
+    job_id = database.enqueue_job("monitor")["id"]
+    database.claim_next_job("w1")
+    database.update_job_progress(job_id, "w1", progress=0.4)
+    assert database.finish_job(job_id, "w1", error="boom")
+    job = database.get_job(job_id)
+    assert (job["status"], job["progress"], job["error"]) == ("failed", 0.4, "boom")
+
+
+def test_stale_job_is_requeued_and_old_worker_is_fenced(job_db):
+    job_id = database.enqueue_job("monitor")["id"]
+    database.claim_next_job("w1")
+    assert database.requeue_stale_jobs() == 0
+    _make_stale(job_id)
+    assert database.requeue_stale_jobs() == 1
+    assert database.get_job(job_id)["status"] == "queued"
+    assert database.claim_next_job("w2")["id"] == job_id
+    # 原工作进程恢复后不能再写入
+    assert not database.update_job_progress(job_id, "w1", progress=0.9)
+    assert database.finish_job(job_id, "w2", result={})
+
+
+def test_worker_heartbeat_keeps_running_job_alive(job_db):
+    job_id = database.enqueue_job("monitor")["id"]
+    database.claim_next_job("w1")
+    _make_stale(job_id)
+    database.register_job_worker("w1")
+    assert database.requeue_stale_jobs() == 0
+    assert database.count_live_job_workers() == 1
+    database.unregister_job_worker("w1")
+    assert database.count_live_job_workers() == 0
+
+
+def test_job_that_keeps_crashing_workers_fails(job_db):
+    job_id = database.enqueue_job("monitor", dedup_key="monitor:A")["id"]
+    for attempt in range(1, database.MAX_JOB_ATTEMPTS + 1):
+        job = database.claim_next_job(f"w{attempt}")
+        assert (job["id"], job["attempts"]) == (job_id, attempt)
+        _make_stale(job_id)
+        database.requeue_stale_jobs()
+    job = database.get_job(job_id)
+    assert job["status"] == "failed" and job["error"]
+    assert database.claim_next_job("w9") is None
+    assert database.get_active_jobs() == []
+    assert database.enqueue_job("monitor", dedup_key="monitor:A")["created"]
@@ -0,0 +1,80 @@
+# tests/test_dedup.py
+"""SimHash 近似重复识别：同批聚类，以及按分段(band)查找的跨运行指纹索引"""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import database  # noqa: E402
+import dedup  # noqa: E402
+
+ORIGINAL = "月之暗面完成新一轮10亿美元融资，估值达到30亿美元，阿里巴巴与腾讯参投"
+REPRINT = "月之暗面完成新一轮10亿美元融资，估值达到30亿美元，阿里巴巴、腾讯参投"
+UNRELATED = "智谱发布新一代开源大模型GLM-5，推理性能大幅提升"
+
+
+@pytest.fixture
+def fingerprint_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(dedup, "FINGERPRINT_FILE", str(tmp_path / "fingerprints.db"))
+    yield
+    database.close_all_connections()
+
+
+def test_simhash_ignores_case_markup_and_punctuation():
+    assert dedup.simhash("Moonshot AI raises funds!") == dedup.simhash("<b>moonshot ai</b> raises funds")
+
+
+def test_reprint_is_near_duplicate():
+    assert dedup.hamming_distance(dedup.simhash(ORIGINAL), dedup.simhash(REPRINT)) <= dedup.NEAR_DUPLICATE_DISTANCE
+    assert dedup.hamming_distance(dedup.simhash(ORIGINAL), dedup.simhash(UNRELATED)) > dedup.NEAR_DUPLICATE_DISTANCE
+
+
+def test_close_fingerprints_share_a_band():
+    # 抽屉原理：汉明距离 ≤ NEAR_DUPLICATE_DISTANCE 的两个指纹至少有一段完全相同
+    rng = random.Random(0)
+    for _ in range(200):
+        a = rng.getrandbits(dedup.FINGERPRINT_BITS)
+        b = a
+        for bit in rng.sample(range(dedup.FINGERPRINT_BITS), dedup.NEAR_DUPLICATE_DISTANCE):
+            b ^= 1 << bit
+        assert any(x == y for x, y in zip(dedup._bands(a), dedup._bands(b)))
+
+
+def test_signed_round_trip():
+    for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        signed = dedup._to_signed(value)
+        assert -(1 << 63) <= signed < 1 << 63
+        assert dedup._to_unsigned(signed) == value
+
+
+def test_cluster_keeps_first_and_counts_duplicates():
+    articles = [{"title": ORIGINAL}, {"title": UNRELATED}, {"title": REPRINT}]
+    clustered = dedup.cluster_near_duplicates(articles, lambda a: a["title"])
+    assert [a["title"] for a in clustered] == [ORIGINAL, UNRELATED]
+    assert clustered[0]["duplicates"] == 1
+    assert "duplicates" not in clustered[1]
+    assert "duplicates" not in articles[0]   # 不修改输入
+
+
+def test_seen_duplicate_across_runs(fingerprint_db):
+    dedup.remember([{"company_name": "月之暗面", "url": "https://a.com/1", "text": ORIGINAL}])
+    assert dedup.find_seen_duplicate("月之暗面", REPRINT, "https://b.com/2") == "https://a.com/1"
+    # 同一URL不算转载；不相关的文章、其他公司的索引都不命中
+    assert dedup.find_seen_duplicate("月之暗面", ORIGINAL, "https://a.com/1") is None
+    assert dedup.find_seen_duplicate("月之暗面", UNRELATED, "https://b.com/3") is None
+    assert dedup.find_seen_duplicate("智谱", REPRINT, "https://b.com/2") is None
+
+
+def test_remember_is_idempotent(fingerprint_db):
+    entry = {"company_name": "月之暗面", "url": "https://a.com/1", "text": ORIGINAL}
+    dedup.remember([entry])
+    dedup.remember([entry])
+    conn = dedup._connect()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM article_fingerprints").fetchone()[0] == 1
+    finally:
+        conn.close()
@@ -0,0 +1,172 @@
+# tests/test_engine.py
+"""
+回归测试：向量化的 generate_cash_flow_forecast / calculate_runway_and_score
+必须与原先逐月 df.loc 循环的实现给出相同结果（按两位小数比较）。
+"""
+
+import random
+import sys
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pytest
+from dateutil.relativedelta import relativedelta
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import engine  # noqa: E402
+from models import B2BContract, FinancialInput, ScenarioInput  # noqa: E402
+
+
+def _reference_forecast(inputs: FinancialInput, scenario: Optional[ScenarioInput] = None) -> pd.DataFrame:
+    """向量化之前的逐月循环实现（原样保留），作为对照"""
+    dates = pd.period_range(start=pd.to_datetime("today"), periods=inputs.months_to_project, freq='M')
+    df = pd.DataFrame(index=dates, columns=['B2C收入', 'B2B回款', '项目收入', '总流入', '月度消耗', '项目消耗', '总消耗', '月度净现金流', '期末现金']).fillna(0.0)
+    df['B2C收入'], df['月度消耗'] = inputs.b2c_monthly_revenue, inputs.monthly_burn
+    if scenario:
+        if scenario.revenue_delay_months < len(df):
+            df.iloc[scenario.revenue_delay_months:, df.columns.get_loc('项目收入')] = scenario.monthly_revenue
+        df['项目消耗'] = scenario.monthly_extra_burn
+    for contract in inputs.b2b_contracts:
+        payment_period = (pd.to_datetime(contract.sign_date_str) + relativedelta(months=contract.payment_terms_months)).to_period('M')
+        if payment_period in df.index:
+            df.loc[payment_period, 'B2B回款'] += contract.value * contract.decay_factor
+    last_month_cash = inputs.initial_cash
+    if scenario:
+        last_month_cash += scenario.upfront_cost
+    for period in df.index:
+        df.loc[period, '总流入'] = df.loc[period, 'B2C收入'] + df.loc[period, 'B2B回款'] + df.loc[period, '项目收入']
+        df.loc[period, '总消耗'] = df.loc[period, '月度消耗'] + df.loc[period, '项目消耗']
+        df.loc[period, '月度净现金流'] = df.loc[period, '总流入'] - df.loc[period, '总消耗']
+        df.loc[period, '期末现金'] = last_month_cash + df.loc[period, '月度净现金流']
+        last_month_cash = df.loc[period, '期末现金']
+    df.index = df.index.to_timestamp().strftime('%Y-%m')
+    return df[['总流入', '总消耗', '月度净现金流', '期末现金']].round(2)
+
+
+def _reference_runway(cash_flow_df: pd.DataFrame):
+    try:
+        runway_months = cash_flow_df.index.get_loc(cash_flow_df[cash_flow_df['期末现金'] < 0].index[0])
+    except IndexError:
+        runway_months = len(cash_flow_df)
+    return runway_months, round(min(runway_months / 36, 1.0), 2)
+
+
+def _random_case(rng: random.Random, months: int, n_contracts: int):
+    today = pd.Period(pd.to_datetime("today"), freq='M')
+    contracts = [
+        B2BContract(
+            contract_name=f"c{i}",
+            value=round(rng.uniform(1, 500), 2),
+            sign_date_str=(today + rng.randint(-24, 24)).to_timestamp().strftime('%Y-%m-%d'),
+            payment_terms_months=rng.randint(0, 12),
+            decay_factor=round(rng.uniform(0.5, 1.0), 2),
+        )
+        for i in range(n_contracts)
+    ]
+    inputs = FinancialInput(
+        initial_cash=round(rng.uniform(10, 5000), 2),
+        monthly_burn=round(rng.uniform(1, 300), 2),
+        b2c_monthly_revenue=round(rng.uniform(0, 100), 2),
+        b2b_contracts=contracts,
+        months_to_project=months,
+    )
+    scenario = None
+    if rng.random() < 0.5:
+        scenario = ScenarioInput(
+            upfront_cost=round(rng.uniform(0, 1000), 2),
+            monthly_extra_burn=round(rng.uniform(0, 100), 2),
+            revenue_delay_months=rng.randint(0, months + 3),
+            monthly_revenue=round(rng.uniform(0, 150), 2),
+        )
+    return inputs, scenario
+
+
+def _assert_same(inputs: FinancialInput, scenario: Optional[ScenarioInput]):
+    expected = _reference_forecast(inputs, scenario)
+    actual = engine.generate_cash_flow_forecast(inputs, scenario)
+    assert list(actual.index) == list(expected.index)
+    assert list(actual.columns) == list(expected.columns)
+    # 原实现是 object 列，.round(2) 不生效，因此对照值在这里再取两位小数
+    np.testing.assert_allclose(actual.to_numpy(dtype=float), expected.astype(float).round(2).to_numpy(), rtol=0, atol=1e-9)
+    assert engine.calculate_runway_and_score(actual) == _reference_runway(expected)
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_forecast_matches_reference_loop(seed):
+    rng = random.Random(seed)
+    inputs, scenario = _random_case(rng, months=rng.randint(1, 60), n_contracts=rng.randint(0, 8))
+    _assert_same(inputs, scenario)
+
+
+@pytest.mark.parametrize("with_scenario", [False, True])
+def test_zero_horizon(with_scenario):
+    inputs, _ = _random_case(random.Random(1), months=0, n_contracts=3)
+    scenario = ScenarioInput(upfront_cost=10, monthly_extra_burn=5, revenue_delay_months=1, monthly_revenue=3) if with_scenario else None
+    _assert_same(inputs, scenario)
+    assert engine.calculate_runway_and_score(engine.generate_cash_flow_forecast(inputs, scenario)) == (0, 0.0)
+
+
+def test_no_contracts():
+    inputs = FinancialInput(initial_cash=200, monthly_burn=30, b2c_monthly_revenue=1.5)
+    _assert_same(inputs, None)
+    assert engine.calculate_runway_and_score(engine.generate_cash_flow_forecast(inputs)) == (7, 0.19)
+
+
+@pytest.mark.parametrize("financial_inputs", [[], [FinancialInput(initial_cash=100, monthly_burn=10, months_to_project=0)]])
+def test_forecast_portfolio_without_months(financial_inputs):
+    result = engine.forecast_portfolio(financial_inputs, [None, ScenarioInput(upfront_cost=50)])
+    assert result["months"] == []
+    assert result["cash"].shape == (len(financial_inputs), 2, 0)
+    assert result["runway_months"].shape == result["survival_scores"].shape == (len(financial_inputs), 2)
+    assert (result["runway_months"] == 0).all()
+
+
+@pytest.mark.parametrize("n_paths", [0, -5])
+def test_simulate_runway_distribution_rejects_empty_path_count(n_paths):
+    with pytest.raises(ValueError, match="n_paths"):
+        engine.simulate_runway_distribution(FinancialInput(initial_cash=100, monthly_burn=10), n_paths=n_paths)
+
+
+def _runway(inputs: FinancialInput, scenario: Optional[ScenarioInput] = None) -> int:
+    return engine.calculate_runway_and_score(engine.generate_cash_flow_forecast(inputs, scenario))[0]
+
+
+def test_solve_upfront_cost_is_minimal():
+    inputs = FinancialInput(initial_cash=200, monthly_burn=30, b2c_monthly_revenue=5)
+    solution = engine.solve_for_target_runway(inputs, 24, 'upfront_cost')
+    assert solution["feasible"] and solution["achieved_runway_months"] >= 24
+    assert _runway(inputs, ScenarioInput(upfront_cost=solution["value"])) >= 24
+    assert _runway(inputs, ScenarioInput(upfront_cost=solution["value"] - 0.05)) < 24
+
+
+def test_solve_monthly_burn_is_maximal():
+    # 求解最大月消耗时 inputs.monthly_burn 只是占位值，不影响结果
+    solutions = [engine.solve_for_target_runway(FinancialInput(initial_cash=500, monthly_burn=burn), 24, 'monthly_burn')
+                 for burn in (1, 80)]
+    assert solutions[0]["value"] == solutions[1]["value"]
+    value = solutions[0]["value"]
+    assert _runway(FinancialInput(initial_cash=500, monthly_burn=value)) >= 24
+    assert _runway(FinancialInput(initial_cash=500, monthly_burn=value + 0.05)) < 24
+
+
+def test_solve_monthly_extra_burn_is_maximal():
+    inputs = FinancialInput(initial_cash=1000, monthly_burn=20)
+    scenario = ScenarioInput(monthly_revenue=10, revenue_delay_months=3)
+    solution = engine.solve_for_target_runway(inputs, 18, 'monthly_extra_burn', scenario)
+    assert solution["feasible"]
+    value = solution["value"]
+    assert _runway(inputs, scenario.model_copy(update={"monthly_extra_burn": value})) >= 18
+    assert _runway(inputs, scenario.model_copy(update={"monthly_extra_burn": value + 0.05})) < 18
+
+
+def test_solve_reports_infeasible_target():
+    solution = engine.solve_for_target_runway(FinancialInput(initial_cash=100, monthly_burn=30), 24, 'monthly_extra_burn')
+    assert not solution["feasible"] and solution["value"] is None
+
+
+def test_solve_rejects_unknown_variable():
+    with pytest.raises(ValueError):
+        engine.solve_for_target_runway(FinancialInput(initial_cash=100, monthly_burn=10), 12, 'b2c_monthly_revenue')
@@ -0,0 +1,51 @@
+# tests/test_entity_matcher.py
+"""EntityMatcher：一次扫描找出文中提到的所有公司，英文别名要求完整的单词边界"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from entity_matcher import DEFAULT_ALIASES, EntityMatcher, merge_aliases  # noqa: E402
+
+
+def _matcher():
+    return EntityMatcher({"月之暗面": ["Moonshot AI", "Kimi"], "智谱": ["Zhipu"], "Zhipu Labs": []})
+
+
+def test_finds_all_companies_in_one_pass():
+    assert _matcher().find("月之暗面与智谱同日发布新模型") == {"月之暗面", "智谱"}
+
+
+def test_aliases_resolve_to_canonical_name():
+    matcher = _matcher()
+    assert matcher.find("Moonshot AI raises new round") == {"月之暗面"}
+    assert matcher.mentions("kimi 助手上线新功能", "月之暗面")
+
+
+def test_english_aliases_require_word_boundaries():
+    matcher = _matcher()
+    assert matcher.find("Moonshot AIR is a sneaker") == set()
+    assert matcher.find("SuperKimi launched") == set()
+    assert matcher.find("(Kimi)") == {"月之暗面"}
+
+
+def test_chinese_names_match_inside_text():
+    # 中文没有单词边界，嵌在句中也要命中
+    assert _matcher().find("据悉月之暗面今日宣布") == {"月之暗面"}
+
+
+def test_overlapping_patterns():
+    # "Zhipu" 是 "Zhipu Labs" 的前缀：两家公司都应命中（失败指针的输出合并）
+    assert _matcher().find("Zhipu Labs announced") == {"智谱", "Zhipu Labs"}
+    assert _matcher().find("Zhipu announced") == {"智谱"}
+
+
+def test_empty_text():
+    assert _matcher().find(None) == set()
+    assert _matcher().find("") == set()
+
+
+def test_merge_aliases_combines_defaults_and_stored():
+    merged = merge_aliases(["月之暗面", "智谱"], {"月之暗面": ["Kimi"], "其他公司": ["X"]})
+    assert merged == {"月之暗面": [*DEFAULT_ALIASES["月之暗面"], "Kimi"], "智谱": []}
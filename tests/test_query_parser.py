@@ -0,0 +1,79 @@
+# tests/test_query_parser.py
+"""规则解析器：能完整解析的问题直接填充参数模型，有歧义或无法换算的问题判定为置信度不足"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models import FinancialQueryInput, GoalSeekQueryInput  # noqa: E402
+from query_parser import parse_b2b_contracts, parse_number, parse_query  # noqa: E402
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1,500", 1500), ("1.5", 1.5), ("两百五十", 250), ("一千五", 1500), ("三点五", 3.5), ("十二", 12),
+])
+def test_parse_number(text, expected):
+    assert parse_number(text) == expected
+
+
+def test_financial_query_is_confident():
+    parsed = parse_query("初始现金200万，月消耗30万，每月B2C收入1.5万", FinancialQueryInput)
+    assert parsed["confident"]
+    assert parsed["values"] == {"initial_cash": 200, "monthly_burn": 30, "b2c_monthly_revenue": 1.5, "monte_carlo": False}
+
+
+def test_english_units_convert_to_wan():
+    parsed = parse_query("cash on hand 2 million, monthly burn 300k", FinancialQueryInput)
+    assert parsed["confident"]
+    assert parsed["values"]["initial_cash"] == 200
+    assert parsed["values"]["monthly_burn"] == 30
+
+
+def test_burn_range_takes_conservative_end():
+    parsed = parse_query("账上1亿，月消耗800-1000万", FinancialQueryInput)
+    assert parsed["values"]["initial_cash"] == 10000
+    assert parsed["values"]["monthly_burn"] == 1000
+
+
+def test_monte_carlo_flag():
+    parsed = parse_query("初始现金200万，月消耗30万，做一次压力测试", FinancialQueryInput)
+    assert parsed["values"]["monte_carlo"] is True
+
+
+@pytest.mark.parametrize("text, reason", [
+    ("账上100万美元，月消耗20万", "unsupported"),
+    ("账上1000万，月消耗50万，收入每年增长20%", "unsupported"),
+    ("账上有500万，每月最多能花多少才能撑24个月", "missing"),
+])
+def test_ambiguous_queries_fall_back_to_llm(text, reason):
+    parsed = parse_query(text, FinancialQueryInput)
+    assert not parsed["confident"]
+    assert parsed[reason]
+
+
+def test_amount_without_unit_is_not_confident():
+    parsed = parse_query("现金500，月消耗30万", FinancialQueryInput)
+    assert not parsed["confident"]
+    assert not parsed["missing"] and not parsed["unsupported"]
+
+
+def test_goal_seek_solve_for_monthly_burn():
+    parsed = parse_query("账上有500万，每月最多能花多少才能撑24个月", GoalSeekQueryInput)
+    assert parsed["confident"]
+    assert parsed["values"] == {"initial_cash": 500, "target_runway_months": 24, "solve_for": "monthly_burn"}
+
+
+def test_goal_seek_requires_a_horizon():
+    parsed = parse_query("初始现金200万，月消耗30万", GoalSeekQueryInput)
+    assert not parsed["confident"]
+    assert parsed["missing"] == ["target_runway_months|project_duration_months"]
+
+
+def test_b2b_contracts():
+    assert parse_b2b_contracts("2024年3月签了一个200万的B2B合同，账期3个月") == [
+        {"contract_name": "B2B合同1", "value": 200, "sign_date_str": "2024-03-01", "payment_terms_months": 3}
+    ]
+    assert parse_b2b_contracts("初始现金200万，月消耗30万") == []
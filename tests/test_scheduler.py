@@ -0,0 +1,103 @@
+# tests/test_scheduler.py
+"""PollScheduler：自适应检查间隔、每小时检查预算、监控列表变化与出错退避（时间全部显式传入）"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import agent  # noqa: E402
+from agent import PollScheduler  # noqa: E402
+
+
+def test_new_companies_are_due_immediately():
+    scheduler = PollScheduler(["A", "B"], now=0)
+    assert scheduler.pop_due(now=0) == ["A", "B"]
+    assert scheduler.pop_due(now=0) == []
+
+
+def test_alert_halves_and_quiet_doubles_interval():
+    scheduler = PollScheduler(["A"], now=0)
+    scheduler.pop_due(now=0)
+    initial = scheduler.intervals["A"]
+    scheduler.record("A", {"alert": True}, now=0)
+    assert scheduler.intervals["A"] == initial * agent.ACTIVE_SPEEDUP_FACTOR
+    scheduler.record("A", {"alert": False}, now=0)
+    assert scheduler.intervals["A"] == initial
+    assert scheduler.pop_due(now=initial - 1) == []
+    assert scheduler.pop_due(now=initial) == ["A"]
+
+
+def test_interval_is_clamped():
+    scheduler = PollScheduler(["A"], now=0)
+    for _ in range(20):
+        scheduler.record("A", {"alert": True}, now=0)
+    assert scheduler.intervals["A"] == agent.MIN_POLL_INTERVAL_SECONDS
+    for _ in range(20):
+        scheduler.record("A", {}, now=0)
+    assert scheduler.intervals["A"] == agent.MAX_POLL_INTERVAL_SECONDS
+
+
+def test_negative_alert_repolls_soon():
+    scheduler = PollScheduler(["A"], now=0)
+    scheduler.pop_due(now=0)
+    scheduler.record("A", {"alert": True, "sentiment": "负面"}, now=0)
+    assert scheduler.seconds_until_next(now=0) == agent.URGENT_REPOLL_SECONDS
+
+
+def test_recent_alerts_shorten_initial_interval():
+    scheduler = PollScheduler(["A", "B"], recent_alert_counts={"A": 3}, now=0)
+    assert scheduler.intervals["A"] < scheduler.intervals["B"] == agent.DEFAULT_POLL_INTERVAL_SECONDS
+
+
+def test_hourly_budget_window():
+    scheduler = PollScheduler(["A", "B", "C"], hourly_poll_budget=2, now=0)
+    assert scheduler.pop_due(now=0) == ["A", "B"]
+    assert scheduler.pop_due(now=100) == []
+    # C 已到期，但要等最早一次检查滑出一小时窗口
+    assert scheduler.seconds_until_next(now=100) == 3500
+    assert scheduler.pop_due(now=3600) == ["C"]
+
+
+def test_limit_caps_batch_size():
+    scheduler = PollScheduler(["A", "B", "C"], now=0)
+    assert scheduler.pop_due(now=0, limit=1) == ["A"]
+
+
+def test_zero_budget_never_polls():
+    scheduler = PollScheduler({"A": 0}, hourly_poll_budget=0, now=0)
+    assert scheduler.pop_due(now=0) == []
+    assert scheduler.seconds_until_next(now=0) == float("inf")
+
+
+def test_watchlist_changes():
+    scheduler = PollScheduler(["A", "B"], now=0)
+    scheduler.pop_due(now=0)
+    scheduler.record("A", {}, now=0)
+    scheduler.record("B", {}, now=0)
+    scheduler.sync_watchlist(["B", "C"], now=10)
+    assert "A" not in scheduler.intervals
+    assert scheduler.pop_due(now=10) == ["C"]
+    # 已移出的 A 到期后也不会再被取出
+    assert scheduler.pop_due(now=10 ** 6) == ["B"]
+
+
+def test_failure_backoff_keeps_interval():
+    scheduler = PollScheduler(["A"], now=0)
+    scheduler.pop_due(now=0)
+    interval = scheduler.intervals["A"]
+    scheduler.record_failure("A", now=0)
+    assert scheduler.seconds_until_next(now=0) == agent.ERROR_RETRY_SECONDS
+    scheduler.pop_due(now=agent.ERROR_RETRY_SECONDS)
+    scheduler.record_failure("A", now=0)
+    assert scheduler.seconds_until_next(now=0) == 2 * agent.ERROR_RETRY_SECONDS
+    assert scheduler.intervals["A"] == interval
+
+
+@pytest.mark.parametrize("value", ["0", "-3"])
+def test_cli_rejects_non_positive_budget(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        agent._positive_int(value)
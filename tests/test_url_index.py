@@ -0,0 +1,72 @@
+# tests/test_url_index.py
+"""URL规范化、布隆过滤器，以及基于两者的已处理URL索引 ProcessedUrlIndex"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import database  # noqa: E402
+from url_index import BloomFilter, canonicalize_url  # noqa: E402
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://WWW.Example.com:443/news/a/?utm_source=x&b=2&a=1#frag", "https://example.com/news/a?a=1&b=2"),
+    (" https://example.com/x?Ref=1&gclid=2 ", "https://example.com/x"),
+    ("http://example.com:8080/", "http://example.com:8080/"),
+    ("https://example.com", "https://example.com/"),
+    # Bing新闻跳转链接还原为真实地址，真实地址同样规范化
+    ("https://www.bing.com/news/apiclick.aspx?ref=FexRss&url=https%3A%2F%2Fwww.36kr.com%2Fp%2F123%3Futm_medium%3Drss",
+     "https://36kr.com/p/123"),
+    ("not a url", "not a url"),
+])
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url) == expected
+
+
+def test_canonicalize_is_idempotent():
+    url = canonicalize_url("https://www.example.com/a/?z=1&utm_campaign=c&y=2")
+    assert canonicalize_url(url) == url
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000)
+    items = [f"https://example.com/{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"https://example.com/{i}")
+    false_positives = sum(f"https://other.com/{i}" in bloom for i in range(10000))
+    assert false_positives / 10000 < 0.03
+
+
+@pytest.fixture
+def monitoring_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "companies.db"))
+    database.setup_monitoring_tables()
+    yield
+    database.close_all_connections()
+
+
+@pytest.mark.parametrize("use_bloom_filter", [False, True])
+def test_processed_url_index(monitoring_db, use_bloom_filter):
+    index = database.ProcessedUrlIndex(use_bloom_filter=use_bloom_filter)
+    assert "https://example.com/a" not in index
+    index.add("https://www.example.com/a/?utm_source=rss", "月之暗面")
+    assert "https://example.com/a" in index
+    assert "https://example.com/b" not in index
+
+
+def test_refresh_picks_up_urls_written_elsewhere(monitoring_db):
+    index = database.ProcessedUrlIndex(use_bloom_filter=True)
+    database.mark_url_processed("https://example.com/from-worker")   # 例如任务队列工作进程写入
+    assert "https://example.com/from-worker" not in index
+    index.refresh()
+    assert "https://example.com/from-worker" in index
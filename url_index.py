@@ -0,0 +1,74 @@
+# url_index.py
+
+import hashlib
+import math
+from typing import Iterable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# 不影响页面内容的跟踪参数；同一篇文章带不同参数时视为同一URL
+TRACKING_PARAMS = {
+    "gclid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "spm", "scm", "ocid", "cvid", "ref", "ref_src", "share_token", "wt.mc_id",
+}
+TRACKING_PREFIXES = ("utm_",)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Bing新闻RSS中的跳转链接，真实地址在 url 参数里
+REDIRECT_WRAPPERS = {("bing.com", "/news/apiclick.aspx"): "url"}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    规范化URL：小写协议与主机、去掉 www. 与默认端口、去掉片段和跟踪参数、
+    其余查询参数排序、去掉路径末尾的斜杠；Bing 跳转链接还原为真实文章地址。
+    """
+    url = (url or "").strip()
+    parts = urlsplit(url)
+    if not parts.scheme or not parts.netloc:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = parse_qsl(parts.query, keep_blank_values=True)
+
+    wrapped_param = REDIRECT_WRAPPERS.get((host, parts.path.lower()))
+    if wrapped_param:
+        target = dict(query).get(wrapped_param)
+        if target:
+            return canonicalize_url(target)
+
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    kept = sorted(
+        (k, v) for k, v in query
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, netloc, path, urlencode(kept), ""))
+
+
+class BloomFilter:
+    """
+    内存布隆过滤器：判断"一定不存在"时无需查询数据库；
+    判断"可能存在"时误判率约为 error_rate，由调用方再做精确查找。
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # 双重哈希：用一个128位摘要派生出 hash_count 个位置
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
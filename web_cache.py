@@ -0,0 +1,140 @@
+# web_cache.py
+
+import json
+import os
+import time
+from typing import Any, Optional
+
+from database import PooledConnection, get_db_connection
+
+# 独立于业务库的持久化网页缓存：Streamlit重启、cron运行之间都能复用
+WEB_CACHE_FILE = os.getenv("WEB_CACHE_FILE", "web_cache.db")
+MAX_CACHE_BYTES = int(os.getenv("WEB_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+EVICT_TO_RATIO = 0.9   # 超出上限时按最近访问时间淘汰到上限的 90%
+# last_access 只用于 LRU 淘汰，精度到分钟级就够了：距上次记录不足该时长的读取不再写库
+LAST_ACCESS_RESOLUTION_SECONDS = 300
+
+ARTICLE_TTL = 7 * 86400
+SEARCH_TTL = 3600
+
+_initialized_files = set()
+
+
+def _connect() -> PooledConnection:
+    # 借用连接池中的连接（WAL、busy_timeout 等设置与业务库一致）；with 块结束或 close() 时归还
+    if WEB_CACHE_FILE not in _initialized_files:
+        with get_db_connection(WEB_CACHE_FILE) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS web_cache (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    PRIMARY KEY (kind, key)
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_web_cache_last_access ON web_cache (last_access)")
+            # 缓存总字节数的累计值，与条目的写入/删除在同一事务中维护，避免每次写入都全表 SUM
+            conn.execute("CREATE TABLE IF NOT EXISTS web_cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO web_cache_meta (name, value) "
+                         "SELECT 'total_size', COALESCE(SUM(size), 0) FROM web_cache")
+        _initialized_files.add(WEB_CACHE_FILE)
+    return get_db_connection(WEB_CACHE_FILE)
+
+
+def get_entry(kind: str, key: str) -> Optional[dict]:
+    """读取缓存条目；返回的 dict 中 fresh 表示是否仍在有效期内，content 已做 JSON 反序列化"""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM web_cache WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        if not row:
+            return None
+        now = time.time()
+        if now - row["last_access"] >= LAST_ACCESS_RESOLUTION_SECONDS:
+            with conn:
+                conn.execute("UPDATE web_cache SET last_access = ? WHERE kind = ? AND key = ?", (now, kind, key))
+    finally:
+        conn.close()
+    entry = dict(row)
+    entry["content"] = json.loads(entry["content"])
+    entry["fresh"] = entry["expires_at"] > now
+    return entry
+
+
+def put_entry(kind: str, key: str, content: Any, ttl: float, etag: Optional[str] = None, last_modified: Optional[str] = None):
+    """写入/覆盖缓存条目（content 需可JSON序列化），并在超出容量时淘汰最久未访问的条目"""
+    payload = json.dumps(content, ensure_ascii=False)
+    size = len(payload.encode("utf-8"))
+    now = time.time()
+    conn = _connect()
+    try:
+        with conn:
+            old = conn.execute("SELECT size FROM web_cache WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+            conn.execute('''
+                INSERT OR REPLACE INTO web_cache (kind, key, content, etag, last_modified, fetched_at, expires_at, last_access, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (kind, key, payload, etag, last_modified, now, now + ttl, now, size))
+            _add_total_size(conn, size - (old["size"] if old else 0))
+            _evict_if_needed(conn)
+    finally:
+        conn.close()
+
+
+def refresh_entry(kind: str, key: str, ttl: float):
+    """条件请求返回304后，延长条目的有效期"""
+    now = time.time()
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("UPDATE web_cache SET fetched_at = ?, expires_at = ?, last_access = ? WHERE kind = ? AND key = ?",
+                         (now, now + ttl, now, kind, key))
+    finally:
+        conn.close()
+
+
+def _total_size(conn: PooledConnection) -> int:
+    return conn.execute("SELECT value FROM web_cache_meta WHERE name = 'total_size'").fetchone()[0]
+
+
+def _add_total_size(conn: PooledConnection, delta: int):
+    conn.execute("UPDATE web_cache_meta SET value = value + ? WHERE name = 'total_size'", (delta,))
+
+
+def _evict_if_needed(conn: PooledConnection):
+    total = _total_size(conn)
+    if total <= MAX_CACHE_BYTES:
+        return
+    target = MAX_CACHE_BYTES * EVICT_TO_RATIO
+    freed = 0
+    victims = []
+    for row in conn.execute("SELECT kind, key, size FROM web_cache ORDER BY last_access"):
+        if total - freed <= target:
+            break
+        victims.append((row["kind"], row["key"]))
+        freed += row["size"]
+    conn.executemany("DELETE FROM web_cache WHERE kind = ? AND key = ?", victims)
+    _add_total_size(conn, -freed)
+
+
+def conditional_headers(entry: Optional[dict]) -> dict:
+    """根据缓存条目生成 If-None-Match / If-Modified-Since 请求头"""
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def stats() -> dict:
+    conn = _connect()
+    try:
+        entries = conn.execute("SELECT COUNT(*) FROM web_cache").fetchone()[0]
+        return {"entries": entries, "bytes": _total_size(conn), "max_bytes": MAX_CACHE_BYTES}
+    finally:
+        conn.close()